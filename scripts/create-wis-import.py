@@ -3,10 +3,13 @@
 Create SQL import file from extracted WIS data
 """
 
+import argparse
 import re
 from pathlib import Path
 
-def create_sql_import():
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_BULLETINS, WIS_PARTS, WIS_PROCEDURES
+
+def create_sql_import(mode='insert', batch_size=500, max_file_bytes=None):
     parts_file = Path("/Volumes/UnimogManuals/wis-processed/parts_with_context.txt")
     output_file = Path("/Volumes/UnimogManuals/wis-processed/wis_import.sql")
     
@@ -28,16 +31,6 @@ def create_sql_import():
                 if part_num not in parts or (desc and len(desc) > len(parts.get(part_num, ''))):
                     parts[part_num] = desc
     
-    # Create SQL statements
-    sql_statements = []
-    
-    # Add header
-    sql_statements.append("-- WIS Parts Import from MERCEDES.raw extraction")
-    sql_statements.append("-- Generated from forensic data extraction")
-    sql_statements.append("")
-    sql_statements.append("BEGIN;")
-    sql_statements.append("")
-    
     # Add some sample procedures (from known WIS content)
     procedures = [
         ("Remove front axle differential", "Remove the front axle differential assembly. Drain oil before removal."),
@@ -52,26 +45,6 @@ def create_sql_import():
         ("Replace torque converter", "Remove and replace the torque converter assembly.")
     ]
     
-    for title, content in procedures:
-        sql = f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;"""
-        sql_statements.append(sql)
-    
-    sql_statements.append("")
-    
-    # Add parts
-    for part_num, desc in list(parts.items())[:1000]:  # Limit to 1000 for initial import
-        part_num_clean = part_num.replace("'", "''")
-        desc_clean = desc.replace("'", "''")[:200]  # Limit description length
-        
-        sql = f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_num_clean}', '{desc_clean}', to_tsvector('english', '{part_num_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;"""
-        sql_statements.append(sql)
-    
-    sql_statements.append("")
-    
     # Add some bulletins
     bulletins = [
         "Service Bulletin 2024-01: Portal axle seal replacement procedure updated",
@@ -81,22 +54,30 @@ ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;"""
         "Service Bulletin 2024-05: Power steering fluid recommendation change"
     ]
     
-    for bulletin in bulletins:
-        sql = f"""INSERT INTO wis_bulletins (content, search_vector)
-VALUES ('{bulletin}', to_tsvector('english', '{bulletin}'))
-ON CONFLICT DO NOTHING;"""
-        sql_statements.append(sql)
-    
-    sql_statements.append("")
-    sql_statements.append("COMMIT;")
-    
     # Write SQL file
-    with open(output_file, 'w') as f:
-        f.write('\n'.join(sql_statements))
+    with open_sql(output_file, mode=mode, batch_size=batch_size,
+                  max_file_bytes=max_file_bytes) as sql:
+        sql.comment("WIS Parts Import from MERCEDES.raw extraction")
+        sql.comment("Generated from forensic data extraction")
+        sql.comment()
+        sql.begin()
+        
+        sql.write_rows(WIS_PROCEDURES, (
+            (title, content, 'repair') for title, content in procedures
+        ))
+        
+        # Limit to 1000 for initial import, descriptions to 200 chars
+        sql.write_rows(WIS_PARTS, (
+            (part_num, desc[:200]) for part_num, desc in list(parts.items())[:1000]
+        ))
+        
+        sql.write_rows(WIS_BULLETINS, ((bulletin,) for bulletin in bulletins))
+        
+        sql.commit()
     
     print(f"SQL import file created: {output_file}")
     print(f"Total parts: {len(parts)}")
-    print(f"Total SQL statements: {len(sql_statements)}")
+    print(f"Total SQL rows: {sql.rows} in {sql.statements} statements")
     
     # Show sample
     print("\nSample parts extracted:")
@@ -104,4 +85,8 @@ ON CONFLICT DO NOTHING;"""
         print(f"  {part}: {desc}")
 
 if __name__ == "__main__":
-    create_sql_import()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the SQL import from processed WIS data")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    create_sql_import(mode=args.sql_mode, batch_size=args.batch_size,
+                      max_file_bytes=args.max_file_bytes)
\ No newline at end of file
@@ -4,12 +4,16 @@ Deep Mercedes Parts Extraction - Maximum Data Recovery
 Searches for all possible Mercedes part number formats
 """
 
+import argparse
 import re
 import json
 import os
 from pathlib import Path
 from collections import defaultdict
-import hashlib
+
+from wislib.metrics import REGISTRY, counter, histogram
+from wislib.progress import Progress, file_progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS_LONGEST
 
 class DeepMercedesExtractor:
     def __init__(self):
@@ -17,6 +21,11 @@ class DeepMercedesExtractor:
         self.procedures = {}
         self.model_refs = set()
         
+        # Run metrics, written next to the exports
+        self.bytes_scanned = counter('bytes_scanned_total', 'Bytes of binary files read', stage='deep')
+        self.chunk_seconds = histogram('chunk_scan_seconds', 'Time to scan one 1MB chunk', stage='deep')
+        self.part_hits = counter('regex_hits_total', 'Pattern matches', pattern='part_number')
+        
         # Extended Mercedes part patterns
         self.part_patterns = [
             # Standard format with spaces: A123 456 78 90
@@ -80,35 +89,36 @@ class DeepMercedesExtractor:
         chunk_size = 1024 * 1024  # 1MB chunks
         parts_found = 0
         
+        progress = file_progress(filepath)
         with open(filepath, 'rb') as f:
-            chunk_num = 0
             while True:
                 chunk = f.read(chunk_size)
                 if not chunk:
                     break
                     
-                chunk_num += 1
-                if chunk_num % 100 == 0:
-                    mb_processed = (chunk_num * chunk_size) / (1024 * 1024)
-                    print(f"  Processed {mb_processed:.0f}MB... Found {parts_found} parts")
+                progress.add(len(chunk))
+                self.bytes_scanned.inc(len(chunk))
                 
                 # Search for part numbers
-                for pattern in self.part_patterns:
-                    matches = pattern.finditer(chunk)
-                    for match in matches:
-                        part_raw = match.group(1)
-                        part_num = self.normalize_part_number(part_raw)
-                        
-                        if part_num and self.validate_part_number(part_num):
-                            # Extract context for description
-                            start = max(0, match.start() - 100)
-                            end = min(len(chunk), match.end() + 200)
-                            context = chunk[start:end]
-                            desc = self.extract_description(context)
+                with self.chunk_seconds.time():
+                    for pattern in self.part_patterns:
+                        matches = pattern.finditer(chunk)
+                        for match in matches:
+                            part_raw = match.group(1)
+                            part_num = self.normalize_part_number(part_raw)
+                            self.part_hits.inc()
                             
-                            if part_num not in self.parts or (desc and len(desc) > len(self.parts.get(part_num, ''))):
-                                self.parts[part_num] = desc
-                                parts_found += 1
+                            if part_num and self.validate_part_number(part_num):
+                                # Extract context for description
+                                start = max(0, match.start() - 100)
+                                end = min(len(chunk), match.end() + 200)
+                                context = chunk[start:end]
+                                desc = self.extract_description(context)
+                                
+                                if part_num not in self.parts or (desc and len(desc) > len(self.parts.get(part_num, ''))):
+                                    self.parts[part_num] = desc
+                                    parts_found += 1
+        progress.finish()
                                 
         print(f"  Total parts found: {parts_found}")
         
@@ -213,12 +223,16 @@ class DeepMercedesExtractor:
             files = list(base_path.glob(pattern))
             print(f"\nSearching {len(files)} files matching {pattern}")
             
+            scan = []
             for filepath in files:
                 if filepath.stat().st_size > 1e9:  # Skip files > 1GB for now
                     print(f"  Skipping large file: {filepath.name}")
                     continue
-                    
-                self.extract_from_binary_file(filepath)
+                scan.append(filepath)
+                
+            with Progress(planned_sizes(scan), f"Scanning {pattern}"):
+                for filepath in scan:
+                    self.extract_from_binary_file(filepath)
                 
     def extract_from_procedures(self):
         """Extract part numbers mentioned in procedures"""
@@ -304,7 +318,7 @@ class DeepMercedesExtractor:
         }
         return categories.get(prefix, 'General')
         
-    def export_results(self, output_dir):
+    def export_results(self, output_dir, sql_mode='insert', batch_size=500, max_file_bytes=None):
         """Export all extracted data"""
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
@@ -352,33 +366,33 @@ class DeepMercedesExtractor:
         
         # Generate SQL
         sql_file = output_path / 'mercedes_deep_import.sql'
-        with open(sql_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes WIS Deep Extraction Import\n")
-            f.write(f"-- Total parts: {len(self.parts)}\n\n")
-            f.write("BEGIN;\n\n")
+        with open_sql(sql_file, mode=sql_mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Deep Extraction Import")
+            sql.comment(f"Total parts: {len(self.parts)}")
+            sql.comment()
+            sql.begin()
             
-            for part_num, desc in self.parts.items():
-                part_clean = part_num.replace("'", "''")
-                desc_clean = (desc or '').replace("'", "''")[:500]
-                
-                f.write(f"""INSERT INTO wis_parts (part_number, description)
-VALUES ('{part_clean}', '{desc_clean}')
-ON CONFLICT (part_number) DO UPDATE SET 
-  description = CASE 
-    WHEN LENGTH(EXCLUDED.description) > LENGTH(wis_parts.description) 
-    THEN EXCLUDED.description 
-    ELSE wis_parts.description 
-  END;
-""")
-                
-            f.write("\nCOMMIT;\n")
+            sql.write_rows(WIS_PARTS_LONGEST, (
+                (part_num, (desc or '')[:500])
+                for part_num, desc in self.parts.items()
+            ))
+            
+            sql.commit()
             
         print(f"✅ SQL exported: {sql_file}")
         
+        prom, summary = REGISTRY.write(output_path, 'deep-mercedes-extraction')
+        print(f"📊 Metrics: {summary} ({prom.name})")
+        
         return data
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Search every WIS extraction output for Mercedes parts")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("MERCEDES WIS DEEP EXTRACTION")
     print("="*60)
@@ -406,7 +420,9 @@ def main():
     
     # Export results
     output_dir = "/Volumes/UnimogManuals/MERCEDES-DEEP-EXTRACT"
-    data = extractor.export_results(output_dir)
+    data = extractor.export_results(output_dir, sql_mode=args.sql_mode,
+                                    batch_size=args.batch_size,
+                                    max_file_bytes=args.max_file_bytes)
     
     print("\n" + "="*60)
     print("🎉 DEEP EXTRACTION COMPLETE!")
@@ -3,11 +3,15 @@
 Extract real Mercedes parts from strings file
 """
 
+import argparse
 import re
 import json
 from pathlib import Path
 from collections import defaultdict
 
+from wislib.progress import Progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS, WIS_PROCEDURES
+
 class MercedesPartsExtractor:
     def __init__(self):
         self.parts = {}
@@ -32,13 +36,11 @@ class MercedesPartsExtractor:
         """Extract parts and procedures from strings file"""
         print(f"Processing {filepath}...")
         
-        parts_found = 0
-        procedures_found = 0
-        
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line_num, line in enumerate(f):
-                if line_num % 100000 == 0:
-                    print(f"  Processed {line_num:,} lines... Parts: {parts_found}, Procedures: {procedures_found}")
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([filepath]), 'Scanning strings') as progress:
+            scanned = progress.file(filepath)
+            for line in f:
+                scanned.add(len(line))
                 
                 # Look for part numbers
                 matches = self.part_pattern.findall(line)
@@ -50,7 +52,6 @@ class MercedesPartsExtractor:
                         desc = self.extract_context(line, match)
                         if part_num not in self.parts or (desc and len(desc) > len(self.parts.get(part_num, ''))):
                             self.parts[part_num] = desc
-                            parts_found += 1
                 
                 # Look for procedures
                 for keyword in self.procedure_keywords:
@@ -59,7 +60,6 @@ class MercedesPartsExtractor:
                         proc = self.clean_procedure(line, keyword)
                         if proc and proc not in self.procedures:
                             self.procedures.append(proc)
-                            procedures_found += 1
                             
         print(f"  Total: {len(self.parts)} unique parts, {len(self.procedures)} procedures")
         
@@ -139,7 +139,7 @@ class MercedesPartsExtractor:
                 
         return None
         
-    def export_results(self, output_dir):
+    def export_results(self, output_dir, sql_mode='insert', batch_size=500, max_file_bytes=None):
         """Export extracted data"""
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
@@ -181,39 +181,34 @@ class MercedesPartsExtractor:
         
         # Generate SQL for Supabase
         sql_file = output_path / 'mercedes_parts_import.sql'
-        with open(sql_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes WIS Parts Import\n")
-            f.write(f"-- Extracted from strings data\n")
-            f.write(f"-- Parts: {len(self.parts)} | Procedures: {len(self.procedures)}\n\n")
-            f.write("BEGIN;\n\n")
+        with open_sql(sql_file, mode=sql_mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Parts Import")
+            sql.comment("Extracted from strings data")
+            sql.comment(f"Parts: {len(self.parts)} | Procedures: {len(self.procedures)}")
+            sql.comment()
+            sql.begin()
             
             # Delete existing data first
-            f.write("-- Clear existing data\n")
-            f.write("DELETE FROM wis_parts WHERE part_number LIKE 'TEST%';\n\n")
+            sql.comment("Clear existing data")
+            sql.statement("DELETE FROM wis_parts WHERE part_number LIKE 'TEST%'")
+            sql.comment()
             
-            # Insert parts
-            f.write("-- Mercedes Parts Catalog\n")
-            for part_num, desc in self.parts.items():
-                part_clean = part_num.replace("'", "''")
-                desc_clean = (desc or '').replace("'", "''")[:500]
-                
-                f.write(f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_clean}', '{desc_clean}', to_tsvector('english', '{part_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;
-""")
-                
-            # Insert procedures
-            f.write("\n-- Repair Procedures\n")
-            for proc in self.procedures[:1000]:  # Limit to 1000 procedures
-                proc_clean = proc.replace("'", "''")
-                title = proc_clean[:100]
-                
-                f.write(f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{proc_clean}', 'repair', to_tsvector('english', '{proc_clean}'))
-ON CONFLICT DO NOTHING;
-""")
-                
-            f.write("\nCOMMIT;\n")
+            sql.comment("Mercedes Parts Catalog")
+            sql.write_rows(WIS_PARTS, (
+                (part_num, (desc or '')[:500])
+                for part_num, desc in self.parts.items()
+            ))
+            
+            # Limit to 1000 procedures
+            sql.comment()
+            sql.comment("Repair Procedures")
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc[:100], proc, 'repair')
+                for proc in self.procedures[:1000]
+            ))
+            
+            sql.commit()
             
         print(f"✅ SQL exported: {sql_file}")
         
@@ -221,6 +216,10 @@ ON CONFLICT DO NOTHING;
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract Mercedes parts and procedures from the ripped WIS strings")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("MERCEDES PARTS FINAL EXTRACTOR")
     print("="*60)
@@ -237,7 +236,9 @@ def main():
         
     # Export results
     output_dir = "/Volumes/UnimogManuals/MERCEDES-PARTS-FINAL"
-    data = extractor.export_results(output_dir)
+    data = extractor.export_results(output_dir, sql_mode=args.sql_mode,
+                                    batch_size=args.batch_size,
+                                    max_file_bytes=args.max_file_bytes)
     
     print("\n" + "="*60)
     print("🎉 EXTRACTION COMPLETE!")
@@ -8,8 +8,21 @@ import os
 import sys
 import json
 import csv
+import time
+from itertools import islice
 from pathlib import Path
 
+from wislib.catalog import Catalog, TableInfo, catalog_path, load_catalog
+from wislib.dedupe import record_id
+from wislib.incremental import (APPEND, FULL, SKIP, ExtractState, JobState, SegmentWriter,
+                                fingerprint_sql, iter_segment, plan, read_fingerprint)
+from wislib.jsonl import open_jsonl
+from wislib.metrics import REGISTRY, counter, histogram
+from wislib.sqlwriter import add_sql_arguments, open_sql, sql_literal, WIS_PARTS, WIS_PROCEDURES
+from wislib.transbase import (ConnectionPool, DEFAULT_POOL_SIZE, TextMatcher, connect_sqlite,
+                              is_text_type, key_ranges, like_any, read_partitioned,
+                              run_parallel)
+
 # Try to import transbase driver
 try:
     from transbase import transbase
@@ -25,10 +38,69 @@ try:
 except ImportError:
     HAS_JDBC = False
 
+# Rows per fetchmany() round trip
+DEFAULT_ARRAYSIZE = 1000
+# Tables this large are read in parallel key ranges
+DEFAULT_PARTITION_ROWS = 500000
+
+# Case-insensitive substrings that mark a row as Unimog related
+UNIMOG_PATTERNS = ('UNIMOG',)
+
+# Try different table/view names that might contain parts
+PART_TABLES = [
+    'parts', 'PARTS', 'wis_parts', 'WIS_PARTS',
+    'part_numbers', 'PART_NUMBERS', 'spare_parts',
+    'SPARE_PARTS', 'epc_parts', 'EPC_PARTS',
+    'v_parts', 'V_PARTS'  # Views often start with v_
+]
+
+PROCEDURE_TABLES = [
+    'procedures', 'PROCEDURES', 'wis_procedures',
+    'WIS_PROCEDURES', 'repair_procedures', 'REPAIR_PROCEDURES',
+    'service_procedures', 'SERVICE_PROCEDURES',
+    'v_procedures', 'V_PROCEDURES'
+]
+
+
+def part_row(part):
+    if part.get('part_number'):
+        return (str(part.get('part_number', '')), str(part.get('description', '')))
+
+
+def procedure_row(proc):
+    if proc.get('title'):
+        return (str(proc.get('title', '')), str(proc.get('content', '')), 'repair')
+
+
+# kind -> (row limit, record -> SQL row or None) for wis_import.sql
+SQL_ROWS = {
+    'part': (10000, part_row),
+    'procedure': (5000, procedure_row),
+}
+
 class WISExtractor:
-    def __init__(self):
+    def __init__(self, arraysize=DEFAULT_ARRAYSIZE, max_connections=DEFAULT_POOL_SIZE,
+                 search_patterns=UNIMOG_PATTERNS, refresh_catalog=False, full=False,
+                 partition_rows=DEFAULT_PARTITION_ROWS):
         self.connection = None
         self.cursor = None
+        self.pool = None
+        self.native = False
+        self.arraysize = arraysize
+        # Upper bound on concurrent queries against the WIS VM
+        self.max_connections = max_connections
+        # Table and view names from the catalog, once listed
+        self.known_tables = None
+        # table -> [(column, type)] from the catalog, once listed
+        self.columns = None
+        self.catalog = None
+        self.database_identity = None
+        self.refresh_catalog = refresh_catalog
+        # Re-extract every table even if unchanged since the last run
+        self.full = full
+        self.partition_rows = partition_rows
+        self.search_patterns = search_patterns
+        self.matcher = TextMatcher(search_patterns)
         
         # Connection parameters from research
         self.host = "localhost"
@@ -53,11 +125,8 @@ class WISExtractor:
             conn_str = f"//{self.host}:{self.port}/{self.database}"
             print(f"Connecting to TransBase: {conn_str}")
             
-            self.connection = transbase.connect(conn_str, self.username, self.password)
-            self.cursor = self.connection.cursor()
-            
-            # Enable native type casting
-            self.cursor.type_cast = True
+            self.open(lambda: transbase.connect(conn_str, self.username, self.password),
+                      self.identity(), native=True)
             
             print("✅ Connected to WIS database!")
             return True
@@ -89,13 +158,12 @@ class WISExtractor:
                 
             print(f"Connecting via JDBC: {jdbc_url}")
             
-            self.connection = jaydebeapi.connect(
+            self.open(lambda: jaydebeapi.connect(
                 driver_class,
                 jdbc_url,
                 [self.username, self.password],
                 driver_jar
-            )
-            self.cursor = self.connection.cursor()
+            ), self.identity())
             
             print("✅ Connected via JDBC!")
             return True
@@ -104,6 +172,32 @@ class WISExtractor:
             print(f"JDBC connection failed: {e}")
             return False
             
+    def connect_sqlite(self, path):
+        """Connect to a SQLite stand-in for the WIS database (dry runs)"""
+        print(f"Connecting to SQLite stand-in: {path}")
+        self.open(connect_sqlite(path), f"sqlite://{os.path.abspath(path)}")
+        print("✅ Connected to stand-in database!")
+        return True
+        
+    def identity(self):
+        """Which database this is; keys the catalog cache"""
+        return f"transbase://{self.username}@{self.host}:{self.port}/{self.database}"
+        
+    def open(self, connect, identity, native=False):
+        """Open the primary connection and the pool for parallel reads"""
+        self.database_identity = identity
+        self.native = native
+        self.connection = connect()
+        self.cursor = self.prepare_cursor(self.connection.cursor())
+        self.pool = ConnectionPool(connect, size=self.max_connections)
+        
+    def prepare_cursor(self, cursor):
+        cursor.arraysize = self.arraysize
+        if self.native:
+            # Enable native type casting
+            cursor.type_cast = True
+        return cursor
+            
     def connect(self):
         """Try to connect using available methods"""
         # Try native driver first
@@ -157,152 +251,382 @@ class WISExtractor:
             print(f"Error getting views: {e}")
             return []
             
-    def extract_parts(self):
-        """Extract Mercedes parts from database"""
-        print("\n📦 Extracting parts...")
-        
-        parts = []
+    # ============== Catalog ==============
+
+    def discover_catalog(self):
+        """List tables, views and columns and count the rows of every table"""
+        print("\n📚 Discovering database catalog...")
+        catalog = Catalog(self.database_identity, time.time())
+        columns = self.get_columns()
+        for kind, names in (('table', self.get_tables()), ('view', self.get_views())):
+            for name in names:
+                catalog.tables[name] = TableInfo(kind, columns.get(name, []))
+                
+        def count(table):
+            def job(cursor):
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                yield [{'rows': cursor.fetchone()[0]}]
+            return job
+            
+        jobs = {table: count(table) for table in catalog.names('table')}
+        for table, batch in run_parallel(self.pool, jobs,
+                                         on_error=lambda t, e: print(f"  ❌ COUNT {t}: {e}")):
+            catalog.tables[table].rows = batch[0]['rows']
+        return catalog
         
-        # Try different table/view names that might contain parts
-        possible_tables = [
-            'parts', 'PARTS', 'wis_parts', 'WIS_PARTS',
-            'part_numbers', 'PART_NUMBERS', 'spare_parts',
-            'SPARE_PARTS', 'epc_parts', 'EPC_PARTS',
-            'v_parts', 'V_PARTS'  # Views often start with v_
-        ]
+    def load_catalog(self, output_dir):
+        """Catalog from the local cache, discovered on first use or with refresh_catalog"""
+        cache = catalog_path(output_dir, self.database_identity)
+        cached = cache.exists() and not self.refresh_catalog
+        self.catalog = load_catalog(self.database_identity, self.discover_catalog, cache,
+                                    refresh=self.refresh_catalog)
+        self.refresh_catalog = False
+        self.known_tables = self.catalog.names()
+        self.columns = self.catalog.columns()
         
-        for table in possible_tables:
-            try:
-                # Try to query the table
-                query = f"SELECT * FROM {table} LIMIT 10"
-                self.cursor.execute(query)
-                
-                # Get column names
-                columns = [desc[0] for desc in self.cursor.description]
-                print(f"Found table {table} with columns: {columns}")
-                
-                # Get all data
-                query = f"SELECT * FROM {table}"
-                self.cursor.execute(query)
-                
-                rows = self.cursor.fetchall()
-                for row in rows:
-                    part = dict(zip(columns, row))
-                    parts.append(part)
-                    
-                print(f"  Extracted {len(rows)} parts from {table}")
+        rows = sum(info.rows or 0 for info in self.catalog.tables.values())
+        print(f"📚 Catalog {'loaded from' if cached else 'saved to'} {cache}: "
+              f"{len(self.catalog.names('table'))} tables, "
+              f"{len(self.catalog.names('view'))} views, {rows:,} rows")
+        return self.catalog
+
+    # ============== Streaming ==============
+
+    def iter_batches(self, cursor, label, started=None, counts=None):
+        """Record batches of the query last executed on cursor, fetched with
+        fetchmany(arraysize); prints rows/s once the result is drained, or
+        appends the row count to `counts` for the caller to report"""
+        started = started or time.time()
+        columns = [desc[0] for desc in cursor.description]
+        fetched = counter('rows_fetched_total', 'Rows fetched from TransBase')
+        fetch_seconds = histogram('fetch_batch_seconds', 'Time per fetchmany() round trip')
+        count = 0
+        while True:
+            with fetch_seconds.time():
+                rows = cursor.fetchmany(self.arraysize)
+            if not rows:
                 break
-                
-            except Exception as e:
+            fetched.inc(len(rows))
+            yield [dict(zip(columns, row)) for row in rows]
+            count += len(rows)
+        if counts is not None:
+            counts.append(count)
+            return
+        self.report_rows(label, count, started)
+
+    def report_rows(self, label, count, started):
+        elapsed = max(time.time() - started, 1e-9)
+        print(f"  Extracted {count:,} rows from {label} in {elapsed:.1f}s "
+              f"({count / elapsed:,.0f} rows/s)\n", end='')
+
+    def candidates(self, possible_tables):
+        """Names from possible_tables that exist, in catalog spelling.
+
+        Without a catalog listing every guess has to be tried.
+        """
+        if not self.known_tables:
+            return list(dict.fromkeys(possible_tables))
+        known = {name.lower(): name for name in self.known_tables}
+        return list(dict.fromkeys(known[name.lower()] for name in possible_tables
+                                  if name.lower() in known))
+
+    def select_batches(self, cursor, table, where=None, order_by=None, counts=None):
+        """Stream one table, optionally restricted by a WHERE condition"""
+        started = time.time()
+        cursor.execute(f"SELECT * FROM {table}" + (f" WHERE {where}" if where else "") +
+                       (f" ORDER BY {order_by}" if order_by else ""))
+        if counts is None:
+            columns = [desc[0] for desc in cursor.description]
+            # One write per line: jobs print from several threads
+            print(f"Found table {table} with columns: {columns}\n", end='')
+        yield from self.iter_batches(cursor, table, started, counts)
+
+    def table_batches(self, cursor, possible_tables):
+        """Stream the first table in possible_tables that exists, one query per table tried"""
+        for table in self.candidates(possible_tables):
+            started = time.time()
+            try:
+                cursor.execute(f"SELECT * FROM {table}")
+            except Exception:
                 continue
                 
-        return parts
+            columns = [desc[0] for desc in cursor.description]
+            # One write per line: jobs print from several threads
+            print(f"Found table {table} with columns: {columns}\n", end='')
+            yield from self.iter_batches(cursor, table, started)
+            return
+
+    def get_columns(self, cursor=None):
+        """Column names and types of every table and view, in one query"""
+        cursor = cursor or self.cursor
+        try:
+            cursor.execute("""
+                SELECT table_name, column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = 'PUBLIC'
+                ORDER BY table_name, ordinal_position
+            """)
+            
+            columns = {}
+            for table, column, data_type in cursor.fetchall():
+                columns.setdefault(table, []).append((column, data_type))
+            return columns
+            
+        except Exception as e:
+            print(f"Error getting columns: {e}")
+            return {}
+            
+    def text_columns(self, cursor, table):
+        """Searchable columns of a table, from the catalog or an empty probe"""
+        columns = (self.columns or {}).get(table)
+        if columns is None:
+            cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+            # DB-API type codes are driver specific; treat them all as text
+            columns = [(desc[0], None) for desc in cursor.description]
+        return [name for name, data_type in columns if is_text_type(data_type)]
+
+    def unimog_batches(self, cursor, table, where=None, order_by=None, counts=None):
+        """Every row of one table mentioning a search pattern.
+
+        One OR-combined LIKE query over the text columns; if the database
+        rejects it, the table is streamed once and matched locally. `where`
+        further restricts the rows searched; `counts` as for iter_batches.
+        """
+        try:
+            columns = self.text_columns(cursor, table)
+        except Exception:
+            return
+        if not columns:
+            return
+            
+        started = time.time()
+        predicate = like_any(columns, self.search_patterns)
+        order = f" ORDER BY {order_by}" if order_by else ""
+        try:
+            cursor.execute(f"SELECT * FROM {table} WHERE " +
+                           (f"({predicate}) AND {where}" if where else predicate) + order)
+        except Exception:
+            try:
+                cursor.execute(f"SELECT * FROM {table}" +
+                               (f" WHERE {where}" if where else "") + order)
+            except Exception:
+                return
+                
+        # Both queries are checked locally: it names the matching columns
+        # and filters the full scan
+        for batch in self.iter_batches(cursor, table, started, counts):
+            matches = []
+            for data in batch:
+                matched = self.matcher.columns(data, columns)
+                if matched:
+                    data['_source_table'] = table
+                    data['_source_columns'] = matched
+                    matches.append(data)
+            yield matches
+
+    def extract_parts(self):
+        """Extract Mercedes parts from database (streamed)"""
+        print("\n📦 Extracting parts...")
+        for batch in self.table_batches(self.cursor, PART_TABLES):
+            yield from batch
         
     def extract_procedures(self):
-        """Extract repair procedures from database"""
+        """Extract repair procedures from database (streamed)"""
         print("\n🔧 Extracting procedures...")
+        for batch in self.table_batches(self.cursor, PROCEDURE_TABLES):
+            yield from batch
+        
+    def search_unimog_data(self, tables=None):
+        """Search for Unimog-specific data (streamed)"""
+        print("\n🚗 Searching for Unimog data...")
+        
+        # Get all tables and views
+        if tables is None:
+            tables = self.get_tables() + self.get_views()
+        if self.columns is None:
+            self.columns = self.get_columns()
+        
+        for table in tables:
+            for batch in self.unimog_batches(self.cursor, table):
+                yield from batch
+
+    # ============== Parallel extraction ==============
+
+    def job_specs(self, tables):
+        """job name -> (kind, table, batches(cursor, where)) for every extraction job.
+
+        table is None when the catalog could not resolve it; such jobs fall
+        back to guessing names and are always extracted in full.
+        """
+        specs = {}
+        for kind, possible_tables in (('part', PART_TABLES), ('procedure', PROCEDURE_TABLES)):
+            found = self.candidates(possible_tables) if self.known_tables else []
+            if found:
+                specs[f"{kind}:{found[0]}"] = (kind, found[0], self.select_batches)
+            else:
+                specs[kind] = (kind, None, lambda cursor, table, names=possible_tables:
+                               self.table_batches(cursor, names))
+        if self.catalog:
+            # Skip tables known to be empty; start the largest first
+            tables = sorted((t for t in tables if self.catalog.rows(t) != 0),
+                            key=lambda t: -(self.catalog.rows(t) or 0))
+        for table in tables:
+            specs[f"unimog:{table}"] = ('unimog', table, self.unimog_batches)
+        return specs
         
-        procedures = []
+    def signature(self, kind, table):
+        """Changes whenever a job would run a different query"""
+        if kind == 'unimog':
+            columns = [c for c, t in (self.columns or {}).get(table, []) if is_text_type(t)]
+            return record_id(kind, table, *self.search_patterns, *columns)
+        return record_id(kind, table)
         
-        # Try different table/view names
-        possible_tables = [
-            'procedures', 'PROCEDURES', 'wis_procedures',
-            'WIS_PROCEDURES', 'repair_procedures', 'REPAIR_PROCEDURES',
-            'service_procedures', 'SERVICE_PROCEDURES',
-            'v_procedures', 'V_PROCEDURES'
-        ]
+    def table_key(self, table):
+        info = self.catalog.tables.get(table) if self.catalog else None
+        return info.key if info else None
+
+    def fingerprints(self, specs, state):
+        """Fresh row count and max key for every job's table, one query each"""
+        def job(table, previous):
+            def fingerprint(cursor):
+                cursor.execute(fingerprint_sql(table, self.table_key(table), previous))
+                yield [read_fingerprint(cursor.fetchone())]
+            return fingerprint
+            
+        jobs = {name: job(table, state.jobs.get(name))
+                for name, (_, table, _) in specs.items() if table}
+        return {name: batch[0] for name, batch in run_parallel(
+            self.pool, jobs, on_error=lambda name, e: print(f"  ❌ fingerprint {name}: {e}"))}
+
+    def read_table(self, cursor, table, batches, where=None, rows=None):
+        """batches(cursor, table, where), split into key ranges read in
+        parallel when the table has at least partition_rows rows; the ranges
+        report one rows/s total for the table"""
+        key = self.table_key(table)
+        if rows is None and self.catalog:
+            rows = self.catalog.rows(table)
+        if not key or not rows or rows < self.partition_rows or self.pool.size < 2:
+            return batches(cursor, table, where)
+            
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}" +
+                       (f" WHERE {where}" if where else ""))
+        low, high = cursor.fetchone()
+        conditions = key_ranges(key, low, high, self.pool.size * 2)
+        print(f"  Reading {table} in {len(conditions)} ranges of {key}\n", end='')
+        started = time.time()
+        # Row count of every range, appended from the read-ahead threads too
+        counts = []
         
-        for table in possible_tables:
+        def fetch(range_cursor, condition):
+            return batches(self.prepare_cursor(range_cursor), table,
+                           f"({where}) AND {condition}" if where else condition,
+                           order_by=key, counts=counts)
+            
+        def read():
+            yield from read_partitioned(self.pool, cursor, fetch, conditions)
+            self.report_rows(f"{table} ({len(conditions)} ranges)", sum(counts), started)
+            
+        return read()
+
+    def tracked_job(self, name, kind, table, batches, action, fingerprint, state):
+        """Job that also writes its records to a segment and records its state on success"""
+        previous = state.jobs.get(name)
+        key = self.table_key(table)
+        
+        def job(cursor):
+            cursor = self.prepare_cursor(cursor)
+            segment = SegmentWriter(state.segment_path(name))
             try:
-                query = f"SELECT * FROM {table} LIMIT 10"
-                self.cursor.execute(query)
-                
-                columns = [desc[0] for desc in self.cursor.description]
-                print(f"Found table {table} with columns: {columns}")
-                
-                query = f"SELECT * FROM {table}"
-                self.cursor.execute(query)
-                
-                rows = self.cursor.fetchall()
-                for row in rows:
-                    proc = dict(zip(columns, row))
-                    procedures.append(proc)
-                    
-                print(f"  Extracted {len(rows)} procedures from {table}")
-                break
-                
-            except Exception as e:
+                where = None
+                rows = fingerprint.rows
+                if action == APPEND:
+                    # Keep what was extracted before and fetch only the new key range
+                    for batch in iter_segment(state.segment_path(name)):
+                        segment.write(batch)
+                        yield batch
+                    where = f"{key} > {sql_literal(previous.max_key)}"
+                    # Only the new rows are read, so only they decide on partitioning
+                    rows = fingerprint.new_rows
+                for batch in self.read_table(cursor, table, batches, where, rows):
+                    segment.write(batch)
+                    yield batch
+            except BaseException:
+                segment.discard()
+                raise
+            segment.commit()
+            state.record(name, JobState(table, self.signature(kind, table), fingerprint.rows,
+                                        key, fingerprint.max_key), segment)
+        return job
+
+    def extract_parallel(self, tables, output_path):
+        """(kind, batch) pairs from all jobs, at most max_connections at a time.
+
+        Jobs whose table is unchanged since the last run are replayed from
+        their segments, tables that only grew fetch just the new rows.
+        """
+        specs = self.job_specs(tables)
+        state = ExtractState.load(output_path / 'extract_state.json')
+        fingerprints = self.fingerprints(specs, state)
+        
+        jobs, replay, actions = {}, [], {}
+        for name, (kind, table, batches) in specs.items():
+            if name not in fingerprints:
+                actions[name] = FULL
+                jobs[name] = lambda cursor, table=table, batches=batches: (
+                    self.read_table(self.prepare_cursor(cursor), table, batches) if table
+                    else batches(self.prepare_cursor(cursor), table))
                 continue
-                
-        return procedures
+            fingerprint = fingerprints[name]
+            action = FULL if self.full else plan(
+                state.jobs.get(name), self.signature(kind, table), self.table_key(table),
+                fingerprint, state.segment_path(name).exists())
+            actions[name] = action
+            if action == SKIP:
+                replay.append(name)
+            else:
+                jobs[name] = self.tracked_job(name, kind, table, batches, action,
+                                              fingerprint, state)
+        previous = {name: state.jobs.get(name) for name in specs}
         
-    def search_unimog_data(self):
-        """Search for Unimog-specific data"""
-        print("\n🚗 Searching for Unimog data...")
+        counts = {a: list(actions.values()).count(a) for a in (SKIP, APPEND, FULL)}
+        print(f"\n♻️  {counts[SKIP]} jobs unchanged, {counts[APPEND]} appending new rows, "
+              f"{counts[FULL]} extracting in full")
+        print(f"⚡ Running {len(jobs)} extraction jobs on up to "
+              f"{self.pool.size} connections...")
         
-        unimog_data = []
+        def on_error(name, error):
+            print(f"  ❌ {name}: {error}")
+            # Extract it in full next time
+            state.jobs.pop(name, None)
+            
+        for name, batch in run_parallel(self.pool, jobs, on_error=on_error):
+            yield specs[name][0], batch
+            
+        for name in replay:
+            for batch in iter_segment(state.segment_path(name)):
+                yield specs[name][0], batch
+        if replay:
+            records = sum(state.jobs[name].records for name in replay)
+            print(f"  Replayed {records:,} records of {len(replay)} unchanged jobs")
+            
+        same = [name for name, action in actions.items()
+                if action == FULL and previous[name] and name in state.jobs
+                and state.jobs[name].checksum == previous[name].checksum]
+        if same:
+            print(f"  {len(same)} re-extracted jobs had unchanged content")
+            
+        # Forget jobs that no longer exist
+        state.jobs = {name: job for name, job in state.jobs.items() if name in specs}
+        state.save()
         
-        # Get all tables and views
-        tables = self.get_tables() + self.get_views()
+    def export_data(self, output_dir, json_format='jsonl', compress=False, sql_mode='insert',
+                    batch_size=500, max_file_bytes=None):
+        """Export all extracted data
         
-        for table in tables:
-            try:
-                # Search for Unimog references
-                query = f"""
-                SELECT * FROM {table} 
-                WHERE UPPER(CAST(* AS VARCHAR)) LIKE '%UNIMOG%'
-                LIMIT 100
-                """
-                
-                self.cursor.execute(query)
-                rows = self.cursor.fetchall()
-                
-                if rows:
-                    print(f"  Found {len(rows)} Unimog references in {table}")
-                    columns = [desc[0] for desc in self.cursor.description]
-                    
-                    for row in rows:
-                        data = dict(zip(columns, row))
-                        data['_source_table'] = table
-                        unimog_data.append(data)
-                        
-            except Exception as e:
-                # Try simpler query
-                try:
-                    query = f"SELECT * FROM {table} LIMIT 1"
-                    self.cursor.execute(query)
-                    columns = [desc[0] for desc in self.cursor.description]
-                    
-                    # Check each text column for Unimog
-                    for col in columns:
-                        try:
-                            query = f"""
-                            SELECT * FROM {table} 
-                            WHERE UPPER({col}) LIKE '%UNIMOG%'
-                            LIMIT 100
-                            """
-                            self.cursor.execute(query)
-                            rows = self.cursor.fetchall()
-                            
-                            if rows:
-                                print(f"  Found {len(rows)} Unimog references in {table}.{col}")
-                                
-                                for row in rows:
-                                    data = dict(zip(columns, row))
-                                    data['_source_table'] = table
-                                    data['_source_column'] = col
-                                    unimog_data.append(data)
-                                    
-                        except:
-                            continue
-                            
-                except:
-                    continue
-                    
-        return unimog_data
-        
-    def export_data(self, output_dir):
-        """Export all extracted data"""
+        json_format='jsonl' streams every record to wis_extracted.jsonl (plus a
+        small wis_extracted.summary.json) as rows are fetched; 'json' writes
+        one wis_extracted.json and has to hold the data in memory.
+        """
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
@@ -312,8 +636,9 @@ class WISExtractor:
         print("="*50)
         
         # Get database structure
-        tables = self.get_tables()
-        views = self.get_views()
+        self.load_catalog(output_path)
+        tables = self.catalog.names('table')
+        views = self.catalog.names('view')
         
         print(f"\nFound {len(tables)} tables and {len(views)} views")
         
@@ -322,70 +647,94 @@ class WISExtractor:
         if views:
             print("\nViews:", views[:10])
             
-        # Extract specific data
-        parts = self.extract_parts()
-        procedures = self.extract_procedures()
-        unimog_data = self.search_unimog_data()
-        
-        # Save to JSON
         data = {
             'statistics': {
                 'tables': len(tables),
                 'views': len(views),
-                'parts': len(parts),
-                'procedures': len(procedures),
-                'unimog_records': len(unimog_data)
             },
             'database_structure': {
                 'tables': tables,
                 'views': views
-            },
-            'parts': parts[:1000],  # Limit for initial review
-            'procedures': procedures[:1000],
-            'unimog_data': unimog_data[:500]
+            }
         }
         
-        json_file = output_path / 'wis_extracted.json'
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Only the first SQL_PART_LIMIT / SQL_PROCEDURE_LIMIT usable records go to SQL
+        sql_records = {'part': [], 'procedure': []}
+        
+        def keep_for_sql(kind, batch):
+            records = sql_records.get(kind)
+            if records is None:
+                return
+            limit, to_row = SQL_ROWS[kind]
+            for record in batch:
+                if len(records) >= limit:
+                    break
+                if to_row(record):
+                    records.append(record)
+        
+        if json_format == 'jsonl':
+            with open_jsonl(output_path / 'wis_extracted.jsonl', compress=compress) as out:
+                for kind, batch in self.extract_parallel(tables + views, output_path):
+                    out.write_many(kind, batch)
+                    keep_for_sql(kind, batch)
+                
+                data['statistics'].update({
+                    'parts': out.counts.get('part', 0),
+                    'procedures': out.counts.get('procedure', 0),
+                    'unimog_records': out.counts.get('unimog', 0)
+                })
+                out.stats.update(data)
+            print(f"\n✅ {out.total:,} records exported to: {out.path}")
+        else:
+            extracted = {'part': [], 'procedure': [], 'unimog': []}
+            for kind, batch in self.extract_parallel(tables + views, output_path):
+                extracted[kind].extend(batch)
+                keep_for_sql(kind, batch)
+            data['statistics'].update({
+                'parts': len(extracted['part']),
+                'procedures': len(extracted['procedure']),
+                'unimog_records': len(extracted['unimog'])
+            })
             
-        print(f"\n✅ Data exported to: {json_file}")
+            json_file = output_path / 'wis_extracted.json'
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump({**data, 'parts': extracted['part'],
+                           'procedures': extracted['procedure'],
+                           'unimog_data': extracted['unimog']},
+                          f, indent=2, ensure_ascii=False, default=str)
+            print(f"\n✅ Data exported to: {json_file}")
         
         # Generate SQL for Supabase
-        self.generate_sql(parts, procedures, output_path / 'wis_import.sql')
+        self.generate_sql(sql_records['part'], sql_records['procedure'],
+                          output_path / 'wis_import.sql', mode=sql_mode,
+                          batch_size=batch_size, max_file_bytes=max_file_bytes)
+        
+        prom, summary = REGISTRY.write(output_path, 'extract-wis-transbase')
+        print(f"📊 Metrics: {summary} ({prom.name})")
         
         return data
         
-    def generate_sql(self, parts, procedures, output_file):
+    def generate_sql(self, parts, procedures, output_file, mode='insert', batch_size=500,
+                     max_file_bytes=None):
         """Generate SQL import file for Supabase"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes WIS Data Import\n")
-            f.write("-- Extracted via TransBase connection\n\n")
-            f.write("BEGIN;\n\n")
-            
-            # Insert parts
-            for part in parts[:10000]:  # Limit to 10k
-                part_num = str(part.get('part_number', '')).replace("'", "''")
-                desc = str(part.get('description', '')).replace("'", "''")
-                
-                if part_num:
-                    f.write(f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_num}', '{desc}', to_tsvector('english', '{part_num} {desc}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;\n""")
-                    
-            # Insert procedures
-            for proc in procedures[:5000]:  # Limit to 5k
-                title = str(proc.get('title', '')).replace("'", "''")
-                content = str(proc.get('content', '')).replace("'", "''")
-                
-                if title:
-                    f.write(f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;\n""")
-                    
-            f.write("\nCOMMIT;\n")
+        part_limit, part_row = SQL_ROWS['part']
+        proc_limit, proc_row = SQL_ROWS['procedure']
+        part_rows = islice(filter(None, map(part_row, parts)), part_limit)
+        proc_rows = islice(filter(None, map(proc_row, procedures)), proc_limit)
+        
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Data Import")
+            sql.comment("Extracted via TransBase connection")
+            sql.comment()
+            sql.begin()
             
-        print(f"✅ SQL file generated: {output_file}")
+            sql.write_rows(WIS_PARTS, part_rows)
+            sql.write_rows(WIS_PROCEDURES, proc_rows)
+            
+            sql.commit()
+            
+        print(f"✅ SQL file generated: {output_file} ({sql.rows:,} rows in {sql.statements:,} statements)")
         
     def close(self):
         """Close database connection"""
@@ -393,18 +742,43 @@ ON CONFLICT DO NOTHING;\n""")
             self.cursor.close()
         if self.connection:
             self.connection.close()
+        if self.pool:
+            self.pool.closeall()
         print("Database connection closed")
 
 
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract Mercedes WIS/EPC data over TransBase")
+    parser.add_argument('--arraysize', type=int, default=DEFAULT_ARRAYSIZE,
+                        help="rows fetched per round trip")
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_POOL_SIZE,
+                        help="concurrent queries against the WIS VM")
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help="extract from a SQLite stand-in instead of TransBase")
+    parser.add_argument('--refresh-catalog', action='store_true',
+                        help="rediscover tables, columns and row counts instead of using the cache")
+    parser.add_argument('--full', action='store_true',
+                        help="re-extract every table instead of only changed ones")
+    parser.add_argument('--partition-rows', type=int, default=DEFAULT_PARTITION_ROWS,
+                        help="read tables with at least this many rows in parallel key ranges")
+    parser.add_argument('--output', default="/Volumes/UnimogManuals/WIS-TRANSBASE-EXTRACT",
+                        help="output directory")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("MERCEDES WIS/EPC TRANSBASE EXTRACTOR")
     print("="*60)
     
-    extractor = WISExtractor()
+    extractor = WISExtractor(arraysize=args.arraysize, max_connections=args.max_connections,
+                             refresh_catalog=args.refresh_catalog, full=args.full,
+                             partition_rows=args.partition_rows)
     
     # Try to connect
-    if not extractor.connect():
+    if args.sqlite:
+        extractor.connect_sqlite(args.sqlite)
+    elif not extractor.connect():
         print("\n❌ Failed to connect to database")
         print("\nTo fix this:")
         print("1. Install TransBase Python driver:")
@@ -416,8 +790,8 @@ def main():
         return
         
     # Extract data
-    output_dir = "/Volumes/UnimogManuals/WIS-TRANSBASE-EXTRACT"
-    data = extractor.export_data(output_dir)
+    data = extractor.export_data(args.output, sql_mode=args.sql_mode, batch_size=args.batch_size,
+                                 max_file_bytes=args.max_file_bytes)
     
     # Print summary
     print("\n" + "="*60)
@@ -4,9 +4,19 @@ Final Comprehensive Mercedes Parts Database
 Combines all extraction methods and known parts
 """
 
+import argparse
 import json
 from pathlib import Path
 
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS
+
+# Only replace a description with a longer one
+COMPREHENSIVE_PARTS = WIS_PARTS.with_options(
+    computed={},
+    update=("description = EXCLUDED.description\n"
+            "WHERE LENGTH(EXCLUDED.description) > LENGTH(wis_parts.description)"),
+)
+
 def create_comprehensive_database():
     """Create the most complete Mercedes parts database possible"""
     
@@ -264,45 +274,43 @@ def create_comprehensive_database():
     
     return parts
 
-def generate_sql(parts, output_file):
+def generate_sql(parts, output_file, mode='insert', batch_size=500, max_file_bytes=None):
     """Generate SQL import file"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- Mercedes Unimog Parts Database\n")
-        f.write("-- Comprehensive collection of verified parts\n")
-        f.write(f"-- Total parts: {len(parts)}\n\n")
+    with open_sql(output_file, mode=mode, batch_size=batch_size,
+                  max_file_bytes=max_file_bytes) as sql:
+        sql.comment("Mercedes Unimog Parts Database")
+        sql.comment("Comprehensive collection of verified parts")
+        sql.comment(f"Total parts: {len(parts)}")
+        sql.comment()
         
         # First, clear test data
-        f.write("-- Clear test data\n")
-        f.write("DELETE FROM wis_parts WHERE part_number LIKE 'TEST%';\n\n")
+        sql.comment("Clear test data")
+        sql.statement("DELETE FROM wis_parts WHERE part_number LIKE 'TEST%'")
+        sql.comment()
         
-        f.write("-- Insert parts\n")
-        f.write("BEGIN;\n\n")
+        sql.comment("Insert parts")
+        sql.begin()
         
-        for part_num, desc in sorted(parts.items()):
-            part_clean = part_num.replace("'", "''")
-            desc_clean = desc.replace("'", "''")
-            
-            f.write(f"""INSERT INTO wis_parts (part_number, description)
-VALUES ('{part_clean}', '{desc_clean}')
-ON CONFLICT (part_number) DO UPDATE SET 
-  description = EXCLUDED.description
-WHERE LENGTH(EXCLUDED.description) > LENGTH(wis_parts.description);
-
-""")
-            
-        f.write("COMMIT;\n\n")
+        sql.write_rows(COMPREHENSIVE_PARTS, sorted(parts.items()))
+        
+        sql.commit()
+        sql.comment()
         
         # Add summary
-        f.write("-- Summary by category\n")
+        sql.comment("Summary by category")
         categories = {}
         for part in parts.keys():
             prefix = part[:4]
             categories[prefix] = categories.get(prefix, 0) + 1
             
         for prefix, count in sorted(categories.items()):
-            f.write(f"-- {prefix}: {count} parts\n")
+            sql.comment(f"{prefix}: {count} parts")
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the final Mercedes parts database and its SQL import")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("FINAL MERCEDES PARTS DATABASE CREATION")
     print("="*60)
@@ -370,7 +378,8 @@ def main():
     
     # SQL export
     sql_file = output_dir / "mercedes_complete_import.sql"
-    generate_sql(parts, sql_file)
+    generate_sql(parts, sql_file, mode=args.sql_mode, batch_size=args.batch_size,
+                 max_file_bytes=args.max_file_bytes)
     
     print(f"✅ SQL exported: {sql_file}")
     
@@ -4,11 +4,15 @@ Focused Mercedes Parts Extraction
 Targets specific patterns and generates comprehensive part list
 """
 
+import argparse
 import re
 import json
 from pathlib import Path
 from collections import defaultdict
 
+from wislib.progress import Progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS_LONGEST
+
 class FocusedPartsExtractor:
     def __init__(self):
         self.parts = {}
@@ -27,14 +31,14 @@ class FocusedPartsExtractor:
         ]
         
         line_count = 0
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([filepath]), 'Scanning strings') as progress:
+            scanned = progress.file(filepath)
             for line in f:
                 line_count += 1
                 if limit and line_count > limit:
                     break
-                    
-                if line_count % 500000 == 0:
-                    print(f"  Processed {line_count:,} lines... Found {len(self.parts)} parts")
+                scanned.add(len(line))
                 
                 # Try all patterns
                 for pattern in patterns:
@@ -268,7 +272,7 @@ class FocusedPartsExtractor:
                     
         print(f"  Generated {generated} systematic part numbers")
         
-    def export_results(self, output_dir):
+    def export_results(self, output_dir, sql_mode='insert', batch_size=500, max_file_bytes=None):
         """Export all results"""
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
@@ -317,26 +321,19 @@ class FocusedPartsExtractor:
         
         # SQL file
         sql_file = output_path / 'mercedes_focused_import.sql'
-        with open(sql_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes Focused Parts Import\n")
-            f.write(f"-- Total: {len(self.parts)} parts\n\n")
-            f.write("BEGIN;\n\n")
+        with open_sql(sql_file, mode=sql_mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes Focused Parts Import")
+            sql.comment(f"Total: {len(self.parts)} parts")
+            sql.comment()
+            sql.begin()
             
-            for part_num, desc in sorted(self.parts.items()):
-                part_clean = part_num.replace("'", "''")
-                desc_clean = (desc or '').replace("'", "''")[:500]
-                
-                f.write(f"""INSERT INTO wis_parts (part_number, description)
-VALUES ('{part_clean}', '{desc_clean}')
-ON CONFLICT (part_number) DO UPDATE SET 
-  description = CASE 
-    WHEN LENGTH(EXCLUDED.description) > LENGTH(wis_parts.description) 
-    THEN EXCLUDED.description 
-    ELSE wis_parts.description 
-  END;
-""")
-                
-            f.write("\nCOMMIT;\n")
+            sql.write_rows(WIS_PARTS_LONGEST, (
+                (part_num, (desc or '')[:500])
+                for part_num, desc in sorted(self.parts.items())
+            ))
+            
+            sql.commit()
             
         print(f"✅ SQL exported: {sql_file}")
         
@@ -344,6 +341,10 @@ ON CONFLICT (part_number) DO UPDATE SET
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract Mercedes part numbers from the ripped WIS strings")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("FOCUSED MERCEDES PARTS EXTRACTION")
     print("="*60)
@@ -364,7 +365,9 @@ def main():
     
     # Export
     output_dir = "/Volumes/UnimogManuals/MERCEDES-FOCUSED-PARTS"
-    data = extractor.export_results(output_dir)
+    data = extractor.export_results(output_dir, sql_mode=args.sql_mode,
+                                    batch_size=args.batch_size,
+                                    max_file_bytes=args.max_file_bytes)
     
     print("\n" + "="*60)
     print("🎉 EXTRACTION COMPLETE!")
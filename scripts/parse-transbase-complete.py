@@ -4,14 +4,33 @@ TransBase Database Parser - Complete WIS Data Extraction
 Parses the actual TransBase rfile format from Mercedes WIS
 """
 
+import argparse
 import os
 import struct
 import re
 import json
-import sqlite3
 from pathlib import Path
 from typing import List, Dict, Any
-import hashlib
+
+from wislib.delta import DeltaTable, Manifest, diff, next_delta_path, write_delta
+from wislib.jsonl import open_jsonl
+from wislib.metrics import REGISTRY, counter, histogram
+from wislib.progress import Progress, file_progress, planned_sizes
+from wislib.snapshot import SnapshotWriter
+from wislib.sqlite_export import SQLiteTable, bulk_export
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS, WIS_PROCEDURES
+
+# Local SQLite layout, searchable through the *_fts tables
+SQLITE_PARTS = SQLiteTable('parts', ('part_number', 'description'),
+                           unique='part_number', fts=('part_number', 'description'))
+SQLITE_PROCEDURES = SQLiteTable('procedures', ('title', 'content'),
+                                fts=('title', 'content'))
+SQLITE_MODELS = SQLiteTable('models', ('model',), unique='model')
+
+DELTA_TABLES = [
+    DeltaTable('part', WIS_PARTS, 'part_number'),
+    DeltaTable('procedure', WIS_PROCEDURES, 'content'),
+]
 
 class TransBaseParser:
     """Parser for Mercedes WIS TransBase database files"""
@@ -36,6 +55,15 @@ class TransBaseParser:
             b'DATA': 'Data block'
         }
         
+        # Run metrics, written next to the exports at the end of main()
+        self.bytes_scanned = counter('bytes_scanned_total', 'Bytes of rfiles read', stage='parse')
+        self.pages_scanned = counter('pages_scanned_total', 'Database pages read', stage='parse')
+        self.pages_skipped = counter('pages_skipped_total', 'Empty pages skipped', stage='parse')
+        self.page_seconds = histogram('page_scan_seconds', 'Time to scan one page', stage='parse')
+        self.part_hits = counter('regex_hits_total', 'Pattern matches', pattern='part_number')
+        self.procedure_hits = counter('regex_hits_total', 'Pattern matches', pattern='procedure')
+        self.model_hits = counter('regex_hits_total', 'Pattern matches', pattern='unimog_model')
+        
     def parse_rfile(self, rfile_path):
         """Parse a single rfile database file"""
         print(f"Parsing {rfile_path}...")
@@ -44,6 +72,7 @@ class TransBaseParser:
         pages = file_size // self.page_size
         print(f"  File size: {file_size:,} bytes ({pages:,} pages)")
         
+        progress = file_progress(rfile_path)
         with open(rfile_path, 'rb') as f:
             page_num = 0
             
@@ -54,17 +83,21 @@ class TransBaseParser:
                     break
                     
                 page_num += 1
-                if page_num % 1000 == 0:
-                    print(f"  Processed {page_num:,} pages...")
+                progress.add(len(page_data))
+                self.pages_scanned.inc()
+                self.bytes_scanned.inc(len(page_data))
                 
                 # Parse page
-                self.parse_page(page_data, page_num)
+                with self.page_seconds.time():
+                    self.parse_page(page_data, page_num)
+        progress.finish()
                 
     def parse_page(self, page_data, page_num):
         """Parse a single database page"""
         
         # Skip empty pages
         if page_data[:4] == b'\x00\x00\x00\x00':
+            self.pages_skipped.inc()
             return
             
         # Look for Mercedes part numbers (A000 000 00 00 format)
@@ -75,6 +108,7 @@ class TransBaseParser:
         
         for match in part_matches:
             part_num = match.group(1).decode('ascii', errors='ignore')
+            self.part_hits.inc()
             
             # Try to extract description (next 200 bytes after part number)
             start = match.end()
@@ -102,6 +136,7 @@ class TransBaseParser:
             if pattern in page_data:
                 # Extract procedure text
                 pos = page_data.find(pattern)
+                self.procedure_hits.inc()
                 # Read until null terminator or end of page
                 end = page_data.find(b'\x00\x00', pos + len(pattern))
                 if end == -1:
@@ -123,6 +158,7 @@ class TransBaseParser:
         model_matches = re.finditer(unimog_pattern, page_data)
         for match in model_matches:
             model = match.group(2).decode('ascii', errors='ignore')
+            self.model_hits.inc()
             self.models.add(model)
             
     def extract_text(self, data):
@@ -154,57 +190,41 @@ class TransBaseParser:
                 # Extract any part numbers or procedures from index
                 self.parse_page(content, 0)
                 
-    def export_to_sql(self, output_file):
+    def export_to_sql(self, output_file, mode='insert', batch_size=500, max_file_bytes=None):
         """Export extracted data to SQL format"""
         print(f"\nGenerating SQL export: {output_file}")
         
-        sql_lines = []
-        sql_lines.append("-- Mercedes WIS Complete Database Import")
-        sql_lines.append("-- Extracted from TransBase database files")
-        sql_lines.append(f"-- Parts: {len(self.parts)} | Procedures: {len(self.procedures)}")
-        sql_lines.append("")
-        sql_lines.append("BEGIN;")
-        sql_lines.append("")
-        
-        # Export parts
-        sql_lines.append("-- Parts Catalog")
-        for part_num, desc in self.parts.items():
-            part_clean = part_num.replace("'", "''")
-            desc_clean = desc.replace("'", "''")[:500]
-            
-            sql = f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_clean}', '{desc_clean}', to_tsvector('english', '{part_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;"""
-            sql_lines.append(sql)
-            
-        sql_lines.append("")
-        sql_lines.append("-- Repair Procedures")
-        
-        # Export procedures
-        for proc_id, proc in self.procedures.items():
-            title = proc['title'].replace("'", "''")
-            content = proc['content'].replace("'", "''")
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Complete Database Import")
+            sql.comment("Extracted from TransBase database files")
+            sql.comment(f"Parts: {len(self.parts)} | Procedures: {len(self.procedures)}")
+            sql.comment()
+            sql.begin()
             
-            sql = f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;"""
-            sql_lines.append(sql)
+            sql.comment("Parts Catalog")
+            sql.write_rows(WIS_PARTS, (
+                (part_num, desc[:500])
+                for part_num, desc in self.parts.items()
+            ))
             
-        # Add model information
-        if self.models:
-            sql_lines.append("")
-            sql_lines.append("-- Model Information")
-            models_str = ', '.join(sorted(self.models))
-            sql_lines.append(f"-- Models found: {models_str}")
+            sql.comment()
+            sql.comment("Repair Procedures")
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc['title'], proc['content'], 'repair')
+                for proc in self.procedures.values()
+            ))
             
-        sql_lines.append("")
-        sql_lines.append("COMMIT;")
-        
-        # Write file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(sql_lines))
+            # Add model information
+            if self.models:
+                sql.comment()
+                sql.comment("Model Information")
+                sql.comment(f"Models found: {', '.join(sorted(self.models))}")
+                
+            sql.commit()
             
-        print(f"  SQL export complete: {len(sql_lines):,} lines")
+        print(f"  SQL export complete: {sql.rows:,} rows in {sql.statements:,} statements "
+              f"across {len(sql.paths)} file(s)")
         
     def export_to_json(self, output_file):
         """Export to JSON for review"""
@@ -219,11 +239,11 @@ ON CONFLICT DO NOTHING;"""
             'models': sorted(list(self.models)),
             'parts': [
                 {'part_number': k, 'description': v}
-                for k, v in list(self.parts.items())[:1000]
+                for k, v in self.parts.items()
             ],
             'procedures': [
                 {'id': k, 'title': v['title'], 'content': v['content']}
-                for k, v in list(self.procedures.items())[:500]
+                for k, v in self.procedures.items()
             ]
         }
         
@@ -232,72 +252,103 @@ ON CONFLICT DO NOTHING;"""
             
         print(f"  JSON export complete")
         
-    def create_sqlite_db(self, output_file):
-        """Create SQLite database for local testing"""
-        print(f"Creating SQLite database: {output_file}")
-        
-        conn = sqlite3.connect(output_file)
-        cursor = conn.cursor()
+    def export_to_jsonl(self, output_file, compress=False):
+        """Stream every part, procedure and model to JSON Lines"""
+        print(f"Generating JSONL export: {output_file}")
         
-        # Create tables
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                part_number TEXT UNIQUE,
-                description TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS procedures (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                content TEXT
-            )
-        """)
+        with open_jsonl(output_file, compress=compress) as out:
+            out.stats['statistics'] = {
+                'total_parts': len(self.parts),
+                'total_procedures': len(self.procedures),
+                'total_models': len(self.models)
+            }
+            out.write_many('model', ({'model': m} for m in sorted(self.models)))
+            out.write_many('part', (
+                {'part_number': k, 'description': v}
+                for k, v in self.parts.items()
+            ))
+            out.write_many('procedure', (
+                {'id': k, 'title': v['title'], 'content': v['content']}
+                for k, v in self.procedures.items()
+            ))
+            
+        print(f"  JSONL export complete: {out.total:,} records in {out.path.name}")
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS models (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                model TEXT UNIQUE
-            )
-        """)
+    def export_to_snapshot(self, output_file):
+        """Write a memory-mapped columnar snapshot (see wislib.snapshot)"""
+        print(f"Generating snapshot: {output_file}")
         
-        # Insert data
+        writer = SnapshotWriter()
+        source = self.db_path.name
+        for model in sorted(self.models):
+            writer.add_model(model)
         for part_num, desc in self.parts.items():
-            cursor.execute(
-                "INSERT OR IGNORE INTO parts (part_number, description) VALUES (?, ?)",
-                (part_num, desc)
-            )
-            
+            writer.add_part(part_num, desc, source=source)
         for proc in self.procedures.values():
-            cursor.execute(
-                "INSERT INTO procedures (title, content) VALUES (?, ?)",
-                (proc['title'], proc['content'])
-            )
+            writer.add_procedure(proc['title'], proc['content'], source=source)
+        writer.write(output_file)
+        
+        print(f"  Snapshot complete: {Path(output_file).stat().st_size:,} bytes")
+        
+    def export_delta(self, output_dir, fmt='sql', manifest_name='wis_complete.manifest',
+                     batch_size=500, max_file_bytes=None):
+        """Export only what changed since the previous run's manifest"""
+        output_dir = Path(output_dir)
+        manifest_file = output_dir / manifest_name
+        print(f"\nGenerating delta export ({fmt}) against {manifest_file.name}")
+        
+        rows = {
+            'part': [(part_num, desc[:500]) for part_num, desc in self.parts.items()],
+            'procedure': [(proc['title'], proc['content'], 'repair')
+                          for proc in self.procedures.values()],
+        }
+        manifest = Manifest.build(DELTA_TABLES, rows)
+        previous = Manifest.load(manifest_file) if manifest_file.exists() else None
+        if previous is None:
+            print("  No previous manifest; delta contains every record")
+        deltas = diff(previous, manifest)
+        
+        for table in DELTA_TABLES:
+            delta = deltas[table.kind]
+            print(f"  {table.spec.table}: {len(delta.inserted):,} inserted, "
+                  f"{len(delta.updated):,} updated, {len(delta.removed):,} removed")
             
-        for model in self.models:
-            cursor.execute(
-                "INSERT OR IGNORE INTO models (model) VALUES (?)",
-                (model,)
-            )
+        if previous is not None and not any(len(delta) for delta in deltas.values()):
+            print("  No changes; no delta written")
+            return
             
-        conn.commit()
+        # Numbered, so an earlier delta that has not been loaded yet is kept
+        output_file = next_delta_path(output_dir, suffix='.jsonl' if fmt == 'jsonl' else '.sql')
+        paths = write_delta(output_file, DELTA_TABLES, deltas, rows, fmt=fmt,
+                            batch_size=batch_size, max_file_bytes=max_file_bytes)
+        manifest.save(manifest_file)
+        print(f"  Delta written: {', '.join(p.name for p in paths)} "
+              f"(load every wis_delta-NNNN in order)")
         
-        # Get counts
-        parts_count = cursor.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
-        procs_count = cursor.execute("SELECT COUNT(*) FROM procedures").fetchone()[0]
-        models_count = cursor.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+    def create_sqlite_db(self, output_file):
+        """Create SQLite database for local testing and search"""
+        print(f"Creating SQLite database: {output_file}")
         
-        conn.close()
+        counts = bulk_export(output_file, [
+            (SQLITE_PARTS, self.parts.items()),
+            (SQLITE_PROCEDURES, (
+                (proc['title'], proc['content'])
+                for proc in self.procedures.values()
+            )),
+            (SQLITE_MODELS, ((model,) for model in sorted(self.models))),
+        ])
         
         print(f"  SQLite database created:")
-        print(f"    Parts: {parts_count:,}")
-        print(f"    Procedures: {procs_count:,}")
-        print(f"    Models: {models_count}")
+        print(f"    Parts: {counts['parts']:,}")
+        print(f"    Procedures: {counts['procedures']:,}")
+        print(f"    Models: {counts['models']}")
 
 
 def main():
+    arguments = argparse.ArgumentParser(description="Parse the WIS TransBase rfiles into SQL, JSONL, SQLite and a snapshot")
+    add_sql_arguments(arguments)
+    args = arguments.parse_args()
+    
     print("="*60)
     print("MERCEDES WIS TRANSBASE DATABASE PARSER")
     print("="*60)
@@ -312,8 +363,10 @@ def main():
     parser = TransBaseParser(db_dir)
     
     # Parse all rfiles
-    for rfile in sorted(db_dir.glob("rfile*.000")):
-        parser.parse_rfile(rfile)
+    rfiles = sorted(db_dir.glob("rfile*.000"))
+    with Progress(planned_sizes(rfiles), 'Parsing rfiles'):
+        for rfile in rfiles:
+            parser.parse_rfile(rfile)
         
     # Parse index files if available
     index_dir = db_dir / "index_files"
@@ -324,9 +377,14 @@ def main():
     output_dir = Path("/Volumes/UnimogManuals/WIS-FINAL")
     output_dir.mkdir(exist_ok=True)
     
-    parser.export_to_sql(output_dir / "wis_complete.sql")
-    parser.export_to_json(output_dir / "wis_complete.json")
+    parser.export_to_sql(output_dir / "wis_complete.sql", mode=args.sql_mode,
+                         batch_size=args.batch_size, max_file_bytes=args.max_file_bytes)
+    parser.export_to_jsonl(output_dir / "wis_complete.jsonl")
     parser.create_sqlite_db(output_dir / "wis_complete.db")
+    parser.export_to_snapshot(output_dir / "wis_complete.wsnap")
+    parser.export_delta(output_dir, fmt='copy' if args.sql_mode == 'copy' else 'sql',
+                        batch_size=args.batch_size, max_file_bytes=args.max_file_bytes)
+    REGISTRY.write(output_dir, 'parse-transbase-complete')
     
     # Print summary
     print("\n" + "="*60)
@@ -337,8 +395,12 @@ def main():
     print(f"✅ Models identified: {len(parser.models)}")
     print(f"\n📁 Output files in: {output_dir}")
     print("   - wis_complete.sql (for Supabase)")
-    print("   - wis_complete.json (for review)")
+    print("   - wis_complete.jsonl (all records, one per line)")
+    print("   - wis_complete.summary.json (for review)")
     print("   - wis_complete.db (SQLite for testing)")
+    print("   - wis_complete.wsnap (memory-mapped snapshot)")
+    print("   - wis_delta-NNNN.sql + .sha256 (changes since the last run; load in order)")
+    print("   - parse-transbase-complete.metrics.json + .prom (run metrics)")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ Direct Parser for Transbase Database rfiles
 Extracts WIS data from binary database files without needing Transbase software
 """
 
+import argparse
 import os
 import sys
 import struct
@@ -11,8 +12,18 @@ import json
 import re
 from pathlib import Path
 from typing import Dict, List, Any, Optional
-import sqlite3
-import hashlib
+
+from wislib.dedupe import DigestSet
+from wislib.sqlite_export import SQLiteTable, bulk_export
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_BULLETINS, WIS_PARTS, WIS_PROCEDURES
+from wislib.textquality import categorize
+
+# Local SQLite layout, searchable through the *_fts tables
+SQLITE_PROCEDURES = SQLiteTable('procedures', ('title', 'content', 'type'),
+                                fts=('title', 'content'))
+SQLITE_PARTS = SQLiteTable('parts', ('part_number', 'description'),
+                           unique='part_number', fts=('part_number', 'description'))
+SQLITE_BULLETINS = SQLiteTable('bulletins', ('content',), fts=('content',))
 
 class TransbaseParser:
     """Parser for Transbase database rfile format"""
@@ -26,6 +37,13 @@ class TransbaseParser:
             'models': [],
             'diagrams': []
         }
+        # Per-category digests, checked as items are found
+        self.seen = {key: DigestSet() for key in self.data}
+        
+    def add_item(self, category: str, item: Dict[str, Any]):
+        """Append item to category unless an identical one was already seen"""
+        if self.seen[category].add_record(item):
+            self.data[category].append(item)
         
     def parse_rfiles(self):
         """Parse all rfiles in directory"""
@@ -49,8 +67,8 @@ class TransbaseParser:
         strings = self.extract_strings(content, min_length=5)
         
         # Identify and categorize data
-        for string in strings:
-            self.categorize_string(string)
+        for string, category in zip(strings, categorize(strings)):
+            self.add_categorized(string, category)
             
     def extract_strings(self, data: bytes, min_length: int = 5) -> List[str]:
         """Extract ASCII and UTF-16 strings from binary data"""
@@ -80,44 +98,29 @@ class TransbaseParser:
         
     def categorize_string(self, text: str):
         """Categorize extracted string into appropriate data type"""
+        self.add_categorized(text, categorize([text])[0])
         
-        # Skip short or non-meaningful strings
-        if len(text) < 10 or text.count(' ') < 2:
-            return
-            
-        # Detect Mercedes part numbers (format: A123 456 78 90)
-        part_pattern = r'^[A-Z]\d{3}\s?\d{3}\s?\d{2}\s?\d{2}'
-        if re.match(part_pattern, text):
-            self.data['parts'].append({
+    def add_categorized(self, text: str, category: Optional[str]):
+        """Store a string under the category wislib.textquality.categorize gave it"""
+        if category == 'parts':
+            self.add_item('parts', {
                 'part_number': text.split()[0] if ' ' in text else text,
                 'description': ' '.join(text.split()[1:]) if ' ' in text else '',
                 'raw_text': text
             })
-            return
-            
-        # Detect procedures (usually start with action verbs)
-        procedure_keywords = ['Remove', 'Install', 'Check', 'Replace', 'Adjust', 
-                            'Test', 'Inspect', 'Repair', 'Clean', 'Disconnect']
-        for keyword in procedure_keywords:
-            if text.startswith(keyword):
-                self.data['procedures'].append({
-                    'title': text[:100],
-                    'content': text,
-                    'type': 'repair'
-                })
-                return
-                
-        # Detect bulletins (often have dates or bulletin numbers)
-        if re.search(r'\d{4}-\d{2}-\d{2}', text) or re.search(r'SB-\d+', text):
-            self.data['bulletins'].append({
+        elif category == 'procedures':
+            self.add_item('procedures', {
+                'title': text[:100],
+                'content': text,
+                'type': 'repair'
+            })
+        elif category == 'bulletins':
+            self.add_item('bulletins', {
                 'content': text,
                 'raw_text': text
             })
-            return
-            
-        # Detect model information
-        if 'Unimog' in text or re.search(r'U\d{3,4}', text):
-            self.data['models'].append({
+        elif category == 'models':
+            self.add_item('models', {
                 'description': text,
                 'raw_text': text
             })
@@ -177,21 +180,8 @@ class TransbaseParser:
     def export_to_json(self, output_file: str):
         """Export extracted data to JSON"""
         
-        # Remove duplicates
-        for key in self.data:
-            if self.data[key]:
-                # Use hash to identify duplicates
-                seen = set()
-                unique = []
-                for item in self.data[key]:
-                    item_hash = hashlib.md5(
-                        json.dumps(item, sort_keys=True).encode()
-                    ).hexdigest()
-                    if item_hash not in seen:
-                        seen.add(item_hash)
-                        unique.append(item)
-                self.data[key] = unique
-                
+        # Duplicates were already dropped by add_item() during the scan
+        
         # Statistics
         print("\n=== Extraction Statistics ===")
         for key, items in self.data.items():
@@ -203,123 +193,71 @@ class TransbaseParser:
             
         print(f"\nData exported to: {output_file}")
         
-    def export_to_sql(self, output_file: str):
+    def export_to_sql(self, output_file: str, mode: str = 'insert', batch_size: int = 500,
+                      max_file_bytes: Optional[int] = None):
         """Export extracted data to SQL format for Supabase"""
         
-        sql_statements = []
-        
-        # Create procedures insert statements
-        for proc in self.data['procedures']:
-            title = proc['title'].replace("'", "''")
-            content = proc['content'].replace("'", "''")
-            sql = f"""
-INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', '{proc.get('type', 'general')}', 
-        to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;
-"""
-            sql_statements.append(sql)
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("WIS Database Import")
+            sql.comment("Generated from Transbase rfiles")
+            sql.comment()
+            sql.begin()
             
-        # Create parts insert statements
-        for part in self.data['parts']:
-            part_num = part['part_number'].replace("'", "''")
-            desc = part['description'].replace("'", "''")
-            sql = f"""
-INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_num}', '{desc}', to_tsvector('english', '{part_num} {desc}'))
-ON CONFLICT (part_number) DO NOTHING;
-"""
-            sql_statements.append(sql)
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc['title'], proc['content'], proc.get('type', 'general'))
+                for proc in self.data['procedures']
+            ))
             
-        # Create bulletins insert statements
-        for bulletin in self.data['bulletins']:
-            content = bulletin['content'].replace("'", "''")
-            sql = f"""
-INSERT INTO wis_bulletins (content, search_vector)
-VALUES ('{content}', to_tsvector('english', '{content}'))
-ON CONFLICT DO NOTHING;
-"""
-            sql_statements.append(sql)
+            # Keep the first description seen for a part number
+            sql.write_rows(WIS_PARTS.with_options(update=None), (
+                (part['part_number'], part['description'])
+                for part in self.data['parts']
+            ))
             
-        # Write SQL file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("-- WIS Database Import\n")
-            f.write("-- Generated from Transbase rfiles\n\n")
-            f.write("BEGIN;\n\n")
+            sql.write_rows(WIS_BULLETINS, (
+                (bulletin['content'],)
+                for bulletin in self.data['bulletins']
+            ))
             
-            for sql in sql_statements:
-                f.write(sql + "\n")
-                
-            f.write("\nCOMMIT;\n")
+            sql.commit()
             
         print(f"SQL export created: {output_file}")
-        print(f"Total statements: {len(sql_statements)}")
+        print(f"Total rows: {sql.rows} in {sql.statements} statements")
         
     def create_sqlite_db(self, output_file: str):
-        """Create SQLite database for local testing"""
-        
-        conn = sqlite3.connect(output_file)
-        cursor = conn.cursor()
-        
-        # Create tables
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS procedures (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                content TEXT,
-                type TEXT
-            )
-        """)
+        """Create SQLite database for local testing and search"""
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                part_number TEXT UNIQUE,
-                description TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bulletins (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT
-            )
-        """)
-        
-        # Insert data
-        for proc in self.data['procedures']:
-            cursor.execute(
-                "INSERT OR IGNORE INTO procedures (title, content, type) VALUES (?, ?, ?)",
+        counts = bulk_export(output_file, [
+            (SQLITE_PROCEDURES, (
                 (proc['title'], proc['content'], proc.get('type', 'general'))
-            )
-            
-        for part in self.data['parts']:
-            cursor.execute(
-                "INSERT OR IGNORE INTO parts (part_number, description) VALUES (?, ?)",
+                for proc in self.data['procedures']
+            )),
+            (SQLITE_PARTS, (
                 (part['part_number'], part['description'])
-            )
-            
-        for bulletin in self.data['bulletins']:
-            cursor.execute(
-                "INSERT OR IGNORE INTO bulletins (content) VALUES (?)",
+                for part in self.data['parts']
+            )),
+            (SQLITE_BULLETINS, (
                 (bulletin['content'],)
-            )
-            
-        conn.commit()
-        conn.close()
+                for bulletin in self.data['bulletins']
+            )),
+        ])
         
         print(f"SQLite database created: {output_file}")
+        print(f"Rows: {counts}")
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python parse-transbase-rfiles.py <rfiles_directory> [output_dir]")
-        print("\nExample:")
-        print("  python parse-transbase-rfiles.py /Volumes/UnimogManuals/wis-forensic-extract")
-        sys.exit(1)
-        
-    rfile_dir = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    arguments = argparse.ArgumentParser(
+        description="Parse TransBase rfiles into JSON, SQL and SQLite",
+        epilog="Example: python parse-transbase-rfiles.py /Volumes/UnimogManuals/wis-forensic-extract")
+    arguments.add_argument('rfile_dir', help="directory with the rfiles")
+    arguments.add_argument('output_dir', nargs='?', default=".", help="output directory (default: .)")
+    add_sql_arguments(arguments)
+    args = arguments.parse_args()
+    
+    rfile_dir = args.rfile_dir
+    output_dir = args.output_dir
     
     if not os.path.exists(rfile_dir):
         print(f"Error: Directory {rfile_dir} not found")
@@ -351,7 +289,8 @@ def main():
     sqlite_file = output_path / "wis_data.db"
     
     parser.export_to_json(str(json_file))
-    parser.export_to_sql(str(sql_file))
+    parser.export_to_sql(str(sql_file), mode=args.sql_mode, batch_size=args.batch_size,
+                         max_file_bytes=args.max_file_bytes)
     parser.create_sqlite_db(str(sqlite_file))
     
     print("\n=== Extraction Complete ===")
@@ -3,11 +3,16 @@
 Process already extracted strings to find valid Mercedes parts and procedures
 """
 
+import argparse
 import re
 import json
 from pathlib import Path
 from collections import defaultdict
 
+from wislib.progress import Progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS, WIS_PROCEDURES
+from wislib.textquality import PROCEDURE, TextClassifier
+
 class StringsProcessor:
     def __init__(self):
         self.parts = {}
@@ -34,6 +39,10 @@ class StringsProcessor:
             'module', 'actuator', 'cylinder', 'piston', 'rod'
         ]
         
+        # Validates procedure candidates: length, words, special characters,
+        # leading verb and the text model
+        self.procedure_filter = TextClassifier(PROCEDURE)
+        
         # Procedure patterns
         self.procedure_patterns = [
             re.compile(r'(Remove\s+[^.]+\.)', re.IGNORECASE),
@@ -50,10 +59,11 @@ class StringsProcessor:
         """Process the parts_raw.txt file"""
         print(f"Processing {filepath}...")
         
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line_num, line in enumerate(f):
-                if line_num % 10000 == 0:
-                    print(f"  Processed {line_num:,} lines... Found {len(self.parts)} valid parts")
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([filepath]), 'Scanning parts') as progress:
+            scanned = progress.file(filepath)
+            for line in f:
+                scanned.add(len(line))
                 
                 # Look for part numbers
                 for pattern in self.part_patterns:
@@ -112,14 +122,23 @@ class StringsProcessor:
             
         return ""
         
-    def process_procedures_file(self, filepath):
+    def process_procedures_file(self, filepath, batch_size=4096):
         """Process the procedures_raw.txt file"""
         print(f"Processing {filepath}...")
         
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line_num, line in enumerate(f):
-                if line_num % 10000 == 0:
-                    print(f"  Processed {line_num:,} lines... Found {len(self.procedures)} procedures")
+        # Candidates are validated batch_size at a time
+        candidates = []
+        
+        def flush():
+            keep = self.procedure_filter.classify(candidates)
+            self.procedures.extend(proc for proc, ok in zip(candidates, keep) if ok)
+            candidates.clear()
+        
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([filepath]), 'Scanning procedures') as progress:
+            scanned = progress.file(filepath)
+            for line in f:
+                scanned.add(len(line))
                 
                 # Clean line
                 line = line.strip()
@@ -131,39 +150,20 @@ class StringsProcessor:
                     matches = pattern.findall(line)
                     for match in matches:
                         # Clean up procedure text
-                        proc = re.sub(r'\s+', ' ', match).strip()
-                        
-                        # Validate it's real text
-                        if self.is_valid_procedure(proc):
-                            self.procedures.append(proc)
+                        candidates.append(re.sub(r'\s+', ' ', match).strip())
+                
+                if len(candidates) >= batch_size:
+                    flush()
+        flush()
                             
         print(f"  Total procedures found: {len(self.procedures)}")
+        print(f"  📊 Procedure filter: {self.procedure_filter.throughput()}")
         
     def is_valid_procedure(self, text):
-        """Check if text is a valid procedure"""
-        # Must have reasonable length
-        if len(text) < 15 or len(text) > 300:
-            return False
-            
-        # Must have some words
-        words = text.split()
-        if len(words) < 3:
-            return False
-            
-        # Check for too many special characters
-        special_count = sum(1 for c in text if c in '{}[]<>@#$%^&*')
-        if special_count > len(text) * 0.1:
-            return False
-            
-        # Must start with a verb
-        first_word = words[0].lower()
-        if first_word not in ['remove', 'install', 'replace', 'check', 'adjust', 
-                              'test', 'inspect', 'torque', 'connect', 'disconnect']:
-            return False
-            
-        return True
+        """Check if text is a valid procedure (batch with procedure_filter.classify)"""
+        return self.procedure_filter.accept(text)
         
-    def export_results(self, output_dir):
+    def export_results(self, output_dir, sql_mode='insert', batch_size=500, max_file_bytes=None):
         """Export clean results"""
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
@@ -202,31 +202,23 @@ class StringsProcessor:
         
         # Generate SQL
         sql_file = output_path / 'clean_wis_import.sql'
-        with open(sql_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes WIS Clean Data Import\n")
-            f.write(f"-- Parts: {len(self.parts)} | Procedures: {len(self.procedures)}\n\n")
-            f.write("BEGIN;\n\n")
+        with open_sql(sql_file, mode=sql_mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Clean Data Import")
+            sql.comment(f"Parts: {len(self.parts)} | Procedures: {len(self.procedures)}")
+            sql.comment()
+            sql.begin()
             
-            # Parts
-            f.write("-- Parts Catalog\n")
-            for part_num, desc in self.parts.items():
-                part_clean = part_num.replace("'", "''")
-                desc_clean = desc.replace("'", "''")
-                f.write(f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_clean}', '{desc_clean}', to_tsvector('english', '{part_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;
-""")
-                
-            # Procedures
-            f.write("\n-- Repair Procedures\n")
-            for proc in self.procedures:
-                proc_clean = proc.replace("'", "''")
-                f.write(f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{proc_clean[:100]}', '{proc_clean}', 'repair', to_tsvector('english', '{proc_clean}'))
-ON CONFLICT DO NOTHING;
-""")
-                
-            f.write("\nCOMMIT;\n")
+            sql.comment("Parts Catalog")
+            sql.write_rows(WIS_PARTS, self.parts.items())
+            
+            sql.comment()
+            sql.comment("Repair Procedures")
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc[:100], proc, 'repair') for proc in self.procedures
+            ))
+            
+            sql.commit()
             
         print(f"✅ SQL exported: {sql_file}")
         
@@ -234,6 +226,10 @@ ON CONFLICT DO NOTHING;
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Clean the parts and procedures extracted from WIS strings")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("MERCEDES WIS STRINGS DATA PROCESSOR")
     print("="*60)
@@ -255,7 +251,8 @@ def main():
         
     # Export results
     output_dir = "/Volumes/UnimogManuals/WIS-CLEAN-EXTRACT"
-    processor.export_results(output_dir)
+    processor.export_results(output_dir, sql_mode=args.sql_mode, batch_size=args.batch_size,
+                             max_file_bytes=args.max_file_bytes)
     
     print("\n" + "="*60)
     print("🎉 CLEAN EXTRACTION COMPLETE!")
@@ -3,12 +3,17 @@
 Process full WIS data extraction - comprehensive parser
 """
 
+import argparse
 import re
 import json
-import hashlib
+from itertools import islice
 from pathlib import Path
 from collections import defaultdict, Counter
 
+from wislib.dedupe import DigestSet, record_id
+from wislib.progress import Progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_BULLETINS, WIS_PARTS, WIS_PROCEDURES
+
 class FullWISProcessor:
     def __init__(self, data_dir):
         self.data_dir = Path(data_dir)
@@ -34,12 +39,11 @@ class FullWISProcessor:
             re.compile(r'([A-Z]\d{9,10})')  # Alternative format
         ]
         
-        line_count = 0
-        with open(parts_file, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(parts_file, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([parts_file]), 'Scanning parts') as progress:
+            scanned = progress.file(parts_file)
             for line in f:
-                line_count += 1
-                if line_count % 10000 == 0:
-                    print(f"  Processed {line_count:,} part lines...")
+                scanned.add(len(line))
                 
                 line = line.strip()
                 if not line or len(line) < 10:
@@ -92,14 +96,13 @@ class FullWISProcessor:
             'seal', 'gasket', 'filter', 'cooler', 'actuator'
         ]
         
-        seen_procedures = set()
-        line_count = 0
+        seen_procedures = DigestSet()
         
-        with open(procedures_file, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(procedures_file, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([procedures_file]), 'Scanning procedures') as progress:
+            scanned = progress.file(procedures_file)
             for line in f:
-                line_count += 1
-                if line_count % 10000 == 0:
-                    print(f"  Processed {line_count:,} procedure lines...")
+                scanned.add(len(line))
                 
                 line = line.strip()
                 if not line or len(line) < 20 or len(line) > 500:
@@ -111,10 +114,8 @@ class FullWISProcessor:
                         # Check if it contains component keywords
                         line_lower = line.lower()
                         if any(comp in line_lower for comp in component_keywords):
-                            # Create hash to avoid duplicates
-                            proc_hash = hashlib.md5(line.encode()).hexdigest()
-                            if proc_hash not in seen_procedures:
-                                seen_procedures.add(proc_hash)
+                            # Digest check avoids duplicates
+                            if seen_procedures.add(line):
                                 self.procedures.append({
                                     'title': line[:100],
                                     'content': line,
@@ -167,96 +168,81 @@ class FullWISProcessor:
             re.compile(r'(Technical\s+Service\s+Bulletin.*?)(?=Technical|\n\n|$)', re.IGNORECASE)
         ]
         
+        seen_bulletins = DigestSet()
         with open(strings_file, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read(10000000)  # Read first 10MB
             
             for pattern in bulletin_patterns:
                 matches = pattern.findall(content)
                 for match in matches:
-                    if 20 < len(match) < 500:
-                        self.bulletins.append(match.strip())
+                    bulletin = match.strip()
+                    if 20 < len(match) < 500 and seen_bulletins.add(bulletin):
+                        self.bulletins.append(bulletin)
         
-        # Remove duplicates
-        self.bulletins = list(set(self.bulletins))
         print(f"  Found {len(self.bulletins)} bulletins")
         
-    def generate_sql(self, output_file):
+    def generate_sql(self, output_file, mode='insert', batch_size=500, max_file_bytes=None):
         """Generate comprehensive SQL import file"""
         print(f"\nGenerating SQL import file: {output_file}")
         
-        sql_lines = []
-        sql_lines.append("-- Comprehensive WIS Data Import")
-        sql_lines.append("-- Extracted from MERCEDES.raw forensic analysis")
-        sql_lines.append(f"-- Parts: {len(self.parts):,} | Procedures: {len(self.procedures):,}")
-        sql_lines.append("")
-        sql_lines.append("BEGIN;")
-        sql_lines.append("")
-        
-        # Add procedures (limit to 5000 for initial import)
-        sql_lines.append("-- Repair Procedures")
-        for proc in self.procedures[:5000]:
-            title = proc['title'].replace("'", "''")
-            content = proc['content'].replace("'", "''")
-            sql = f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;"""
-            sql_lines.append(sql)
-        
-        sql_lines.append("")
-        sql_lines.append("-- Parts Catalog")
-        
-        # Add parts (limit to 10000 for initial import)
-        for part_num, desc in list(self.parts.items())[:10000]:
-            part_clean = part_num.replace("'", "''")
-            desc_clean = desc.replace("'", "''")
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Comprehensive WIS Data Import")
+            sql.comment("Extracted from MERCEDES.raw forensic analysis")
+            sql.comment(f"Parts: {len(self.parts):,} | Procedures: {len(self.procedures):,}")
+            sql.comment()
+            sql.begin()
             
-            # Generate better description if empty
-            if not desc_clean:
-                if 'A9' in part_num:
-                    desc_clean = 'Mercedes-Benz Genuine Part'
-                elif 'A4' in part_num:
-                    desc_clean = 'Unimog Specific Component'
-                else:
-                    desc_clean = 'OEM Replacement Part'
+            # Add procedures (limit to 5000 for initial import)
+            sql.comment("Repair Procedures")
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc['title'], proc['content'], 'repair')
+                for proc in self.procedures[:5000]
+            ))
             
-            sql = f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_clean}', '{desc_clean}', to_tsvector('english', '{part_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;"""
-            sql_lines.append(sql)
-        
-        # Add models reference
-        if self.models:
-            sql_lines.append("")
-            sql_lines.append("-- Model References")
-            models_list = ', '.join(sorted(self.models))
-            sql_lines.append(f"-- Found models: {models_list}")
-        
-        # Add bulletins
-        if self.bulletins:
-            sql_lines.append("")
-            sql_lines.append("-- Service Bulletins")
-            for bulletin in self.bulletins[:100]:
-                bulletin_clean = bulletin.replace("'", "''")
-                # Extract bulletin number if present
-                bulletin_match = re.search(r'(SB[-\s]?\d+|Bulletin\s+\d+)', bulletin, re.IGNORECASE)
-                if bulletin_match:
-                    bulletin_num = bulletin_match.group(1)
-                else:
-                    bulletin_num = f"AUTO-{hashlib.md5(bulletin.encode()).hexdigest()[:8]}"
-                
-                sql = f"""INSERT INTO wis_bulletins (bulletin_number, content, search_vector)
-VALUES ('{bulletin_num}', '{bulletin_clean}', to_tsvector('english', '{bulletin_clean}'))
-ON CONFLICT DO NOTHING;"""
-                sql_lines.append(sql)
-        
-        sql_lines.append("")
-        sql_lines.append("COMMIT;")
-        
-        # Write file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(sql_lines))
-        
-        print(f"  SQL file created with {len(sql_lines):,} statements")
+            sql.comment()
+            sql.comment("Parts Catalog")
+            
+            # Add parts (limit to 10000 for initial import)
+            sql.write_rows(WIS_PARTS, (
+                (part_num, desc or self.fallback_description(part_num))
+                for part_num, desc in islice(self.parts.items(), 10000)
+            ))
+            
+            # Add models reference
+            if self.models:
+                sql.comment()
+                sql.comment("Model References")
+                sql.comment(f"Found models: {', '.join(sorted(self.models))}")
+            
+            # Add bulletins
+            if self.bulletins:
+                sql.comment()
+                sql.comment("Service Bulletins")
+                sql.write_rows(
+                    WIS_BULLETINS.with_options(columns=('bulletin_number', 'content')),
+                    ((self.bulletin_number(b), b) for b in self.bulletins[:100])
+                )
+            
+            sql.commit()
+        
+        print(f"  SQL created with {sql.rows:,} rows in {sql.statements:,} statements "
+              f"across {len(sql.paths)} file(s)")
+        
+    def fallback_description(self, part_num):
+        """Generic description for parts found without one"""
+        if 'A9' in part_num:
+            return 'Mercedes-Benz Genuine Part'
+        elif 'A4' in part_num:
+            return 'Unimog Specific Component'
+        return 'OEM Replacement Part'
+        
+    def bulletin_number(self, bulletin):
+        """Bulletin number from the text, or a stable generated one"""
+        bulletin_match = re.search(r'(SB[-\s]?\d+|Bulletin\s+\d+)', bulletin, re.IGNORECASE)
+        if bulletin_match:
+            return bulletin_match.group(1)
+        return f"AUTO-{record_id(bulletin)}"
         
     def generate_json(self, output_file):
         """Generate JSON export of all data"""
@@ -310,6 +296,10 @@ ON CONFLICT DO NOTHING;"""
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Process the full ripped WIS data into SQL and JSON")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("COMPREHENSIVE WIS DATA PROCESSOR")
     print("="*60)
@@ -326,7 +316,8 @@ def main():
     output_dir = Path("/Volumes/UnimogManuals/wis-processed")
     output_dir.mkdir(exist_ok=True)
     
-    processor.generate_sql(output_dir / "wis_full_import.sql")
+    processor.generate_sql(output_dir / "wis_full_import.sql", mode=args.sql_mode,
+                           batch_size=args.batch_size, max_file_bytes=args.max_file_bytes)
     processor.generate_json(output_dir / "wis_full_data.json")
     processor.print_summary()
     
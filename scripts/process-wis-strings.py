@@ -3,12 +3,17 @@
 Process extracted WIS strings and prepare for Supabase import
 """
 
+import argparse
 import re
 import json
-import hashlib
+from itertools import islice
 from pathlib import Path
 from collections import defaultdict
 
+from wislib.dedupe import DigestSet
+from wislib.progress import Progress, planned_sizes
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS, WIS_PROCEDURES
+
 class WISProcessor:
     def __init__(self, strings_file):
         self.strings_file = strings_file
@@ -18,6 +23,7 @@ class WISProcessor:
             'bulletins': [],
             'models': set()
         }
+        self.seen_procedures = DigestSet()
         
     def process(self):
         """Process the strings file"""
@@ -38,12 +44,13 @@ class WISProcessor:
                         'U1000', 'U1100', 'U1200', 'U1300', 'U1400', 'U1500', 'U1600', 'U1700',
                         'U2100', 'U2150', 'U2450', 'U3000', 'U4000', 'U5000', 'U5023', 'U20']
         
-        with open(self.strings_file, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(self.strings_file, 'r', encoding='utf-8', errors='ignore') as f, \
+                Progress(planned_sizes([self.strings_file]), 'Scanning strings') as progress:
+            scanned = progress.file(self.strings_file)
             line_count = 0
             for line in f:
                 line_count += 1
-                if line_count % 100000 == 0:
-                    print(f"Processed {line_count:,} lines...")
+                scanned.add(len(line))
                 
                 line = line.strip()
                 if len(line) < 10:
@@ -66,11 +73,13 @@ class WISProcessor:
                     if line.startswith(keyword) and len(line) > 20 and len(line) < 500:
                         # Filter out UI elements and code
                         if not any(x in line.lower() for x in ['icon', 'button', 'checkbox', '_', '.dll', '.exe']):
-                            self.data['procedures'].append({
-                                'title': line[:100],
-                                'content': line,
-                                'keyword': keyword
-                            })
+                            # Duplicates are dropped here rather than in a post-pass
+                            if self.seen_procedures.add(line):
+                                self.data['procedures'].append({
+                                    'title': line[:100],
+                                    'content': line,
+                                    'keyword': keyword
+                                })
                             break
                 
                 # Extract Unimog model references
@@ -85,55 +94,31 @@ class WISProcessor:
         
         print(f"Total lines processed: {line_count:,}")
         
-    def deduplicate_procedures(self):
-        """Remove duplicate procedures"""
-        seen = set()
-        unique = []
-        for proc in self.data['procedures']:
-            # Create hash of content
-            proc_hash = hashlib.md5(proc['content'].encode()).hexdigest()
-            if proc_hash not in seen:
-                seen.add(proc_hash)
-                unique.append(proc)
-        self.data['procedures'] = unique
-        
-    def generate_sql(self, output_file):
+    def generate_sql(self, output_file, mode='insert', batch_size=500, max_file_bytes=None):
         """Generate SQL for Supabase import"""
-        sql_lines = []
-        
-        # Insert parts
-        for part_num, description in list(self.data['parts'].items())[:10000]:  # Limit to 10k for initial import
-            part_num = part_num.replace("'", "''")
-            desc = description.replace("'", "''")[:500]  # Limit description length
-            
-            sql = f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_num}', '{desc}', to_tsvector('english', '{part_num} {desc}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;"""
-            sql_lines.append(sql)
-        
-        # Insert procedures
-        for proc in self.data['procedures'][:5000]:  # Limit to 5k for initial import
-            title = proc['title'].replace("'", "''")
-            content = proc['content'].replace("'", "''")
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("WIS Data Import from extracted strings")
+            sql.comment("Auto-generated from MERCEDES.raw extraction")
+            sql.comment()
+            sql.begin()
             
-            sql = f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;"""
-            sql_lines.append(sql)
-        
-        # Write SQL file
-        with open(output_file, 'w') as f:
-            f.write("-- WIS Data Import from extracted strings\n")
-            f.write("-- Auto-generated from MERCEDES.raw extraction\n\n")
-            f.write("BEGIN;\n\n")
+            # Insert parts (limit to 10k for initial import)
+            sql.write_rows(WIS_PARTS, (
+                (part_num, description[:500])
+                for part_num, description in islice(self.data['parts'].items(), 10000)
+            ))
             
-            for sql in sql_lines:
-                f.write(sql + "\n")
+            # Insert procedures (limit to 5k for initial import)
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc['title'], proc['content'], 'repair')
+                for proc in self.data['procedures'][:5000]
+            ))
             
-            f.write("\nCOMMIT;\n")
+            sql.commit()
         
         print(f"SQL file generated: {output_file}")
-        print(f"Total SQL statements: {len(sql_lines)}")
+        print(f"Total rows: {sql.rows} in {sql.statements} statements")
         
     def save_json(self, output_file):
         """Save data as JSON"""
@@ -184,11 +169,14 @@ ON CONFLICT DO NOTHING;"""
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract parts, procedures and models from WIS strings")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     processor = WISProcessor("/Volumes/UnimogManuals/wis-ripped-data/strings_ascii.txt")
     
     print("Starting WIS data processing...")
     processor.process()
-    processor.deduplicate_procedures()
     processor.print_statistics()
     
     # Save outputs
@@ -196,7 +184,8 @@ if __name__ == "__main__":
     output_dir.mkdir(exist_ok=True)
     
     processor.save_json(output_dir / "wis_data.json")
-    processor.generate_sql(output_dir / "wis_import.sql")
+    processor.generate_sql(output_dir / "wis_import.sql", mode=args.sql_mode,
+                           batch_size=args.batch_size, max_file_bytes=args.max_file_bytes)
     
     print("\n✅ Processing complete!")
     print(f"Output files in: {output_dir}")
\ No newline at end of file
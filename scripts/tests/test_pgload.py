@@ -0,0 +1,142 @@
+"""
+Loading into the Supabase WIS schema twice must not duplicate rows
+Applies supabase/migrations/20250821120900_create_wis_tables.sql in a
+throwaway schema of the database at $PG_DSN and loads the same export
+twice. Covers the ON CONFLICT targets against the migration's UNIQUE
+constraints and the anti-join for rows without a vehicle.
+
+  PG_DSN=postgresql://localhost/postgres python -m pytest scripts/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wislib.jsonl import JSONLWriter
+from wislib.pgload import HAS_PSYCOPG2, load_files
+
+if HAS_PSYCOPG2:
+    import psycopg2
+    from psycopg2.extensions import make_dsn
+
+PG_DSN = os.environ.get('PG_DSN')
+MIGRATION = (Path(__file__).resolve().parents[2] / 'supabase' / 'migrations'
+             / '20250821120900_create_wis_tables.sql')
+SCHEMA = f"wis_load_test_{os.getpid()}"
+TABLES = ('wis_models', 'wis_parts', 'wis_procedures', 'wis_bulletins')
+
+RECORDS = [
+    ('model', {'model': 'U1300L'}),
+    ('model', {'model': '406'}),
+    # Same key as a migration sample row: must update it, not add one
+    ('part', {'part_number': '366-180-00-09', 'description': 'Oil filter OM366',
+              'model': 'U1300L'}),
+    ('part', {'part_number': 'A406 180 00 10', 'description': 'Oil filter OM352',
+              'model': 'U406'}),
+    # No model: UNIQUE (vehicle_id, part_number) never conflicts on NULL
+    ('part', {'part_number': 'A000 989 25 03', 'description': 'Drain plug gasket'}),
+    ('part', {'part_number': 'A000 989 25 03', 'description': 'Drain plug gasket (again)'}),
+    ('procedure', {'procedure_code': 'ENG001', 'title': 'Engine Oil Change - OM366',
+                   'content': 'Drain, replace filter, refill.', 'model': 'U1300L'}),
+    ('procedure', {'title': 'Portal axle oil check', 'content': 'Check level at the plug.'}),
+    ('bulletin', {'bulletin_number': 'SB-406-01', 'title': 'Brake hose routing',
+                  'content': 'Reroute the front hoses.', 'model': '406'}),
+    ('bulletin', {'bulletin_number': 'SB-GEN-01', 'title': 'Coolant change interval',
+                  'content': 'Every two years.'}),
+]
+
+
+@unittest.skipUnless(PG_DSN, "set PG_DSN to run the PostgreSQL load tests")
+@unittest.skipUnless(HAS_PSYCOPG2, "psycopg2 is not installed")
+class TestPostgresLoad(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dsn = make_dsn(PG_DSN, options=f"-c search_path={SCHEMA},public")
+        conn = psycopg2.connect(PG_DSN)
+        try:
+            with conn, conn.cursor() as cur:
+                # The migration's RLS policies name Supabase's role
+                cur.execute("""
+                    DO $$ BEGIN
+                        IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+                            CREATE ROLE authenticated NOLOGIN;
+                        END IF;
+                    END $$
+                """)
+                cur.execute(f"CREATE SCHEMA {SCHEMA}")
+                cur.execute(f"SET search_path = {SCHEMA}, public")
+                cur.execute(MIGRATION.read_text(encoding='utf-8'))
+        finally:
+            conn.close()
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.export = Path(cls.tmp.name) / 'export.jsonl'
+        with JSONLWriter(cls.export) as writer:
+            for kind, record in RECORDS:
+                writer.write(kind, record)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        conn = psycopg2.connect(PG_DSN)
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn.cursor() as cur:
+                result = {}
+                for table in TABLES:
+                    cur.execute(f"SELECT count(*) FROM {table}")
+                    result[table] = cur.fetchone()[0]
+                return result
+        finally:
+            conn.close()
+
+    def query(self, sql, *args):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, args)
+                return cur.fetchall()
+        finally:
+            conn.close()
+
+    def test_load_twice_is_idempotent(self):
+        before = self.counts()
+        first = load_files(self.dsn, [self.export])
+        after_first = self.counts()
+        second = load_files(self.dsn, [self.export])
+        after_second = self.counts()
+
+        self.assertEqual(after_second, after_first)
+        # One new model (U406); the sample ENG001 and oil filter rows are updated in place
+        self.assertEqual(after_first['wis_models'], before['wis_models'] + 1)
+        self.assertEqual(after_first['wis_parts'], before['wis_parts'] + 2)
+        self.assertEqual(after_first['wis_procedures'], before['wis_procedures'] + 1)
+        self.assertEqual(after_first['wis_bulletins'], before['wis_bulletins'] + 2)
+
+        # Rows with a vehicle are re-merged as updates; vehicle-less ones are skipped
+        self.assertEqual(first['wis_parts'], (3, 3))
+        self.assertEqual(second['wis_parts'], (3, 2))
+        self.assertEqual(second['wis_bulletins'], (2, 1))
+
+        self.assertEqual(self.query(
+            "SELECT description FROM wis_parts WHERE part_number = %s", '366-180-00-09'),
+            [('Oil filter OM366',)])
+        self.assertEqual(self.query(
+            "SELECT count(*) FROM wis_parts WHERE vehicle_id IS NULL AND part_number = %s",
+            'A000 989 25 03'), [(1,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Source probing must find a late source and give up at the deadline
+Probes a local http.server that only starts listening after a delay, a
+closed TCP port, a temporary directory and a missing path with
+first_viable(), all_viable() and the blocking wrappers.
+
+  python -m pytest scripts/tests
+"""
+
+import asyncio
+import functools
+import http.server
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wislib.probe import (Backoff, all_viable, find_source, find_sources, first_viable,
+                          path_probes, port_probes, url_probes)
+
+HOST = '127.0.0.1'
+START_DELAY = 0.5
+# Quick retries keep the test short
+BACKOFF = Backoff(initial=0.05, maximum=0.2)
+
+
+def free_port() -> int:
+    """A port nothing listens on (bound once, then released)"""
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class TestProbe(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.closed_port = free_port()
+        self.missing = str(Path(self.tmp.name) / 'missing')
+        self.server = None
+        self.timer = None
+
+    def tearDown(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.tmp.cleanup()
+
+    def start_server(self, port: int):
+        handler = functools.partial(QuietHandler, directory=self.tmp.name)
+        self.server = http.server.ThreadingHTTPServer((HOST, port), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def dead_probes(self):
+        return (port_probes([HOST], [self.closed_port], timeout=0.2)
+                + path_probes([self.missing], timeout=0.2))
+
+    def test_first_viable_waits_for_late_server(self):
+        port = free_port()
+        url = f"http://{HOST}:{port}/"
+        self.timer = threading.Timer(START_DELAY, self.start_server, args=(port,))
+        self.timer.start()
+
+        source = asyncio.run(first_viable(self.dead_probes() + url_probes([url], timeout=0.5),
+                                          deadline=10, backoff=BACKOFF))
+
+        self.assertIsNotNone(source)
+        self.assertEqual((source.kind, source.target, source.detail), ('http', url, 'HTTP 200'))
+        self.assertGreaterEqual(source.seconds, START_DELAY * 0.9)
+        self.assertLess(source.seconds, 5)
+
+    def test_all_viable_reports_every_live_source(self):
+        port = free_port()
+        self.start_server(port)
+        url = f"http://{HOST}:{port}/"
+        probes = (self.dead_probes() + port_probes([HOST], [port]) + url_probes([url])
+                  + path_probes([self.tmp.name]))
+
+        sources = asyncio.run(all_viable(probes, deadline=5))
+
+        self.assertEqual(sorted((s.kind, s.target) for s in sources),
+                         [('http', url), ('path', self.tmp.name), ('port', f"{HOST}:{port}")])
+        self.assertEqual(sorted(s.target for s in find_sources(probes, deadline=5)),
+                         sorted(s.target for s in sources))
+
+    def test_first_viable_gives_up_at_deadline(self):
+        deadline = 0.6
+        started = time.monotonic()
+        source = find_source(self.dead_probes(), deadline=deadline, backoff=BACKOFF)
+        elapsed = time.monotonic() - started
+
+        self.assertIsNone(source)
+        self.assertGreaterEqual(elapsed, deadline * 0.9)
+        self.assertLess(elapsed, deadline + 1)
+
+    def test_all_viable_retries_until_deadline(self):
+        port = free_port()
+        url = f"http://{HOST}:{port}/"
+        # Starts after the deadline: never seen
+        self.timer = threading.Timer(2.0, self.start_server, args=(port,))
+        self.timer.start()
+        started = time.monotonic()
+        sources = asyncio.run(all_viable(self.dead_probes() + url_probes([url], timeout=0.2),
+                                         deadline=0.6, backoff=BACKOFF))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(sources, [])
+        self.assertLess(elapsed, 1.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+The textquality presets must decide like the heuristics they replaced
+The old per-string functions are copied here verbatim and compared with
+TextClassifier on a sample of real text (including the WIS docs of this
+repo) and generated garbage, on both the NumPy and the pure-Python path.
+
+  python -m pytest scripts/tests
+"""
+
+import random
+import re
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wislib.textquality import (HAS_NUMPY, MEANINGFUL, NOT_GARBAGE, PROCEDURE,
+                                TextClassifier)
+
+REPO = Path(__file__).resolve().parents[2]
+
+
+# ============== Old heuristics ==============
+
+def is_meaningful_text(text: str) -> bool:
+    """MercedesWISExtractor.is_meaningful_text"""
+    if not re.search(r'[a-zA-Z]{3,}', text):
+        return False
+    alnum_ratio = len([c for c in text if c.isalnum()]) / len(text)
+    if alnum_ratio < 0.5:
+        return False
+    keywords = ['mercedes', 'unimog', 'engine', 'brake', 'transmission',
+                'oil', 'filter', 'bearing', 'shaft', 'valve', 'sensor',
+                'U300', 'U400', 'U500', 'U1000', 'U2000', 'U3000', 'U4000', 'U5000']
+    text_lower = text.lower()
+    for keyword in keywords:
+        if keyword in text_lower:
+            return True
+    if len(text.split()) > 3:
+        return True
+    return False
+
+
+def is_garbage_text(text: str) -> bool:
+    """WISFinalExtractor.is_garbage_text"""
+    special_count = sum(1 for c in text if c in '{}[]<>@#$%^&*')
+    if special_count > len(text) * 0.2:
+        return True
+    words = text.split()
+    if not words:
+        return True
+    avg_word_len = sum(len(w) for w in words) / len(words)
+    if avg_word_len < 2 or avg_word_len > 15:
+        return True
+    return False
+
+
+def is_valid_procedure(text: str) -> bool:
+    """StringsProcessor.is_valid_procedure"""
+    if len(text) < 15 or len(text) > 300:
+        return False
+    words = text.split()
+    if len(words) < 3:
+        return False
+    special_count = sum(1 for c in text if c in '{}[]<>@#$%^&*')
+    if special_count > len(text) * 0.1:
+        return False
+    first_word = words[0].lower()
+    if first_word not in ['remove', 'install', 'replace', 'check', 'adjust',
+                          'test', 'inspect', 'torque', 'connect', 'disconnect']:
+        return False
+    return True
+
+
+# ============== Sample ==============
+
+SAMPLE = [
+    "Add the JAR file to DbVisualizer",
+    "Fehlercode im Steuergerät gespeichert",
+    "Part number lookup table for transmission UG 3/40",
+    "OM 366 LA Turbocharger",
+    "Remove the injection pump and install the new seal ring",
+    "Check brake fluid level",
+    "Torque cylinder head bolts {stage 1}",
+    "Install",
+    "U300 spare",
+    "Unimog U1300L",
+    "| Memory Usage | < 5MB | ~2MB | ✅ |",
+    "│       └── UpgradePage.tsx          ✅ Upgrade page",
+    "Ölwechsel am Motor durchführen — Schritt 2",
+    "日本語のテキスト 部品 番号",
+    "a b c d e",
+    "Supercalifragilisticexpialidocious antidisestablishmentarianism",
+    "@@##$$%%^^&&**",
+    "x",
+    "    ",
+    "A123 456 78 90 seal ring",
+    "　ideographic　space　separated words",
+    "tab\tseparated\x1fwords here",
+]
+
+
+def doc_lines():
+    lines = set()
+    for path in sorted(REPO.glob('WIS*.md')):
+        for line in path.read_text(encoding='utf-8', errors='replace').splitlines():
+            if line.strip():
+                lines.add(line.strip())
+    return sorted(lines)
+
+
+def garbage(count: int = 2000):
+    rng = random.Random(41)
+    alphabet = 'abcxyz ABC 0123 {}[]<>@#$%^&* \x01\x7f é ß ✅'
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 60)))
+            for _ in range(count)]
+
+
+class TestPresets(unittest.TestCase):
+    CASES = [
+        (MEANINGFUL, is_meaningful_text),
+        (NOT_GARBAGE, lambda text: not is_garbage_text(text)),
+        (PROCEDURE, is_valid_procedure),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.texts = SAMPLE + doc_lines() + garbage()
+
+    def check(self, use_numpy: bool):
+        for thresholds, old in self.CASES:
+            classifier = TextClassifier(thresholds, use_numpy=use_numpy)
+            decisions = classifier.classify(self.texts)
+            differ = [(text, new) for text, new in zip(self.texts, decisions) if new != old(text)]
+            self.assertEqual(differ, [], f"{len(differ)} decisions differ from {old.__doc__ or old}")
+
+    def test_python_path_matches_old_heuristics(self):
+        self.check(use_numpy=False)
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_numpy_path_matches_old_heuristics(self):
+        self.check(use_numpy=True)
+
+    def test_language_model_is_opt_in(self):
+        for thresholds, _ in self.CASES:
+            self.assertIsNone(thresholds.min_lm_score)
+        strict = TextClassifier(MEANINGFUL).tuned(min_lm_score=0.5)
+        self.assertEqual(strict.thresholds.min_lm_score, 0.5)
+        self.assertEqual(strict.classify(["qxzv jjkw pqqz vvxk wzzq"]), [False])
+
+
+if __name__ == '__main__':
+    unittest.main()
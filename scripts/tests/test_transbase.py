@@ -0,0 +1,179 @@
+"""
+The parallel TransBase extractor must export the same rows as a plain read
+Runs WISExtractor.export_data from extract-wis-transbase.py against a
+SQLite stand-in opened through connect_sqlite(), with a small pool and a
+partition_rows low enough that parts and procedures are read in key ranges.
+Covers record counts, key order across ranges, unchanged jobs replayed
+without a query (SKIP), grown tables fetching only the new keys (APPEND),
+and that no more than max_connections connections are ever borrowed.
+
+  python -m pytest scripts/tests
+"""
+
+import importlib.util
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wislib.jsonl import iter_records
+from wislib.transbase import connect_sqlite
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'extract-wis-transbase.py'
+MAX_CONNECTIONS = 3
+PARTITION_ROWS = 20
+PARTS = 200
+PROCEDURES = 40
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location('extract_wis_transbase', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def part(i):
+    return (i, f"A{i:06d}", f"Unimog part {i}" if i % 10 == 0 else f"Part {i}")
+
+
+def procedure(i):
+    return (i, f"Procedure {i}", "Unimog portal axle" if i % 4 == 0 else "Check the level")
+
+
+class TestParallelExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.script = load_script()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = str(Path(self.tmp.name) / 'wis.sqlite')
+        self.output = Path(self.tmp.name) / 'out'
+        conn = sqlite3.connect(self.db)
+        with conn:
+            conn.execute("CREATE TABLE parts (part_id INTEGER, part_number TEXT, description TEXT)")
+            conn.execute("CREATE TABLE procedures (proc_id INTEGER, title TEXT, content TEXT)")
+            conn.executemany("INSERT INTO parts VALUES (?, ?, ?)",
+                             [part(i) for i in reversed(range(PARTS))])
+            # NULL keys are read by a range of their own
+            conn.executemany("INSERT INTO parts VALUES (?, ?, ?)",
+                             [(None, 'A-NULL-1', 'Unimog clamp'), (None, 'A-NULL-2', 'Clamp')])
+            conn.executemany("INSERT INTO procedures VALUES (?, ?, ?)",
+                             [procedure(i) for i in range(PROCEDURES)])
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def export(self):
+        """Run export_data once; returns records by kind, the SQL executed,
+        the connections opened and the most borrowed from the pool at once"""
+        statements, opened = [], []
+        connect = connect_sqlite(self.db)
+
+        def traced():
+            conn = connect()
+            conn.set_trace_callback(statements.append)
+            opened.append(conn)
+            return conn
+
+        extractor = self.script.WISExtractor(arraysize=7, max_connections=MAX_CONNECTIONS,
+                                             partition_rows=PARTITION_ROWS)
+        extractor.open(traced, f"sqlite://{self.db}")
+        pool = extractor.pool
+        lock = threading.Lock()
+        borrowed = {'now': 0, 'max': 0}
+        getconn, putconn = pool.getconn, pool.putconn
+
+        def counting_getconn(block=True):
+            conn = getconn(block)
+            if conn is not None:
+                with lock:
+                    borrowed['now'] += 1
+                    borrowed['max'] = max(borrowed['max'], borrowed['now'])
+            return conn
+
+        def counting_putconn(conn):
+            with lock:
+                borrowed['now'] -= 1
+            putconn(conn)
+
+        pool.getconn, pool.putconn = counting_getconn, counting_putconn
+        try:
+            extractor.export_data(self.output)
+        finally:
+            extractor.close()
+
+        records = {}
+        for kind, record in iter_records(self.output / 'wis_extracted.jsonl'):
+            records.setdefault(kind, []).append(record)
+        return records, statements, len(opened), borrowed['max']
+
+    def expected_unimog(self, parts=PARTS):
+        return (sum(1 for i in range(parts) if i % 10 == 0) + 1
+                + sum(1 for i in range(PROCEDURES) if i % 4 == 0))
+
+    def assertKeyOrder(self, records, key, count):
+        keys = [r[key] for r in records if r[key] is not None]
+        self.assertEqual(keys, list(range(count)))
+
+    def test_partitioned_export(self):
+        records, statements, opened, borrowed = self.export()
+
+        self.assertEqual(len(records['part']), PARTS + 2)
+        self.assertEqual(len(records['procedure']), PROCEDURES)
+        self.assertEqual(len(records['unimog']), self.expected_unimog())
+        # Ranges are replayed in key order, the NULL range last
+        self.assertKeyOrder(records['part'], 'part_id', PARTS)
+        self.assertEqual([r['part_id'] for r in records['part'][-2:]], [None, None])
+        self.assertKeyOrder(records['procedure'], 'proc_id', PROCEDURES)
+        self.assertTrue(any('part_id IS NULL' in s for s in statements))
+
+        # The primary connection plus at most max_connections pooled ones
+        self.assertLessEqual(borrowed, MAX_CONNECTIONS)
+        self.assertLessEqual(opened, MAX_CONNECTIONS + 1)
+
+    def test_unchanged_tables_are_skipped(self):
+        first, _, _, _ = self.export()
+        second, statements, _, borrowed = self.export()
+
+        self.assertEqual(second['part'], first['part'])
+        self.assertEqual(second['procedure'], first['procedure'])
+        # Unimog batches of different tables arrive interleaved
+        for table in ('parts', 'procedures'):
+            self.assertEqual(
+                [r for r in second['unimog'] if r['_source_table'] == table],
+                [r for r in first['unimog'] if r['_source_table'] == table])
+        self.assertFalse([s for s in statements if s.startswith('SELECT * FROM')])
+        self.assertLessEqual(borrowed, MAX_CONNECTIONS)
+
+    def test_grown_table_fetches_new_keys_only(self):
+        self.export()
+        grown = PARTS + 2 * PARTITION_ROWS
+        conn = sqlite3.connect(self.db)
+        with conn:
+            conn.executemany("INSERT INTO parts VALUES (?, ?, ?)",
+                             [part(i) for i in range(PARTS, grown)])
+        conn.close()
+
+        records, statements, _, borrowed = self.export()
+
+        self.assertEqual(len(records['part']), grown + 2)
+        self.assertEqual(len({r['part_number'] for r in records['part']}), grown + 2)
+        self.assertEqual(len(records['procedure']), PROCEDURES)
+        self.assertEqual(len(records['unimog']), self.expected_unimog(grown))
+        self.assertKeyOrder(records['part'], 'part_id', grown)
+        reads = [s for s in statements if s.startswith('SELECT * FROM parts')]
+        self.assertTrue(reads)
+        self.assertTrue(all(f"part_id > {PARTS - 1}" in s for s in reads))
+        self.assertLessEqual(borrowed, MAX_CONNECTIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
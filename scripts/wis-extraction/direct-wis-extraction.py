@@ -6,75 +6,47 @@ Alternative to DbVisualizer for automated extraction
 
 import os
 import csv
+import sys
 import json
-import socket
 import struct
-import time
+import urllib.request
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from wislib.probe import find_source, find_sources, path_probes, port_probes, url_probes
+
 # Configuration
-WIS_HOST = "localhost"  # or "10.0.2.15" for QEMU NAT
+WIS_HOSTS = ["localhost", "10.0.2.15"]  # direct / QEMU NAT
 WIS_PORT = 2054
 EXPORT_DIR = "/Volumes/UnimogManuals/wis-complete-extraction"
+# Seconds to keep probing while the VM boots
+PROBE_DEADLINE = 90
 
-def wait_for_wis():
-    """Wait for WIS database to be available"""
-    print("⏳ Waiting for WIS database on port 2054...")
-    max_attempts = 30
-    for i in range(max_attempts):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex((WIS_HOST, WIS_PORT))
-            sock.close()
-            if result == 0:
-                print("✅ WIS database is accessible!")
-                return True
-        except:
-            pass
-        time.sleep(2)
-        print(f"   Attempt {i+1}/{max_attempts}...")
-    return False
+# Common WIS web interfaces
+WIS_URLS = [
+    f"http://{host}:{port}/{path}"
+    for host in WIS_HOSTS
+    for port, path in ((8080, "wis/export"), (8081, "api/export"), (9090, "wisnet/data"))
+]
 
-def extract_via_http():
-    """
-    Try to extract via HTTP if WIS has web interface
-    """
-    import urllib.request
-    import urllib.parse
-    
-    # Common WIS web interfaces
-    urls = [
-        f"http://{WIS_HOST}:8080/wis/export",
-        f"http://{WIS_HOST}:8081/api/export",
-        f"http://{WIS_HOST}:9090/wisnet/data"
-    ]
-    
-    for url in urls:
-        try:
-            response = urllib.request.urlopen(url, timeout=5)
-            if response.status == 200:
-                print(f"✅ Found WIS web interface at {url}")
-                return response.read()
-        except:
-            continue
-    return None
+# Shared folders the VM may export into
+SHARED_PATHS = [
+    "/Volumes/MERCEDES/export",
+    "/Volumes/WIS/export",
+    "/tmp/wis-export"
+]
 
-def extract_from_shared_folder():
+def all_probes():
+    return (port_probes(WIS_HOSTS, [WIS_PORT]) + url_probes(WIS_URLS) +
+            path_probes(SHARED_PATHS))
+
+def extract_via_http(url):
     """
-    Check if VM has shared folder with exports
+    Extract via the WIS web interface at a URL the probes found answering
     """
-    shared_paths = [
-        "/Volumes/MERCEDES/export",
-        "/Volumes/WIS/export",
-        "/tmp/wis-export"
-    ]
-    
-    for path in shared_paths:
-        if os.path.exists(path):
-            print(f"✅ Found shared folder: {path}")
-            return path
-    return None
+    print(f"✅ Found WIS web interface at {url}")
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
 
 def parse_rfile_header(data):
     """
@@ -174,27 +146,39 @@ def main():
     print("🚀 Direct WIS Extraction Tool")
     print("=" * 40)
     
-    # Check if WIS is accessible
-    if not wait_for_wis():
-        print("❌ WIS database not accessible")
+    # Probe database ports, web interfaces and shared folders concurrently
+    print(f"⏳ Probing {len(all_probes())} WIS sources (up to {PROBE_DEADLINE}s)...")
+    first = find_source(all_probes(), PROBE_DEADLINE)
+    if not first:
+        print("❌ No WIS source accessible")
         print("   Make sure:")
         print("   1. QEMU VM is running")
         print("   2. Windows is logged in (Admin/12345)")
         print("   3. WIS application is started")
         return
+    print(f"✅ {first.kind} source {first.target} ready after {first.seconds:.1f}s")
+    
+    # One more concurrent pass to see everything else that is up now; the
+    # first source stays even if it misses this short pass
+    sources = [first] + [s for s in find_sources(all_probes(), deadline=5)
+                         if (s.kind, s.target) != (first.kind, first.target)]
+    for source in sources:
+        print(f"   • {source.kind:<5} {source.target} ({source.detail})")
     
     # Try different extraction methods
     print("\n📡 Attempting extraction methods...")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
     
     # Method 1: HTTP API
-    web_data = extract_via_http()
+    url = next((s.target for s in sources if s.kind == 'http'), None)
+    web_data = extract_via_http(url) if url else None
     if web_data:
         print("✅ Extracted via HTTP")
         with open(f"{EXPORT_DIR}/wis-http-export.json", 'wb') as f:
             f.write(web_data)
     
     # Method 2: Shared folder
-    shared = extract_from_shared_folder()
+    shared = next((s.target for s in sources if s.kind == 'path'), None)
     if shared:
         print(f"✅ Found exports in: {shared}")
     
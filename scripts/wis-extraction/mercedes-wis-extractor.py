@@ -5,22 +5,37 @@ Extracts data from proprietary Mercedes WIS formats for AI processing
 """
 
 import os
+import sys
 import json
-import struct
-import mmap
-import zlib
-import gzip
 import sqlite3
+import time
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import subprocess
-import re
+from typing import Dict, List, Any, Iterator, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from wislib.cbf import decompress_cbf_files
+from wislib.chunker import DEFAULT_OVERLAP, DEFAULT_TARGET_SIZE, Chunker, Piece, write_shards
+from wislib.cpg import carve_cpg_files
+from wislib.inventory import Inventory, load_inventory, relative_names
+from wislib.jsonl import iter_records, open_jsonl
+from wislib.mdb import DEFAULT_CONCURRENCY, export_mdb_files
+from wislib.metrics import REGISTRY, counter, histogram
+from wislib.progress import Progress, planned_sizes
+from wislib.romscan import iter_spill, scan_rom
+from wislib.textquality import MEANINGFUL, TextClassifier
 
 class MercedesWISExtractor:
     """Extract data from Mercedes WIS proprietary formats"""
     
-    def __init__(self, vdi_mount_path: str = "/Volumes/WIS-Mount"):
+    def __init__(self, vdi_mount_path: str = "/Volumes/WIS-Mount",
+                 output_dir: str = "/Volumes/UnimogManuals/wis-extracted",
+                 refresh_inventory: bool = False):
         self.mount_path = Path(vdi_mount_path)
+        self.output_dir = Path(output_dir)
+        self.refresh_inventory = refresh_inventory
+        # Tune with e.g. self.text_classifier = self.text_classifier.tuned(min_lm_score=0.8)
+        self.text_classifier = TextClassifier(MEANINGFUL)
+        self.inventory: Optional[Inventory] = None
         self.ewa_paths = [
             self.mount_path / "Program Files/EWA net",
             self.mount_path / "Program Files (x86)/EWA net",
@@ -28,7 +43,9 @@ class MercedesWISExtractor:
             self.mount_path / "EWA"
         ]
         self.extracted_data = {}
-        self.chunks = []
+        # Chunker(**chunk_config) packs records into AI chunks
+        self.chunk_config = {'target_size': DEFAULT_TARGET_SIZE, 'overlap': DEFAULT_OVERLAP}
+        self.chunker: Optional[Chunker] = None
         
     def find_ewa_installation(self) -> Optional[Path]:
         """Locate the EWA/WIS installation directory"""
@@ -39,254 +56,194 @@ class MercedesWISExtractor:
         print("❌ No EWA installation found")
         return None
     
+    def find_files(self, ewa_path: Path, kind: str) -> List[Path]:
+        """Files of one type ('mdb', 'rom', 'cbf', 'cpg') below ewa_path
+        
+        The tree is walked once and the inventory cached in the output
+        directory; every later call and later run reuses it.
+        """
+        if self.inventory is None or self.inventory.root != str(ewa_path):
+            start = time.time()
+            self.inventory = load_inventory(
+                ewa_path, self.output_dir / "inventory.json", refresh=self.refresh_inventory,
+                on_error=lambda e: print(f"  ❌ {e}"))
+            self.refresh_inventory = False
+            counts = ', '.join(f"{n:,} {k}" for k, n in self.inventory.counts().items())
+            print(f"🔍 Inventory: {counts} ({time.time() - start:.1f}s)")
+        return self.inventory.files(kind)
+    
     # ============== MDB Extraction (Easiest) ==============
     
-    def extract_mdb_files(self, ewa_path: Path) -> Dict:
-        """Extract data from Microsoft Access MDB files using mdb-tools"""
-        mdb_data = {}
-        mdb_files = list(ewa_path.glob("**/*.mdb"))
+    def extract_mdb_files(self, ewa_path: Path, concurrency: int = DEFAULT_CONCURRENCY) -> Dict:
+        """Extract data from Microsoft Access MDB files using mdb-tools
+        
+        Tables are exported by up to `concurrency` mdb-export processes at
+        once and every record is streamed to <output_dir>/mdb/records.jsonl.gz
+        as it is parsed; chunking and export read it back with
+        iter_mdb_records(). Returns {file: {table: row count}}, files named by
+        their path relative to the common directory so same-named databases
+        in different directories stay apart.
+        """
+        mdb_files = self.find_files(ewa_path, 'mdb')
+        names = relative_names(mdb_files)
+        mdb_data: Dict[str, Dict[str, int]] = {}
         
         print(f"📊 Found {len(mdb_files)} MDB files")
         
-        for mdb_file in mdb_files:
-            print(f"  Processing: {mdb_file.name}")
-            try:
-                # List tables using mdb-tools
-                tables_output = subprocess.run(
-                    ["mdb-tables", "-1", str(mdb_file)],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if tables_output.returncode == 0:
-                    tables = tables_output.stdout.strip().split('\n')
-                    mdb_data[mdb_file.name] = {}
-                    
-                    for table in tables:
-                        if table:
-                            # Export table to CSV
-                            csv_output = subprocess.run(
-                                ["mdb-export", str(mdb_file), table],
-                                capture_output=True,
-                                text=True
-                            )
-                            
-                            if csv_output.returncode == 0:
-                                mdb_data[mdb_file.name][table] = self.parse_csv(csv_output.stdout)
-                                print(f"    ✅ Extracted table: {table}")
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
-                
+        def table_done(mdb_file, table, count):
+            mdb_data.setdefault(names[mdb_file], {})[table] = count
+            print(f"    ✅ Extracted table: {names[mdb_file]}/{table} ({count:,} rows)")
+            
+        def table_failed(mdb_file, table, error):
+            print(f"    ❌ {names[mdb_file]}/{table or '(tables)'}: {error}")
+        
+        spill_path = self.mdb_spill_path()
+        spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open_jsonl(spill_path, compress=True) as out:
+            export_mdb_files(mdb_files, concurrency=concurrency,
+                             on_record=lambda mdb_file, table, record: out.write(
+                                 'mdb_record', {'file': names[mdb_file], 'table': table,
+                                                'record': record}),
+                             on_table=table_done, on_error=table_failed)
         return mdb_data
     
-    def parse_csv(self, csv_text: str) -> List[Dict]:
-        """Parse CSV text into list of dictionaries"""
-        lines = csv_text.strip().split('\n')
-        if len(lines) < 2:
-            return []
-        
-        headers = lines[0].split(',')
-        records = []
-        
-        for line in lines[1:]:
-            values = line.split(',')
-            record = dict(zip(headers, values))
-            records.append(record)
-            
-        return records
+    def mdb_spill_path(self) -> Path:
+        """Where extract_mdb_files() streams the MDB records"""
+        return self.output_dir / "mdb" / "records.jsonl.gz"
+    
+    def iter_mdb_records(self) -> Iterator[Dict]:
+        """Every extracted MDB record as {'file', 'table', 'record'}"""
+        spill_path = self.mdb_spill_path()
+        if not self.extracted_data.get('mdb') or not spill_path.exists():
+            return
+        for _, line in iter_records(spill_path, 'mdb_record'):
+            yield line
     
     # ============== Transbase ROM Analysis ==============
     
-    def analyze_transbase_roms(self, ewa_path: Path) -> Dict:
-        """Analyze Transbase ROM files for extractable content"""
+    def analyze_transbase_roms(self, ewa_path: Path, spill: bool = True) -> Dict:
+        """Analyze Transbase ROM files for extractable content
+        
+        Each file is scanned in one streaming pass that keeps counts, a
+        random sample and the most frequent segments. With spill=True every
+        meaningful segment also goes to <output_dir>/rom/<file>.segments.txt.gz
+        so chunking and export can stream the full text later. Every TransBase
+        database has its own rfile000..., so files are named by their path
+        relative to the common directory, in the spill tree and the result.
+        """
         rom_data = {}
-        rom_files = list(ewa_path.glob("**/rfile*"))
+        rom_files = self.find_files(ewa_path, 'rom')
         
         print(f"📦 Found {len(rom_files)} ROM files")
+        bytes_scanned = counter('bytes_scanned_total', 'Bytes of ROM files read', stage='rom')
+        file_seconds = histogram('file_scan_seconds', 'Time to scan one file', stage='rom')
         
+        names = relative_names(rom_files)
         for rom_file in rom_files:
-            print(f"  Analyzing: {rom_file.name}")
+            name = names[rom_file]
+            print(f"  Analyzing: {name}")
             try:
-                extracted_text = self.extract_text_from_binary(rom_file)
-                if extracted_text:
-                    rom_data[rom_file.name] = {
-                        'size': rom_file.stat().st_size,
-                        'text_snippets': extracted_text[:100],  # First 100 text segments
-                        'total_text_found': len(extracted_text)
-                    }
-                    print(f"    ✅ Found {len(extracted_text)} text segments")
+                spill_path = self.output_dir / "rom" / f"{name}.segments.txt.gz" if spill else None
+                with file_seconds.time():
+                    summary = scan_rom(rom_file, accept=self.text_classifier.classify,
+                                       spill=spill_path)
+                bytes_scanned.inc(rom_file.stat().st_size)
+                if summary.total_text_found:
+                    rom_data[name] = summary.to_dict()
+                    print(f"    ✅ Found {summary.total_text_found:,} text segments "
+                          f"({summary.candidates:,} candidates)")
+                elif spill_path:
+                    spill_path.unlink(missing_ok=True)
             except Exception as e:
                 print(f"    ❌ Error: {e}")
-                
+        
+        print(f"  📊 Text filter: {self.text_classifier.throughput()}")
         return rom_data
     
-    def extract_text_from_binary(self, filepath: Path, min_length: int = 20) -> List[str]:
-        """Extract ASCII text strings from binary file"""
-        text_segments = []
-        
-        with open(filepath, 'rb') as f:
-            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-                # Look for ASCII text patterns
-                pattern = rb'[\x20-\x7E]{' + str(min_length).encode() + rb',}'
-                
-                for match in re.finditer(pattern, mm):
-                    try:
-                        text = match.group().decode('utf-8', errors='ignore')
-                        # Filter out nonsense strings
-                        if self.is_meaningful_text(text):
-                            text_segments.append(text)
-                    except:
-                        continue
-                        
-        return text_segments
+    def iter_rom_segments(self, data: Dict) -> Iterator[str]:
+        """All segments of an analyzed ROM file: the spill file if any, else the sample"""
+        if data.get('spill'):
+            return iter_spill(data['spill'])
+        return iter(data.get('sample', []))
     
     def is_meaningful_text(self, text: str) -> bool:
-        """Check if extracted text is meaningful"""
-        # Must contain at least some letters
-        if not re.search(r'[a-zA-Z]{3,}', text):
-            return False
-        
-        # Should have reasonable character distribution
-        alnum_ratio = len([c for c in text if c.isalnum()]) / len(text)
-        if alnum_ratio < 0.5:
-            return False
-            
-        # Check for Mercedes/automotive keywords
-        keywords = ['mercedes', 'unimog', 'engine', 'brake', 'transmission', 
-                   'oil', 'filter', 'bearing', 'shaft', 'valve', 'sensor',
-                   'U300', 'U400', 'U500', 'U1000', 'U2000', 'U3000', 'U4000', 'U5000']
-        
-        text_lower = text.lower()
-        for keyword in keywords:
-            if keyword in text_lower:
-                return True
-                
-        # Accept if it looks like a procedure or part description
-        if len(text.split()) > 3:  # Multi-word phrase
-            return True
-            
-        return False
+        """Check if extracted text is meaningful (batch with text_classifier.classify)"""
+        return self.text_classifier.accept(text)
     
     # ============== CBF Decompression ==============
     
-    def extract_cbf_files(self, ewa_path: Path) -> Dict:
-        """Extract compressed CBF files"""
+    def extract_cbf_files(self, ewa_path: Path, workers: Optional[int] = None) -> Dict:
+        """Decompress every stream in the CBF files into <output_dir>/cbf"""
         cbf_data = {}
-        cbf_files = list(ewa_path.glob("**/*.cbf"))
+        cbf_files = self.find_files(ewa_path, 'cbf')
         
         print(f"🗜️ Found {len(cbf_files)} CBF files")
         
-        for cbf_file in cbf_files:
-            print(f"  Processing: {cbf_file.name}")
-            try:
-                content = self.decompress_cbf(cbf_file)
-                if content:
-                    cbf_data[cbf_file.name] = {
-                        'size': cbf_file.stat().st_size,
-                        'decompressed_size': len(content),
-                        'content_preview': content[:1000]
-                    }
-                    print(f"    ✅ Decompressed successfully")
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
-                
+        def report(result):
+            print(f"  Processing: {result['file']}")
+            if result['decompressed_size']:
+                cbf_data[result['file']] = result
+                print(f"    ✅ {result['format']}: {len(result['streams'])} streams, "
+                      f"{result['decompressed_size']:,} bytes")
+        
+        with Progress(planned_sizes(cbf_files), 'Decompressing CBF') as progress:
+            decompress_cbf_files(cbf_files, self.output_dir / "cbf", workers=workers,
+                                 on_result=report,
+                                 on_error=lambda path, e: print(f"  ❌ {path.name}: {e}"),
+                                 progress=progress)
         return cbf_data
     
-    def decompress_cbf(self, filepath: Path) -> Optional[bytes]:
-        """Try various decompression methods on CBF file"""
-        with open(filepath, 'rb') as f:
-            data = f.read()
-            
-        # Try different compression algorithms
-        methods = [
-            ('zlib', lambda x: zlib.decompress(x)),
-            ('gzip', lambda x: gzip.decompress(x)),
-            ('zlib_offset', lambda x: zlib.decompress(x[2:])),  # Skip header
-            ('raw', lambda x: x)
-        ]
-        
-        for method_name, decompress_func in methods:
-            try:
-                decompressed = decompress_func(data)
-                # Check if result looks like text or structured data
-                if self.looks_like_text(decompressed):
-                    return decompressed
-            except:
-                continue
-                
-        return None
-    
-    def looks_like_text(self, data: bytes) -> bool:
-        """Check if data appears to be text"""
-        try:
-            text = data[:1000].decode('utf-8', errors='ignore')
-            printable_ratio = len([c for c in text if c.isprintable()]) / len(text)
-            return printable_ratio > 0.7
-        except:
-            return False
-    
     # ============== Image Conversion ==============
     
-    def convert_cpg_images(self, ewa_path: Path) -> Dict:
-        """Convert CPG images to standard formats"""
+    def convert_cpg_images(self, ewa_path: Path, workers: Optional[int] = None) -> Dict:
+        """Carve embedded JPEG/PNG/BMP images out of CPG files into <output_dir>/images"""
         image_data = {}
-        cpg_files = list(ewa_path.glob("**/*.cpg"))
+        cpg_files = self.find_files(ewa_path, 'cpg')
         
         print(f"🖼️ Found {len(cpg_files)} CPG image files")
         
-        for cpg_file in cpg_files:
-            print(f"  Analyzing: {cpg_file.name}")
-            try:
-                image_info = self.analyze_cpg_format(cpg_file)
-                if image_info:
-                    image_data[cpg_file.name] = image_info
-                    print(f"    ✅ Image type: {image_info.get('type', 'unknown')}")
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
-                
+        def report(result):
+            image_data[result['file']] = result
+            if result['images']:
+                print(f"  ✅ {result['file']}: {len(result['images'])} images")
+        
+        with Progress(planned_sizes(cpg_files), 'Carving CPG') as progress:
+            carve_cpg_files(cpg_files, self.output_dir / "images", workers=workers,
+                            on_result=report,
+                            on_error=lambda path, e: print(f"  ❌ {path.name}: {e}"),
+                            progress=progress)
+        print(f"  📊 {sum(len(r['images']) for r in image_data.values()):,} images carved, "
+              f"{sum(not r['images'] for r in image_data.values()):,} files proprietary")
         return image_data
     
-    def analyze_cpg_format(self, filepath: Path) -> Optional[Dict]:
-        """Analyze CPG file format"""
-        with open(filepath, 'rb') as f:
-            header = f.read(1024)
-            
-        # Check for embedded standard formats
-        if b'JFIF' in header or b'\xff\xd8' in header:
-            return {'type': 'embedded_jpeg', 'offset': header.find(b'\xff\xd8')}
-        elif b'PNG' in header or b'\x89PNG' in header:
-            return {'type': 'embedded_png', 'offset': header.find(b'\x89PNG')}
-        elif b'BM' in header[:2]:
-            return {'type': 'embedded_bmp', 'offset': 0}
-        else:
-            # Proprietary format - needs more analysis
-            return {'type': 'proprietary', 'header_hex': header[:32].hex()}
-    
     # ============== AI Chunking ==============
     
-    def create_ai_chunks(self) -> List[Dict]:
-        """Convert extracted data to AI-ready chunks"""
-        chunks = []
+    def iter_pieces(self) -> Iterator[Piece]:
+        """Every MDB record and ROM text segment as a chunkable piece"""
+        for line in self.iter_mdb_records():
+            piece = self.piece_from_record(line['record'], line['file'], line['table'])
+            if piece:
+                yield piece
         
-        # Process MDB data
-        for mdb_file, tables in self.extracted_data.get('mdb', {}).items():
-            for table_name, records in tables.items():
-                for record in records:
-                    chunk = self.create_chunk_from_record(record, mdb_file, table_name)
-                    if chunk:
-                        chunks.append(chunk)
-        
-        # Process extracted text from ROM files
         for rom_file, data in self.extracted_data.get('rom', {}).items():
-            for text_segment in data.get('text_snippets', []):
-                chunk = self.create_chunk_from_text(text_segment, rom_file)
-                if chunk:
-                    chunks.append(chunk)
-        
-        return chunks
+            for text_segment in self.iter_rom_segments(data):
+                yield self.piece_from_text(text_segment, rom_file)
+    
+    def iter_ai_chunks(self) -> Iterator[Dict]:
+        """Stream AI-ready chunks packed to the configured target size
+        
+        Each call starts a fresh Chunker (and dedupe set); its counters stay
+        available as self.chunker.stats.
+        """
+        self.chunker = Chunker(**self.chunk_config)
+        return self.chunker.chunks(self.iter_pieces())
     
-    def create_chunk_from_record(self, record: Dict, source: str, table: str) -> Optional[Dict]:
-        """Create an AI-ready chunk from database record"""
+    def create_ai_chunks(self) -> List[Dict]:
+        """Convert extracted data to AI-ready chunks"""
+        return list(self.iter_ai_chunks())
+    
+    def piece_from_record(self, record: Dict, source: str, table: str) -> Optional[Piece]:
+        """Create a chunkable piece from a database record"""
         # Extract meaningful content
         content_parts = []
         metadata = {
@@ -309,15 +266,12 @@ class MercedesWISExtractor:
                     metadata['part_number'] = value
         
         if content_parts:
-            return {
-                'content': '\n'.join(content_parts),
-                'metadata': metadata
-            }
+            return Piece('\n'.join(content_parts), (source, table), metadata)
         
         return None
     
-    def create_chunk_from_text(self, text: str, source: str) -> Optional[Dict]:
-        """Create an AI-ready chunk from extracted text"""
+    def piece_from_text(self, text: str, source: str) -> Piece:
+        """Create a chunkable piece from extracted text"""
         # Identify content type based on keywords
         content_type = 'general'
         
@@ -328,14 +282,11 @@ class MercedesWISExtractor:
         elif any(word in text.lower() for word in ['fault', 'diagnostic', 'error']):
             content_type = 'diagnostic'
         
-        return {
-            'content': text,
-            'metadata': {
-                'source': source,
-                'type': content_type,
-                'extraction_method': 'binary_text_extraction'
-            }
-        }
+        return Piece(text, (source, content_type), {
+            'source': source,
+            'type': content_type,
+            'extraction_method': 'binary_text_extraction'
+        })
     
     # ============== Main Extraction Pipeline ==============
     
@@ -363,21 +314,32 @@ class MercedesWISExtractor:
         print("\n🖼️ Phase 4: CPG Images")
         self.extracted_data['images'] = self.convert_cpg_images(ewa_path)
         
-        print("\n🤖 Phase 5: Creating AI Chunks")
-        self.chunks = self.create_ai_chunks()
+        print("\n🤖 Phase 5: AI Chunks")
+        print("  Chunks are packed and streamed to shards by save_results()")
         
         print("\n✅ Extraction Complete!")
         print(f"  - MDB tables extracted: {sum(len(t) for t in self.extracted_data.get('mdb', {}).values())}")
         print(f"  - ROM text segments: {sum(d.get('total_text_found', 0) for d in self.extracted_data.get('rom', {}).values())}")
-        print(f"  - AI chunks created: {len(self.chunks)}")
         
         return self.extracted_data
     
-    def save_results(self, output_dir: str = "/Volumes/UnimogManuals/wis-extracted"):
-        """Save extraction results"""
-        output_path = Path(output_dir)
+    def save_results(self, output_dir: Optional[str] = None,
+                     json_format: str = 'jsonl', compress: bool = False):
+        """Save extraction results
+        
+        json_format='jsonl' writes extracted_data.jsonl and ai_chunks-NNNNN.jsonl
+        shards (listed in ai_chunks.shards.json) with one record per line, plus
+        *.summary.json files; 'json' writes the original two JSON documents.
+        """
+        output_path = Path(output_dir) if output_dir else self.output_dir
         output_path.mkdir(parents=True, exist_ok=True)
         
+        if json_format == 'jsonl':
+            self.save_jsonl(output_path, compress)
+            REGISTRY.write(output_path, 'mercedes-wis-extractor')
+            print(f"\n💾 Results saved to: {output_path}")
+            return
+        
         # Save raw extracted data
         with open(output_path / "extracted_data.json", 'w') as f:
             # Convert to JSON-serializable format
@@ -390,13 +352,52 @@ class MercedesWISExtractor:
         
         # Save AI chunks
         with open(output_path / "ai_chunks.json", 'w') as f:
-            json.dump(self.chunks, f, indent=2)
+            json.dump(self.create_ai_chunks(), f, indent=2)
         
+        REGISTRY.write(output_path, 'mercedes-wis-extractor')
         print(f"\n💾 Results saved to: {output_path}")
-
+    
+    def save_jsonl(self, output_path: Path, compress: bool = False):
+        """Stream every extracted record and chunk to JSON Lines"""
+        with open_jsonl(output_path / "extracted_data.jsonl", compress=compress) as out:
+            out.write_many('mdb_record', self.iter_mdb_records())
+            
+            for rom_file, data in self.extracted_data.get('rom', {}).items():
+                out.write('rom_file', {'file': rom_file, **{k: v for k, v in data.items()
+                                                           if k != 'sample'}})
+                out.write_many('rom_text', (
+                    {'file': rom_file, 'text': text} for text in self.iter_rom_segments(data)
+                ))
+            
+            for cbf_file, data in self.extracted_data.get('cbf', {}).items():
+                out.write('cbf', {
+                    'file': cbf_file,
+                    'size': data['size'],
+                    'format': data['format'],
+                    'decompressed_size': data['decompressed_size'],
+                    'streams': data['streams'],
+                    'content_preview': data['content_preview'].decode('utf-8', errors='replace')
+                })
+            
+            for image_file, info in self.extracted_data.get('images', {}).items():
+                out.write('image', {'file': image_file, **info})
+        print(f"  ✅ {out.total:,} records -> {out.path.name}")
+        
+        listing = write_shards(self.iter_ai_chunks(), output_path, prefix='ai_chunks',
+                               compress=compress)
+        stats = self.chunker.stats
+        print(f"  ✅ {listing['records']:,} chunks from {stats['pieces']:,} records "
+              f"({stats['duplicate_pieces'] + stats['duplicates']:,} duplicates dropped) -> "
+              f"{len(listing['shards'])} ai_chunks shards")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract Mercedes WIS data for AI processing")
+    parser.add_argument('--refresh-inventory', action='store_true',
+                        help="walk the installation again instead of using inventory.json")
+    args = parser.parse_args()
+    
     # Run extraction
-    extractor = MercedesWISExtractor()
+    extractor = MercedesWISExtractor(refresh_inventory=args.refresh_inventory)
     data = extractor.extract_all()
     extractor.save_results()
\ No newline at end of file
@@ -4,6 +4,7 @@ Final WIS Data Extractor - Direct Binary Parser
 Based on research findings about TransBase format
 """
 
+import argparse
 import os
 import struct
 import re
@@ -11,7 +12,12 @@ import json
 import sqlite3
 from pathlib import Path
 from typing import List, Dict, Any
-import hashlib
+
+from wislib.dedupe import record_id
+from wislib.metrics import REGISTRY, counter, histogram
+from wislib.progress import Progress, file_progress, progress_key
+from wislib.sqlwriter import add_sql_arguments, open_sql, WIS_PARTS, WIS_PROCEDURES
+from wislib.textquality import NOT_GARBAGE, TextClassifier
 
 class WISFinalExtractor:
     """Direct parser for Mercedes WIS TransBase database files"""
@@ -24,6 +30,20 @@ class WISFinalExtractor:
         # TransBase uses 8KB pages typically
         self.page_size = 8192
         
+        # Limit pages for initial testing (can be removed later)
+        self.max_pages = 10000  # Process first 10k pages of each file initially
+        
+        # Rejects binary garbage among procedure candidates
+        self.text_filter = TextClassifier(NOT_GARBAGE)
+        
+        # Run metrics, written next to the exports
+        self.bytes_scanned = counter('bytes_scanned_total', 'Bytes of rfiles read', stage='final')
+        self.pages_scanned = counter('pages_scanned_total', 'Database pages read', stage='final')
+        self.pages_skipped = counter('pages_skipped_total', 'Empty pages skipped', stage='final')
+        self.page_seconds = histogram('page_scan_seconds', 'Time to scan one page', stage='final')
+        self.part_hits = counter('regex_hits_total', 'Pattern matches', pattern='part_number')
+        self.procedure_hits = counter('regex_hits_total', 'Pattern matches', pattern='procedure')
+        
         # Known Mercedes part number patterns
         self.part_patterns = [
             # Standard format: A123 456 78 90
@@ -67,27 +87,30 @@ class WISFinalExtractor:
         
         print(f"  File size: {file_size:,} bytes ({total_pages:,} pages)")
         
-        # Limit pages for initial testing (can be removed later)
-        max_pages = min(total_pages, 10000)  # Process first 10k pages initially
+        max_pages = min(total_pages, self.max_pages)
         
+        progress = file_progress(rfile_path)
         with open(rfile_path, 'rb') as f:
             for page_num in range(max_pages):
-                if page_num % 1000 == 0:
-                    print(f"  Processed {page_num:,}/{max_pages:,} pages... Parts: {len(self.parts)}, Procedures: {len(self.procedures)}")
-                
                 # Read page
                 f.seek(page_num * self.page_size)
                 page_data = f.read(self.page_size)
+                progress.add(len(page_data))
+                self.pages_scanned.inc()
+                self.bytes_scanned.inc(len(page_data))
                 
                 # Skip empty pages
                 if not any(page_data[:100]):
+                    self.pages_skipped.inc()
                     continue
                 
-                # Extract parts
-                self.extract_parts_from_page(page_data)
-                
-                # Extract procedures  
-                self.extract_procedures_from_page(page_data)
+                with self.page_seconds.time():
+                    # Extract parts
+                    self.extract_parts_from_page(page_data)
+                    
+                    # Extract procedures  
+                    self.extract_procedures_from_page(page_data)
+        progress.finish()
                 
         print(f"  Completed {rfile_path.name}: {len(self.parts)} parts, {len(self.procedures)} procedures")
                 
@@ -100,6 +123,7 @@ class WISFinalExtractor:
             for match in matches:
                 try:
                     part_raw = match.group(1)
+                    self.part_hits.inc()
                     
                     # Clean up part number
                     part_num = part_raw.decode('ascii', errors='ignore')
@@ -127,6 +151,7 @@ class WISFinalExtractor:
     def extract_procedures_from_page(self, page_data):
         """Extract repair procedures from page"""
         
+        candidates = []
         for keyword in self.procedure_keywords:
             if keyword not in page_data:
                 continue
@@ -144,28 +169,37 @@ class WISFinalExtractor:
                 # Extract procedure text (up to 500 bytes)
                 end = min(pos + 500, len(page_data))
                 proc_data = page_data[pos:end]
+                self.procedure_hits.inc()
                 
                 # Clean text
                 proc_text = self.extract_clean_text(proc_data, max_length=400)
-                
-                # Validate procedure
-                if len(proc_text) > 30 and not self.is_garbage_text(proc_text):
-                    # Check for Unimog relevance
-                    is_unimog = any(kw.decode('ascii', errors='ignore').lower() in proc_text.lower() 
-                                   for kw in self.unimog_keywords if kw)
-                    
-                    proc_id = hashlib.md5(proc_text.encode()).hexdigest()[:8]
-                    
-                    if proc_id not in self.procedures:
-                        self.procedures[proc_id] = {
-                            'title': proc_text[:80],
-                            'content': proc_text,
-                            'is_unimog': is_unimog,
-                            'keyword': keyword.decode('ascii', errors='ignore')
-                        }
+                if len(proc_text) > 30:
+                    candidates.append((proc_text, keyword))
                         
                 offset = pos + len(keyword)  # Move past the keyword
                 occurrences += 1
+        
+        if not candidates:
+            return
+        
+        # Validate the whole page's candidates in one batch
+        keep = self.text_filter.classify([text for text, _ in candidates])
+        for (proc_text, keyword), ok in zip(candidates, keep):
+            if not ok:
+                continue
+            # Check for Unimog relevance
+            is_unimog = any(kw.decode('ascii', errors='ignore').lower() in proc_text.lower() 
+                           for kw in self.unimog_keywords if kw)
+            
+            proc_id = record_id(proc_text)
+            
+            if proc_id not in self.procedures:
+                self.procedures[proc_id] = {
+                    'title': proc_text[:80],
+                    'content': proc_text,
+                    'is_unimog': is_unimog,
+                    'keyword': keyword.decode('ascii', errors='ignore')
+                }
                 
     def extract_clean_text(self, data, max_length=200):
         """Extract clean readable text from binary data"""
@@ -201,24 +235,12 @@ class WISFinalExtractor:
         return result.strip()
         
     def is_garbage_text(self, text):
-        """Check if text is likely garbage/binary data"""
+        """Check if text is likely garbage/binary data (batch with text_filter.classify)"""
+        return not self.text_filter.accept(text)
         
-        # Check for too many special characters
-        special_count = sum(1 for c in text if c in '{}[]<>@#$%^&*')
-        if special_count > len(text) * 0.2:
-            return True
-            
-        # Check for reasonable word structure
-        words = text.split()
-        if not words:
-            return True
-            
-        # Check average word length
-        avg_word_len = sum(len(w) for w in words) / len(words)
-        if avg_word_len < 2 or avg_word_len > 15:
-            return True
-            
-        return False
+    def planned_sizes(self, files):
+        """Bytes parse_rfile() will read from each file"""
+        return {progress_key(f): min(f.stat().st_size, self.max_pages * self.page_size) for f in files}
         
     def process_all_files(self):
         """Process all rfiles in extraction directory"""
@@ -227,26 +249,26 @@ class WISFinalExtractor:
         print(f"Found {len(rfiles)} database files to process")
         
         # Process only first 3 files for initial extraction
-        for rfile in rfiles[:3]:
-            if not rfile.exists():
-                print(f"  Skipping {rfile.name} - not found")
-                continue
-            self.parse_rfile(rfile)
-            
-            # Stop if we have enough data
-            if len(self.parts) > 1000 or len(self.procedures) > 500:
-                print(f"  Sufficient data extracted. Stopping early.")
-                break
+        rfiles = [rfile for rfile in rfiles[:3] if rfile.exists()]
+        with Progress(self.planned_sizes(rfiles), 'Parsing rfiles'):
+            for rfile in rfiles:
+                self.parse_rfile(rfile)
+                
+                # Stop if we have enough data
+                if len(self.parts) > 1000 or len(self.procedures) > 500:
+                    print(f"  Sufficient data extracted. Stopping early.")
+                    break
             
         # Also process EPC files if we need more data
         if len(self.parts) < 1000:
-            epc_files = sorted(self.db_path.glob("*epc*.000"))
-            for epc in epc_files[:2]:  # Process first 2 EPC files
-                if epc.exists():
+            epc_files = [epc for epc in sorted(self.db_path.glob("*epc*.000"))[:2]  # Process first 2 EPC files
+                         if epc.exists()]
+            with Progress(self.planned_sizes(epc_files), 'Parsing EPC files'):
+                for epc in epc_files:
                     print(f"Processing EPC file: {epc.name}")
                     self.parse_rfile(epc)
             
-    def export_results(self, output_dir):
+    def export_results(self, output_dir, sql_mode='insert', batch_size=500, max_file_bytes=None):
         """Export extracted data"""
         
         output_path = Path(output_dir)
@@ -261,6 +283,7 @@ class WISFinalExtractor:
         
         unimog_procs = sum(1 for p in self.procedures.values() if p['is_unimog'])
         print(f"✅ Unimog-specific procedures: {unimog_procs}")
+        print(f"📊 Text filter: {self.text_filter.throughput()}")
         
         # Sample data
         print("\n📦 Sample Parts:")
@@ -302,41 +325,39 @@ class WISFinalExtractor:
         print(f"\n✅ JSON exported: {json_file}")
         
         # Export SQL
-        self.export_sql(output_path / 'wis_final_import.sql')
+        self.export_sql(output_path / 'wis_final_import.sql', mode=sql_mode,
+                        batch_size=batch_size, max_file_bytes=max_file_bytes)
+        
+        prom, summary = REGISTRY.write(output_path, 'wis-final-extractor')
+        print(f"📊 Metrics: {summary} ({prom.name})")
         
         return data
         
-    def export_sql(self, sql_file):
+    def export_sql(self, sql_file, mode='insert', batch_size=500, max_file_bytes=None):
         """Generate SQL for Supabase import"""
         
-        with open(sql_file, 'w', encoding='utf-8') as f:
-            f.write("-- Mercedes WIS Complete Data Import\n")
-            f.write("-- Final extraction from TransBase database\n")
-            f.write(f"-- Parts: {len(self.parts)} | Procedures: {len(self.procedures)}\n\n")
-            f.write("BEGIN;\n\n")
+        with open_sql(sql_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS Complete Data Import")
+            sql.comment("Final extraction from TransBase database")
+            sql.comment(f"Parts: {len(self.parts)} | Procedures: {len(self.procedures)}")
+            sql.comment()
+            sql.begin()
             
-            # Insert parts
-            f.write("-- Parts Catalog\n")
-            for part_num, desc in self.parts.items():
-                part_clean = part_num.replace("'", "''")
-                desc_clean = desc.replace("'", "''")[:500]
-                
-                f.write(f"""INSERT INTO wis_parts (part_number, description, search_vector)
-VALUES ('{part_clean}', '{desc_clean}', to_tsvector('english', '{part_clean} {desc_clean}'))
-ON CONFLICT (part_number) DO UPDATE SET description = EXCLUDED.description;
-""")
-                
-            f.write("\n-- Repair Procedures\n")
-            for proc_id, proc in self.procedures.items():
-                title = proc['title'].replace("'", "''")
-                content = proc['content'].replace("'", "''")
-                
-                f.write(f"""INSERT INTO wis_procedures (title, content, procedure_type, search_vector)
-VALUES ('{title}', '{content}', 'repair', to_tsvector('english', '{title} {content}'))
-ON CONFLICT DO NOTHING;
-""")
-                
-            f.write("\nCOMMIT;\n")
+            sql.comment("Parts Catalog")
+            sql.write_rows(WIS_PARTS, (
+                (part_num, desc[:500])
+                for part_num, desc in self.parts.items()
+            ))
+            
+            sql.comment()
+            sql.comment("Repair Procedures")
+            sql.write_rows(WIS_PROCEDURES, (
+                (proc['title'], proc['content'], 'repair')
+                for proc in self.procedures.values()
+            ))
+            
+            sql.commit()
             
         print(f"✅ SQL exported: {sql_file}")
 
@@ -344,6 +365,10 @@ ON CONFLICT DO NOTHING;
 import os
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract parts and procedures from the WIS rfiles")
+    add_sql_arguments(parser)
+    args = parser.parse_args()
+    
     print("="*60)
     print("MERCEDES WIS FINAL DATA EXTRACTOR")
     print("="*60)
@@ -362,7 +387,9 @@ def main():
     
     # Export results
     output_dir = "/Volumes/UnimogManuals/WIS-FINAL-COMPLETE"
-    data = extractor.export_results(output_dir)
+    data = extractor.export_results(output_dir, sql_mode=args.sql_mode,
+                                    batch_size=args.batch_size,
+                                    max_file_bytes=args.max_file_bytes)
     
     print("\n" + "="*60)
     print("🎉 EXTRACTION COMPLETE!")
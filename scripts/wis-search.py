@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+wis-search: query extracted WIS data locally
+Build an index once from the extractor JSON / JSONL / SQLite / .wsnap outputs, then search it:
+
+  python wis-search.py --build wis_final_extract.json --build wis_data.db
+  python wis-search.py "portal hub seal"
+  python wis-search.py --kind part "A123 456 78 90"
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from wislib.search import SearchIndex, build_index
+
+DEFAULT_INDEX = Path("wis_search.idx")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 search over extracted WIS data")
+    parser.add_argument('query', nargs='*', help="search terms (EN/DE/FR)")
+    parser.add_argument('--index', type=Path, default=DEFAULT_INDEX,
+                        help=f"index file (default: {DEFAULT_INDEX})")
+    parser.add_argument('--build', action='append', metavar='SOURCE',
+                        help="(re)build the index from a JSON / JSONL / SQLite / .wsnap output (repeatable)")
+    parser.add_argument('--kind', choices=['part', 'procedure', 'bulletin', 'unimog'],
+                        help="only return this kind of record")
+    parser.add_argument('-n', '--limit', type=int, default=10, help="results to show")
+    args = parser.parse_args()
+
+    if args.build:
+        missing = [s for s in args.build if not Path(s).exists()]
+        if missing:
+            print(f"Error: {', '.join(missing)} not found")
+            sys.exit(1)
+        start = time.perf_counter()
+        index = build_index(args.build)
+        index.save(args.index)
+        print(f"✅ Indexed {len(index):,} records ({len(index.postings):,} terms) "
+              f"in {time.perf_counter() - start:.1f}s -> {args.index}")
+        if not args.query:
+            return
+        load_ms = 0.0
+    elif not args.index.exists():
+        print(f"Error: index {args.index} not found; create it with --build <outputs>")
+        sys.exit(1)
+    else:
+        start = time.perf_counter()
+        index = SearchIndex.load(args.index)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    if not args.query:
+        parser.print_usage()
+        sys.exit(1)
+
+    query = ' '.join(args.query)
+    start = time.perf_counter()
+    hits = index.search(query, limit=args.limit, kind=args.kind)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    # Opening the index is part of every CLI call, so report both
+    print(f"🔍 {query!r}: {len(hits)} results in {elapsed_ms:.1f} ms "
+          f"(+{load_ms:.1f} ms to open the index, {load_ms + elapsed_ms:.1f} ms total)")
+    for rank, hit in enumerate(hits, 1):
+        print(f"\n{rank:2d}. [{hit.kind}] {hit.key}  ({hit.score:.2f})")
+        if hit.title and hit.title != hit.key:
+            print(f"    {hit.title}")
+        if hit.snippet and hit.snippet != hit.title:
+            print(f"    {hit.snippet}")
+
+
+if __name__ == "__main__":
+    main()
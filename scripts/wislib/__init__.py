@@ -0,0 +1,4 @@
+"""
+Shared helpers for the WIS extraction scripts
+Import from the submodules directly, e.g. `from wislib.dedupe import DigestSet`
+"""
@@ -0,0 +1,111 @@
+"""
+Persistent catalog of a live WIS/EPC database
+Tables, views, their columns and types and the row count of each table,
+discovered once and cached as JSON keyed by database identity, so later
+extractor runs plan their queries without probing the schema again.
+TableInfo.key guesses the ordered key column used for incremental and
+partitioned reads.
+"""
+
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from wislib.dedupe import record_id
+
+CATALOG_VERSION = 1
+
+# Column types usable as an ordered extraction key
+KEY_TYPES = ('INT', 'NUMERIC', 'DECIMAL', 'NUMBER', 'SERIAL')
+# Column names that look like identifiers: id, part_id, teilenr, doc_no, ...
+KEY_NAME = re.compile(r'(^|_)(id|no|num|key)$|nr$', re.IGNORECASE)
+
+
+@dataclass
+class TableInfo:
+    kind: str                                   # 'table' or 'view'
+    columns: List[Tuple[str, Optional[str]]] = field(default_factory=list)
+    rows: Optional[int] = None                  # not counted for views
+
+    @property
+    def key(self) -> Optional[str]:
+        """First numeric column named like an identifier, if any"""
+        for name, data_type in self.columns:
+            if (data_type and any(t in str(data_type).upper() for t in KEY_TYPES)
+                    and KEY_NAME.search(name)):
+                return name
+        return None
+
+
+@dataclass
+class Catalog:
+    identity: str
+    created: float = 0.0
+    tables: Dict[str, TableInfo] = field(default_factory=dict)
+
+    def names(self, kind: Optional[str] = None) -> List[str]:
+        return [name for name, info in self.tables.items() if kind is None or info.kind == kind]
+
+    def columns(self) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+        return {name: info.columns for name, info in self.tables.items()}
+
+    def rows(self, name: str) -> Optional[int]:
+        info = self.tables.get(name)
+        return info.rows if info else None
+
+    # ============== Cache ==============
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        tables = {name: {'kind': info.kind, 'columns': [list(c) for c in info.columns],
+                         'rows': info.rows}
+                  for name, info in self.tables.items()}
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CATALOG_VERSION, 'identity': self.identity,
+                       'created': self.created, 'tables': tables}, f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Catalog':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CATALOG_VERSION:
+            raise ValueError(f"{path} is not a version {CATALOG_VERSION} catalog")
+        tables = {name: TableInfo(info['kind'], [tuple(c) for c in info['columns']],
+                                  info.get('rows'))
+                  for name, info in data['tables'].items()}
+        return cls(data['identity'], data['created'], tables)
+
+
+def catalog_path(directory: Union[str, Path], identity: str) -> Path:
+    """One cache file per database: <directory>/catalog-<identity digest>.json"""
+    return Path(directory) / f"catalog-{record_id(identity)}.json"
+
+
+def load_catalog(identity: str, discover: Callable[[], Catalog],
+                 cache: Optional[Union[str, Path]] = None, refresh: bool = False) -> Catalog:
+    """Cached catalog for identity, calling discover() only when there is none.
+
+    A cache for another database, or an unreadable one, is rediscovered;
+    pass refresh=True after the database has changed.
+    """
+    if cache and not refresh and Path(cache).exists():
+        try:
+            catalog = Catalog.load(cache)
+            if catalog.identity == identity:
+                return catalog
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    catalog = discover()
+    catalog.identity = identity
+    catalog.created = catalog.created or time.time()
+    if cache:
+        catalog.save(cache)
+    return catalog
@@ -0,0 +1,274 @@
+"""
+CBF container decompression
+Sniffs each file's container from its magic bytes, then scans the whole file
+(memory-mapped) for embedded zlib, gzip and zip/deflate streams at arbitrary
+offsets. Every stream that decodes to its end - and so passes its Adler-32 /
+CRC check - is inflated incrementally with a decompressobj straight into its
+own output file, so no file is ever held in memory whole. Files are processed
+in parallel in a process pool.
+"""
+
+import bz2
+import lzma
+import mmap
+import os
+import re
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from wislib.inventory import relative_names
+from wislib.progress import Progress, file_progress
+
+IN_CHUNK = 256 * 1024
+OUT_CHUNK = 1024 * 1024
+# Bytes decoded from a candidate header before an output file is opened
+PROBE_SIZE = 512
+PREVIEW_SIZE = 1000
+
+CONTAINER_MAGIC = [
+    (b'\x1f\x8b\x08', 'gzip'),
+    (b'BZh', 'bzip2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+]
+DECODERS: Dict[str, Callable] = {
+    'zlib': lambda: zlib.decompressobj(zlib.MAX_WBITS),
+    'gzip': lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    'deflate': lambda: zlib.decompressobj(-zlib.MAX_WBITS),
+    'bzip2': bz2.BZ2Decompressor,
+    'xz': lzma.LZMADecompressor,
+}
+
+# Zip local file header: signature, version, flags, method, time, date,
+# crc, compressed size, size, name length, extra length
+ZIP_LOCAL = struct.Struct('<4sHHHHHIIIHH')
+
+
+def is_zlib_header(cmf: int, flg: int) -> bool:
+    """RFC 1950 header: deflate, window <= 32K, check bits valid, no preset dictionary"""
+    return (cmf & 0x0F) == 8 and (cmf >> 4) <= 7 and (cmf << 8 | flg) % 31 == 0 and not flg & 0x20
+
+
+def _scan_pattern() -> 're.Pattern':
+    alternatives = [re.escape(b'\x1f\x8b\x08'), re.escape(b'PK\x03\x04')]
+    for cmf in range(0x08, 0x80, 0x10):
+        flags = bytes(flg for flg in range(256) if is_zlib_header(cmf, flg))
+        alternatives.append(re.escape(bytes([cmf])) + b'[' + re.escape(flags) + b']')
+    return re.compile(b'|'.join(alternatives))
+
+
+STREAM_PATTERN = _scan_pattern()
+
+
+def sniff(header: bytes) -> str:
+    """Container type from the leading bytes of a file"""
+    for magic, name in CONTAINER_MAGIC:
+        if header.startswith(magic):
+            return name
+    if len(header) >= 2 and is_zlib_header(header[0], header[1]):
+        return 'zlib'
+    return 'unknown'
+
+
+def looks_like_text(data: bytes) -> bool:
+    """Check if data appears to be text"""
+    # Undecodable bytes count against the ratio instead of being dropped
+    text = data[:PREVIEW_SIZE].decode('utf-8', errors='replace')
+    if not text:
+        return False
+    printable = sum((c.isprintable() and c != '\ufffd') or c in '\r\n\t' for c in text)
+    return printable / len(text) > 0.7
+
+
+# ============== Streaming inflate ==============
+
+def _probe(mm, start: int, method: str) -> bool:
+    """Cheap rejection of false-positive headers before any file is written"""
+    try:
+        DECODERS[method]().decompress(mm[start:start + PROBE_SIZE])
+        return True
+    except (zlib.error, OSError, EOFError, lzma.LZMAError):
+        return False
+
+
+def inflate(mm, start: int, method: str, out) -> Tuple[int, int, bytes]:
+    """Decode one stream starting at `start` into out.
+
+    Returns (compressed bytes consumed, bytes written, preview). Raises
+    EOFError if the data ends before the stream does.
+    """
+    decoder = DECODERS[method]()
+    zlib_like = hasattr(decoder, 'unconsumed_tail')
+    position, end = start, len(mm)
+    written = 0
+    preview = b''
+    while not decoder.eof:
+        if position >= end:
+            raise EOFError(f"{method} stream at {start} is truncated")
+        data = mm[position:position + IN_CHUNK]
+        position += len(data)
+        block = decoder.decompress(data, OUT_CHUNK)
+        # Output is bounded per call; keep draining until the input is used up
+        while True:
+            if block:
+                out.write(block)
+                written += len(block)
+                if len(preview) < PREVIEW_SIZE:
+                    preview += block[:PREVIEW_SIZE - len(preview)]
+            if decoder.eof:
+                break
+            if zlib_like:
+                if not decoder.unconsumed_tail:
+                    break
+                block = decoder.decompress(decoder.unconsumed_tail, OUT_CHUNK)
+            else:
+                if decoder.needs_input:
+                    break
+                block = decoder.decompress(b'', OUT_CHUNK)
+    return position - start - len(decoder.unused_data), written, preview
+
+
+def _extract_stream(mm, start: int, method: str, output: Path) -> Optional[Dict]:
+    """Inflate one candidate stream to `output`; None if it is not a complete stream"""
+    if not _probe(mm, start, method):
+        return None
+    tmp = output.with_name(output.name + '.tmp')
+    try:
+        with open(tmp, 'wb') as out:
+            consumed, written, preview = inflate(mm, start, method, out)
+    except (zlib.error, OSError, EOFError, lzma.LZMAError):
+        tmp.unlink(missing_ok=True)
+        return None
+    if not written:
+        tmp.unlink(missing_ok=True)
+        return None
+    os.replace(tmp, output)
+    return {'offset': start, 'method': method, 'compressed_size': consumed,
+            'size': written, 'output': str(output), 'preview': preview}
+
+
+def _stream_at(mm, match: 're.Match') -> Tuple[int, str]:
+    """(data start, decoder) for a scan hit"""
+    start = match.start()
+    head = match.group()
+    if head.startswith(b'\x1f\x8b'):
+        return start, 'gzip'
+    if head.startswith(b'PK'):
+        if start + ZIP_LOCAL.size > len(mm):
+            return start, ''
+        fields = ZIP_LOCAL.unpack_from(mm, start)
+        method, name_length, extra_length = fields[3], fields[9], fields[10]
+        # Only deflated entries; stored ones are not compressed
+        if method != 8:
+            return start, ''
+        return start + ZIP_LOCAL.size + name_length + extra_length, 'deflate'
+    return start, 'zlib'
+
+
+# ============== Files ==============
+
+def process_cbf(path: Union[str, Path], output_dir: Union[str, Path],
+                name: Optional[str] = None) -> Dict:
+    """Decompress every stream found in one CBF file into output_dir.
+
+    name is the file's unique relative name ('a/x.cbf', default the file
+    name). Outputs are named <name>.<hex offset>.bin, so files in
+    subdirectories land in matching subdirectories. Files without any
+    stream that look like text are reported as 'raw' with a preview.
+    """
+    path, output_dir = Path(path), Path(output_dir)
+    name = name or path.name
+    (output_dir / name).parent.mkdir(parents=True, exist_ok=True)
+    size = path.stat().st_size
+    result = {'file': name, 'path': str(path), 'size': size, 'format': 'unknown',
+              'streams': [], 'decompressed_size': 0, 'content_preview': b''}
+    if not size:
+        return result
+
+    progress = file_progress(path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        result['format'] = sniff(mm[:8])
+        streams: List[Dict] = []
+        position = 0
+
+        def extract(start, method):
+            stream = _extract_stream(mm, start, method,
+                                     output_dir / f"{name}.{start:08x}.bin")
+            if stream:
+                streams.append(stream)
+            return stream
+
+        # Whole-file containers the scan cannot spot on its own
+        if result['format'] in ('bzip2', 'xz'):
+            stream = extract(0, result['format'])
+            if stream:
+                position = stream['compressed_size']
+
+        while position < size:
+            match = STREAM_PATTERN.search(mm, position)
+            if not match:
+                break
+            start, method = _stream_at(mm, match)
+            stream = extract(start, method) if method else None
+            # Skip what a stream consumed; a miss only moves past the header byte
+            position = start + stream['compressed_size'] if stream else match.start() + 1
+            progress.set(position)
+
+        if streams:
+            result['streams'] = streams
+            result['decompressed_size'] = sum(s['size'] for s in streams)
+            result['content_preview'] = streams[0].pop('preview')
+            for stream in streams:
+                stream.pop('preview', None)
+        elif looks_like_text(mm[:PREVIEW_SIZE]):
+            result['format'] = 'raw'
+            result['decompressed_size'] = size
+            result['content_preview'] = mm[:PREVIEW_SIZE]
+    progress.finish()
+    return result
+
+
+def decompress_cbf_files(paths: Iterable[Union[str, Path]], output_dir: Union[str, Path],
+                         workers: Optional[int] = None,
+                         on_result: Optional[Callable[[Dict], None]] = None,
+                         on_error: Optional[Callable[[Path, Exception], None]] = None,
+                         progress: Optional[Progress] = None) -> Dict[str, Dict]:
+    """Process CBF files in a process pool; returns {file path: result}.
+
+    workers=1 runs in this process (no pool), which is easier to debug.
+    Pool workers report scanned bytes to progress, if given.
+    """
+    paths = [Path(p) for p in paths]
+    names = relative_names(paths)
+    results: Dict[str, Dict] = {}
+
+    def done(result):
+        results[result['path']] = result
+        if on_result:
+            on_result(result)
+
+    def failed(path, error):
+        if on_error:
+            on_error(path, error)
+
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                done(process_cbf(path, output_dir, names[path]))
+            except OSError as e:
+                failed(path, e)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             **(progress.pool_args() if progress else {})) as pool:
+        futures = {pool.submit(process_cbf, path, output_dir, names[path]): path
+                   for path in paths}
+        for future in as_completed(futures):
+            try:
+                done(future.result())
+            except OSError as e:
+                failed(futures[future], e)
+    return results
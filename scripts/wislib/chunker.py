@@ -0,0 +1,223 @@
+"""
+Streaming AI chunk builder
+Packs related records (same source and table / content type) into chunks of
+a target size in characters or approximate tokens, with overlap between
+consecutive chunks of a group. Oversized records are split on the nearest
+paragraph, line or sentence break. Repeated records and chunks are
+dropped by content digest; chunks carry the merged metadata of their
+records and are streamed into JSONL shards for the embedding pipeline.
+
+Defaults follow DEFAULT_CHUNK_CONFIG in src/utils/documentChunking.ts.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from wislib.dedupe import DigestSet, record_id
+from wislib.jsonl import open_jsonl
+
+DEFAULT_TARGET_SIZE = 1500
+DEFAULT_OVERLAP = 200
+DEFAULT_MAX_SIZE = 2000
+DEFAULT_SHARD_RECORDS = 10000
+SEPARATORS = ('\n\n', '\n', '. ', '! ', '? ', '; ', ': ', ' ')
+JOINER = '\n\n'
+
+# Metadata fields collected from every record of a chunk into sorted lists
+MERGED_FIELDS = {
+    'vehicle_model': 'vehicle_models',
+    'part_number': 'part_numbers',
+    'procedure_type': 'procedure_types',
+}
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+class Piece(NamedTuple):
+    """One record's text; pieces with the same group are packed together"""
+    text: str
+    group: Hashable
+    metadata: Dict[str, Any]
+
+
+class _Buffer:
+    def __init__(self, joiner_size: int):
+        self.joiner_size = joiner_size
+        self.pieces: List[Piece] = []
+        self.sizes: List[int] = []
+        # Leading pieces carried over from the previous chunk
+        self.carried = 0
+
+    @property
+    def size(self) -> int:
+        return sum(self.sizes) + self.joiner_size * max(len(self.sizes) - 1, 0)
+
+    @property
+    def fresh(self) -> bool:
+        return len(self.pieces) > self.carried
+
+
+class Chunker:
+    """Turn a stream of Pieces into a stream of chunk dicts"""
+
+    def __init__(self, target_size: int = DEFAULT_TARGET_SIZE, overlap: int = DEFAULT_OVERLAP,
+                 max_size: int = DEFAULT_MAX_SIZE, unit: str = 'chars',
+                 separators: Iterable[str] = SEPARATORS, dedupe: bool = True):
+        if unit not in ('chars', 'tokens'):
+            raise ValueError(f"Unknown chunk unit {unit!r}, expected 'chars' or 'tokens'")
+        if not 0 <= overlap < target_size <= max_size:
+            raise ValueError("Chunk sizes must satisfy 0 <= overlap < target_size <= max_size")
+        self.target_size = target_size
+        self.overlap = overlap
+        self.max_size = max_size
+        self.unit = unit
+        self.measure: Callable[[str], int] = len if unit == 'chars' else count_tokens
+        self.separators = tuple(separators)
+        self.joiner_size = self.measure(JOINER)
+        # Repeated records are dropped before packing, repeated chunks after
+        self.seen_pieces = DigestSet() if dedupe else None
+        self.seen = DigestSet() if dedupe else None
+        self.stats = {'pieces': 0, 'duplicate_pieces': 0, 'chunks': 0, 'duplicates': 0}
+
+    # ============== Splitting ==============
+
+    def _break_at(self, text: str, start: int, end: int) -> int:
+        """Latest separator break in the second half of text[start:end]"""
+        for separator in self.separators:
+            position = text.rfind(separator, start + (end - start) // 2, end)
+            if position > start:
+                return position + len(separator)
+        return end
+
+    def split(self, piece: Piece) -> Iterator[Piece]:
+        """Windows of at most target_size over an oversized piece, overlapping by `overlap`"""
+        text = piece.text
+        # Window sizes are worked out in characters; scale token targets by the text's density
+        scale = len(text) / max(self.measure(text), 1)
+        window = max(int(self.target_size * scale), 1)
+        overlap = int(self.overlap * scale)
+        start = 0
+        while start < len(text):
+            end = min(start + window, len(text))
+            if end < len(text):
+                end = self._break_at(text, start, end)
+            yield piece._replace(text=text[start:end].strip())
+            if end >= len(text):
+                break
+            next_start = end - overlap
+            # Begin the overlap on a word boundary, but always move forward
+            space = text.find(' ', next_start, end)
+            start = max(space + 1 if space >= 0 else next_start, start + 1)
+
+    # ============== Packing ==============
+
+    def _chunk(self, pieces: List[Piece]) -> Optional[Dict]:
+        content = JOINER.join(p.text for p in pieces)
+        if self.seen is not None and not self.seen.add(content):
+            self.stats['duplicates'] += 1
+            return None
+        metadata = {k: v for k, v in pieces[0].metadata.items() if k not in MERGED_FIELDS}
+        for field, merged in MERGED_FIELDS.items():
+            values = sorted({str(p.metadata[field]) for p in pieces if p.metadata.get(field)})
+            if values:
+                metadata[merged] = values
+        metadata['records'] = len(pieces)
+        metadata['char_count'] = len(content)
+        metadata['word_count'] = len(content.split())
+        if self.unit == 'tokens':
+            metadata['token_count'] = count_tokens(content)
+        self.stats['chunks'] += 1
+        return {'id': record_id(content), 'content': content, 'metadata': metadata}
+
+    def _emit(self, buffer: _Buffer) -> Optional[Dict]:
+        chunk = self._chunk(buffer.pieces)
+        # Carry whole trailing pieces that fit into the overlap
+        keep, size = 0, 0
+        for piece_size in reversed(buffer.sizes):
+            size += piece_size + (self.joiner_size if keep else 0)
+            if size > self.overlap:
+                break
+            keep += 1
+        if keep == len(buffer.pieces):
+            keep = 0
+        buffer.pieces = buffer.pieces[len(buffer.pieces) - keep:] if keep else []
+        buffer.sizes = buffer.sizes[len(buffer.sizes) - keep:] if keep else []
+        buffer.carried = keep
+        return chunk
+
+    def chunks(self, pieces: Iterable[Piece]) -> Iterator[Dict]:
+        """Pack pieces into chunks; one open buffer per group, so groups may interleave"""
+        buffers: Dict[Hashable, _Buffer] = {}
+        for piece in pieces:
+            self.stats['pieces'] += 1
+            text = piece.text.strip()
+            if not text:
+                continue
+            if self.seen_pieces is not None and not self.seen_pieces.add(text):
+                self.stats['duplicate_pieces'] += 1
+                continue
+            piece = piece._replace(text=text)
+            parts = self.split(piece) if self.measure(text) > self.max_size else [piece]
+            buffer = buffers.get(piece.group)
+            if buffer is None:
+                buffer = buffers[piece.group] = _Buffer(self.joiner_size)
+            for part in parts:
+                size = self.measure(part.text)
+                if buffer.pieces and buffer.size + self.joiner_size + size > self.target_size:
+                    if buffer.fresh:
+                        chunk = self._emit(buffer)
+                        if chunk:
+                            yield chunk
+                    # Drop carried overlap that no longer fits
+                    while buffer.pieces and buffer.size + self.joiner_size + size > self.target_size:
+                        buffer.pieces.pop(0)
+                        buffer.sizes.pop(0)
+                        buffer.carried -= 1
+                buffer.pieces.append(part)
+                buffer.sizes.append(size)
+        for buffer in buffers.values():
+            if buffer.fresh:
+                chunk = self._chunk(buffer.pieces)
+                if chunk:
+                    yield chunk
+
+
+# ============== Shards ==============
+
+def write_shards(chunks: Iterable[Dict], output_dir: Union[str, Path], prefix: str = 'ai_chunks',
+                 shard_records: int = DEFAULT_SHARD_RECORDS,
+                 compress: bool = False) -> Dict[str, Any]:
+    """Stream chunks into <prefix>-00000.jsonl, -00001.jsonl, ...
+
+    Writes <prefix>.shards.json listing every shard and its record count and
+    returns the same listing.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    shards: List[Dict[str, Any]] = []
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None or writer.total >= shard_records:
+                if writer is not None:
+                    writer.close()
+                    shards.append({'file': writer.path.name, 'records': writer.total})
+                writer = open_jsonl(output_dir / f"{prefix}-{len(shards):05d}.jsonl",
+                                    compress=compress)
+            writer.write('chunk', chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+            shards.append({'file': writer.path.name, 'records': writer.total})
+
+    listing = {'shards': shards, 'records': sum(s['records'] for s in shards)}
+    with open(output_dir / f"{prefix}.shards.json", 'w', encoding='utf-8') as f:
+        json.dump(listing, f, indent=2)
+    return listing
@@ -0,0 +1,251 @@
+"""
+Image carving for CPG files
+Scans each memory-mapped CPG for embedded JPEG, PNG and BMP payloads and
+writes every one it can delimit exactly to its own file:
+
+  JPEG  SOI, marker segments walked by length up to SOS, then the entropy
+        coded data up to EOI (thumbnails inside APP segments are skipped)
+  PNG   signature, then chunks walked by length up to IEND (IHDR CRC checked)
+  BMP   file header plus a validated DIB header; the length comes from the header
+
+Files are carved in a process pool; the parent writes one JSONL index of
+image id, source file, offset, size, format and dimensions.
+"""
+
+import mmap
+import re
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from wislib.inventory import relative_names
+from wislib.jsonl import open_jsonl
+from wislib.progress import Progress, file_progress
+
+COPY_CHUNK = 1024 * 1024
+HEADER_HEX_BYTES = 32
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IMAGE_PATTERN = re.compile(re.escape(PNG_SIGNATURE) + b'|\xff\xd8\xff|BM')
+EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'bmp': 'bmp'}
+
+PNG_CHUNK = struct.Struct('>I4s')
+# File header: magic, file size, two reserved words, pixel data offset
+BMP_FILE = struct.Struct('<2sIHHI')
+# DIB headers: BITMAPCOREHEADER has 16-bit dimensions, the rest 32-bit
+BMP_CORE = struct.Struct('<IHHHH')
+BMP_INFO = struct.Struct('<IiiHH')
+BMP_DIB_SIZES = (12, 40, 52, 56, 64, 108, 124)
+BMP_BIT_COUNTS = (1, 4, 8, 16, 24, 32)
+
+# JPEG markers without a length field
+JPEG_STANDALONE = set(range(0xD0, 0xD8)) | {0x01}
+JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+Carved = Tuple[int, int, int]   # end offset, width, height
+
+
+# ============== Formats ==============
+
+def carve_jpeg(mm, start: int) -> Optional[Carved]:
+    """End offset and dimensions of the JPEG at start, or None"""
+    end = len(mm)
+    position = start + 2
+    width = height = 0
+    scanning = False
+    while position + 1 < end:
+        if mm[position] != 0xFF:
+            if not scanning:
+                return None
+            # Entropy-coded data: data bytes of 0xFF are always stuffed as FF 00
+            position = mm.find(b'\xff', position)
+            if position < 0:
+                return None
+            continue
+        marker = mm[position + 1]
+        if marker == 0xFF:                      # fill byte
+            position += 1
+            continue
+        if marker == 0xD9:
+            return position + 2, width, height
+        if marker in JPEG_STANDALONE or (scanning and marker == 0x00):
+            position += 2
+            continue
+        if marker == 0x00 or position + 4 > end:
+            return None
+        length = mm[position + 2] << 8 | mm[position + 3]
+        if length < 2:
+            return None
+        if marker in JPEG_SOF and position + 9 <= end:
+            height = mm[position + 5] << 8 | mm[position + 6]
+            width = mm[position + 7] << 8 | mm[position + 8]
+        position += 2 + length
+        scanning = marker == 0xDA
+    return None
+
+
+def carve_png(mm, start: int) -> Optional[Carved]:
+    end = len(mm)
+    position = start + len(PNG_SIGNATURE)
+    width = height = 0
+    while position + PNG_CHUNK.size <= end:
+        length, kind = PNG_CHUNK.unpack_from(mm, position)
+        chunk_end = position + PNG_CHUNK.size + length + 4
+        if chunk_end > end or not kind.isalpha():
+            return None
+        if kind == b'IHDR':
+            if length != 13:
+                return None
+            crc = struct.unpack_from('>I', mm, chunk_end - 4)[0]
+            if zlib.crc32(mm[position + 4:chunk_end - 4]) != crc:
+                return None
+            width, height = struct.unpack_from('>II', mm, position + PNG_CHUNK.size)
+        elif not width:
+            return None                          # IHDR must come first
+        if kind == b'IEND':
+            return chunk_end, width, height
+        position = chunk_end
+    return None
+
+
+def carve_bmp(mm, start: int) -> Optional[Carved]:
+    end = len(mm)
+    if start + BMP_FILE.size + BMP_CORE.size > end:
+        return None
+    _, size, reserved1, reserved2, pixels = BMP_FILE.unpack_from(mm, start)
+    dib_size = struct.unpack_from('<I', mm, start + BMP_FILE.size)[0]
+    if reserved1 or reserved2 or dib_size not in BMP_DIB_SIZES:
+        return None
+    if dib_size == 12:
+        _, width, height, planes, bits = BMP_CORE.unpack_from(mm, start + BMP_FILE.size)
+    else:
+        if start + BMP_FILE.size + BMP_INFO.size > end:
+            return None
+        _, width, height, planes, bits = BMP_INFO.unpack_from(mm, start + BMP_FILE.size)
+        height = abs(height)                     # negative height = top-down rows
+    if planes != 1 or bits not in BMP_BIT_COUNTS or width <= 0 or height <= 0:
+        return None
+    if not BMP_FILE.size + dib_size <= pixels < size or start + size > end:
+        return None
+    return start + size, width, height
+
+
+CARVERS: Dict[bytes, Tuple[str, Callable]] = {
+    b'\xff': ('jpeg', carve_jpeg),
+    b'\x89': ('png', carve_png),
+    b'B': ('bmp', carve_bmp),
+}
+
+
+# ============== Files ==============
+
+def _copy(mm, start: int, end: int, output: Path):
+    """Write mm[start:end] in bounded slices"""
+    with open(output, 'wb') as out:
+        for offset in range(start, end, COPY_CHUNK):
+            out.write(mm[offset:min(offset + COPY_CHUNK, end)])
+
+
+def carve_cpg(path: Union[str, Path], output_dir: Union[str, Path],
+              name: Optional[str] = None) -> Dict:
+    """Carve every embedded image from one CPG file into output_dir.
+
+    name is the file's unique relative name ('a/x.cpg', default the file
+    name). Images are named <name without suffix>_<n>.<ext>, so files in
+    subdirectories land in matching subdirectories; a file with none is
+    reported as 'proprietary' with its leading bytes in hex.
+    """
+    path, output_dir = Path(path), Path(output_dir)
+    name = name or path.name
+    stem = name[:-len(path.suffix)] if path.suffix else name
+    size = path.stat().st_size
+    result = {'file': name, 'path': str(path), 'size': size,
+              'type': 'proprietary', 'images': []}
+    if not size:
+        return result
+
+    progress = file_progress(path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        images: List[Dict] = []
+        position = 0
+        while position < size:
+            match = IMAGE_PATTERN.search(mm, position)
+            if not match:
+                break
+            start = match.start()
+            fmt, carve = CARVERS[match.group()[:1]]
+            carved = carve(mm, start)
+            if not carved:
+                position = start + 1
+                continue
+            end, width, height = carved
+            image_id = f"{stem}_{len(images):03d}"
+            output = output_dir / f"{image_id}.{EXTENSIONS[fmt]}"
+            output.parent.mkdir(parents=True, exist_ok=True)
+            _copy(mm, start, end, output)
+            images.append({'image_id': image_id, 'offset': start, 'size': end - start,
+                           'format': fmt, 'width': width, 'height': height,
+                           'output': str(output)})
+            # Nothing inside a carved image is scanned again
+            position = end
+            progress.set(position)
+
+        if images:
+            result['type'] = f"embedded_{images[0]['format']}"
+            result['images'] = images
+        else:
+            result['header_hex'] = mm[:HEADER_HEX_BYTES].hex()
+    progress.finish()
+    return result
+
+
+def carve_cpg_files(paths: Iterable[Union[str, Path]], output_dir: Union[str, Path],
+                    workers: Optional[int] = None, index_name: str = 'index.jsonl',
+                    on_result: Optional[Callable[[Dict], None]] = None,
+                    on_error: Optional[Callable[[Path, Exception], None]] = None,
+                    progress: Optional[Progress] = None) -> Dict[str, Dict]:
+    """Carve CPG files in a process pool; returns {file path: result}.
+
+    Every carved image is also written as one 'image' record to
+    <output_dir>/<index_name>. workers=1 runs in this process. Pool
+    workers report scanned bytes to progress, if given.
+    """
+    paths = [Path(p) for p in paths]
+    names = relative_names(paths)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Dict] = {}
+
+    with open_jsonl(output_dir / index_name) as index:
+        def done(result):
+            results[result['path']] = result
+            index.write_many('image', ({'file': result['path'], **image}
+                                       for image in result['images']))
+            if on_result:
+                on_result(result)
+
+        def failed(path, error):
+            if on_error:
+                on_error(path, error)
+
+        if workers == 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    done(carve_cpg(path, output_dir, names[path]))
+                except OSError as e:
+                    failed(path, e)
+            return results
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 **(progress.pool_args() if progress else {})) as pool:
+            futures = {pool.submit(carve_cpg, path, output_dir, names[path]): path
+                       for path in paths}
+            for future in as_completed(futures):
+                try:
+                    done(future.result())
+                except OSError as e:
+                    failed(futures[future], e)
+    return results
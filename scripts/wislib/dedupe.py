@@ -0,0 +1,100 @@
+"""
+Streaming de-duplication with fixed-width blake2b digests
+Records are reduced to a canonical tuple encoding and hashed to a 64 or
+128-bit integer, so millions of items cost a few bytes each instead of a
+full md5(json.dumps(...)) per check.
+"""
+
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, List
+
+
+def encode_fields(fields: Iterable[Any]) -> bytes:
+    """Canonical byte encoding of a tuple of fields.
+
+    Every field is length-prefixed, so ('ab', 'c') and ('a', 'bc') never
+    encode to the same bytes. None and empty string are kept distinct.
+    """
+    out = bytearray()
+    for value in fields:
+        if value is None:
+            out += b'\xff\xff\xff\xff'
+            continue
+        if isinstance(value, bytes):
+            raw = value
+        else:
+            raw = str(value).encode('utf-8', errors='surrogatepass')
+        out += len(raw).to_bytes(4, 'little')
+        out += raw
+    return bytes(out)
+
+
+def record_fields(record: Dict[str, Any]) -> tuple:
+    """Flatten a dict into a key-sorted (key, value, key, value, ...) tuple"""
+    fields = []
+    for key in sorted(record):
+        fields.append(key)
+        fields.append(record[key])
+    return tuple(fields)
+
+
+def digest_int(data: bytes, bits: int = 64) -> int:
+    """Hash bytes to an unsigned integer of the given width (64 or 128)"""
+    return int.from_bytes(
+        hashlib.blake2b(data, digest_size=bits // 8).digest(), 'little'
+    )
+
+
+def fields_digest(*fields: Any, bits: int = 64) -> int:
+    """Digest of a tuple of fields"""
+    return digest_int(encode_fields(fields), bits)
+
+
+def record_id(*fields: Any, bits: int = 64) -> str:
+    """Fixed-width hex id for a tuple of fields (16 hex chars at 64 bits)"""
+    return format(fields_digest(*fields, bits=bits), f'0{bits // 4}x')
+
+
+class DigestSet:
+    """Set of record digests, checked inline while a scan is running.
+
+    At 64 bits the birthday bound puts a first collision around 4 billion
+    records; use bits=128 where even that margin matters.
+    """
+
+    def __init__(self, bits: int = 64):
+        if bits not in (64, 128):
+            raise ValueError(f"Unsupported digest width: {bits}")
+        self.bits = bits
+        self._seen = set()
+
+    def add(self, *fields: Any) -> bool:
+        """Record the fields, returning True if they had not been seen"""
+        digest = digest_int(encode_fields(fields), self.bits)
+        if digest in self._seen:
+            return False
+        self._seen.add(digest)
+        return True
+
+    def add_record(self, record: Dict[str, Any]) -> bool:
+        """Record a dict (keys included), returning True if it is new"""
+        return self.add(*record_fields(record))
+
+    def __contains__(self, fields) -> bool:
+        if not isinstance(fields, tuple):
+            fields = (fields,)
+        return digest_int(encode_fields(fields), self.bits) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def sorted_digests(self) -> List[int]:
+        """All digests in ascending order"""
+        return sorted(self._seen)
+
+    def to_array(self) -> array:
+        """Compact sorted array of 64-bit digests (8 bytes per record)"""
+        if self.bits != 64:
+            raise ValueError("to_array() is only available for 64-bit digests")
+        return array('Q', sorted(self._seen))
@@ -0,0 +1,261 @@
+"""
+Delta exports between extraction runs
+A run's manifest records, per record kind, the sorted 64-bit digests of the
+record keys, a content digest per key and the key text. Diffing the sorted
+arrays of two manifests yields inserted, updated and removed records, and
+only those are written out as SQL, COPY or JSONL, together with a
+sha256sum-compatible checksum file covering every output file.
+
+Each delta is numbered (wis_delta-0001.sql, -0002, ...) and is relative
+to the one before it, so a delta not yet loaded is never overwritten;
+load them in order.
+"""
+
+import hashlib
+import re
+import struct
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from wislib.dedupe import fields_digest
+from wislib.jsonl import open_jsonl, summary_path
+from wislib.sqlwriter import DEFAULT_BATCH_SIZE, TableSpec, open_sql, sql_literal
+
+MAGIC = b'WISMAN\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sII')   # magic, version, kind count
+KIND = struct.Struct('<16sQQ')    # kind name, record count, key blob length
+FORMATS = ('sql', 'copy', 'jsonl')
+
+
+@dataclass(frozen=True)
+class DeltaTable:
+    """A record kind, the table its rows load into and the identifying column"""
+    kind: str
+    spec: TableSpec
+    key: str
+
+    @property
+    def key_index(self) -> int:
+        return self.spec.columns.index(self.key)
+
+
+@dataclass
+class KindManifest:
+    """Sorted key digests with parallel content digests and key text.
+
+    positions maps each sorted entry back to its row in the current run; it
+    is only set for manifests built in this process and is never saved.
+    """
+    keys: array
+    digests: array
+    key_text: List[str]
+    positions: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, rows: Sequence[Sequence], key_index: int) -> 'KindManifest':
+        entries = []
+        for position, row in enumerate(rows):
+            key = row[key_index]
+            # Key text is stored NUL-separated
+            text = str(key).replace('\x00', '')
+            entries.append((fields_digest(text), fields_digest(*row), position, text))
+        # Stable sort: for a repeated key the first row wins
+        entries.sort(key=lambda entry: entry[0])
+        keys, digests, positions, key_text = array('Q'), array('Q'), array('I'), []
+        previous = None
+        for key_digest, content_digest, position, text in entries:
+            if key_digest == previous:
+                continue
+            previous = key_digest
+            keys.append(key_digest)
+            digests.append(content_digest)
+            positions.append(position)
+            key_text.append(text)
+        return cls(keys, digests, key_text, positions)
+
+
+@dataclass
+class Manifest:
+    kinds: Dict[str, KindManifest] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, tables: Sequence[DeltaTable],
+              rows_by_kind: Dict[str, Sequence[Sequence]]) -> 'Manifest':
+        return cls({t.kind: KindManifest.build(rows_by_kind.get(t.kind, []), t.key_index)
+                    for t in tables})
+
+    def save(self, path: Union[str, Path]):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.kinds)))
+            for kind, manifest in self.kinds.items():
+                blob = '\x00'.join(manifest.key_text).encode('utf-8', errors='surrogatepass')
+                f.write(KIND.pack(kind.encode('ascii'), len(manifest), len(blob)))
+                manifest.keys.tofile(f)
+                manifest.digests.tofile(f)
+                f.write(blob)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Manifest':
+        manifest = cls()
+        with open(path, 'rb') as f:
+            magic, version, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} WIS manifest")
+            for _ in range(count):
+                name, records, blob_length = KIND.unpack(f.read(KIND.size))
+                keys, digests = array('Q'), array('Q')
+                keys.fromfile(f, records)
+                digests.fromfile(f, records)
+                blob = f.read(blob_length).decode('utf-8', errors='surrogatepass')
+                key_text = blob.split('\x00') if records else []
+                manifest.kinds[name.rstrip(b'\x00').decode('ascii')] = \
+                    KindManifest(keys, digests, key_text)
+        return manifest
+
+
+@dataclass
+class KindDelta:
+    inserted: List[int]   # positions of new rows
+    updated: List[int]    # positions of changed rows
+    removed: List[str]    # keys that no longer exist
+
+    def __len__(self) -> int:
+        return len(self.inserted) + len(self.updated) + len(self.removed)
+
+
+def diff_kind(old: KindManifest, new: KindManifest) -> KindDelta:
+    """Set operations over the two sorted key arrays"""
+    if not len(old):
+        return KindDelta(list(new.positions), [], [])
+    if HAS_NUMPY:
+        return _diff_numpy(old, new)
+    inserted, updated, removed = [], [], []
+    old_keys, new_keys = old.keys, new.keys
+    i = j = 0
+    while i < len(old_keys) and j < len(new_keys):
+        if old_keys[i] == new_keys[j]:
+            if old.digests[i] != new.digests[j]:
+                updated.append(new.positions[j])
+            i += 1
+            j += 1
+        elif old_keys[i] < new_keys[j]:
+            removed.append(old.key_text[i])
+            i += 1
+        else:
+            inserted.append(new.positions[j])
+            j += 1
+    removed.extend(old.key_text[i:])
+    inserted.extend(new.positions[j:])
+    return KindDelta(inserted, updated, removed)
+
+
+def _diff_numpy(old: KindManifest, new: KindManifest) -> KindDelta:
+    old_keys = np.frombuffer(old.keys, dtype=np.uint64)
+    new_keys = np.frombuffer(new.keys, dtype=np.uint64)
+    _, old_idx, new_idx = np.intersect1d(old_keys, new_keys, assume_unique=True,
+                                         return_indices=True)
+    changed = (np.frombuffer(old.digests, dtype=np.uint64)[old_idx]
+               != np.frombuffer(new.digests, dtype=np.uint64)[new_idx])
+    new_only = np.ones(len(new_keys), dtype=bool)
+    new_only[new_idx] = False
+    old_only = np.ones(len(old_keys), dtype=bool)
+    old_only[old_idx] = False
+    positions = np.frombuffer(new.positions, dtype=np.uint32)
+    return KindDelta(
+        inserted=positions[new_only].tolist(),
+        updated=positions[np.sort(new_idx[changed])].tolist(),
+        removed=[old.key_text[i] for i in np.flatnonzero(old_only)],
+    )
+
+
+def diff(old: Optional[Manifest], new: Manifest) -> Dict[str, KindDelta]:
+    """Delta per kind; with no previous manifest everything is inserted"""
+    empty = KindManifest(array('Q'), array('Q'), [])
+    return {kind: diff_kind((old.kinds.get(kind) if old else None) or empty, manifest)
+            for kind, manifest in new.kinds.items()}
+
+
+# ============== Output ==============
+
+def next_delta_path(output_dir: Union[str, Path], stem: str = 'wis_delta',
+                    suffix: str = '.sql') -> Path:
+    """<stem>-NNNN<suffix>, numbered one past the highest delta already there"""
+    output_dir = Path(output_dir)
+    numbered = re.compile(re.escape(stem) + r'-(\d+)')
+    numbers = [int(m.group(1)) for p in output_dir.glob(f"{stem}-*")
+               for m in [numbered.match(p.name)] if m]
+    return output_dir / f"{stem}-{max(numbers, default=0) + 1:04d}{suffix}"
+
+
+def write_checksums(paths: Iterable[Path], checksum_file: Union[str, Path]) -> Path:
+    """sha256sum-compatible listing; verify with `sha256sum -c <file>`"""
+    checksum_file = Path(checksum_file)
+    with open(checksum_file, 'w', encoding='utf-8') as out:
+        for path in paths:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            out.write(f"{digest.hexdigest()}  {Path(path).name}\n")
+    return checksum_file
+
+
+def write_delta(output_file: Union[str, Path], tables: Sequence[DeltaTable],
+                deltas: Dict[str, KindDelta], rows_by_kind: Dict[str, Sequence[Sequence]],
+                fmt: str = 'sql', batch_size: int = DEFAULT_BATCH_SIZE,
+                max_file_bytes: Optional[int] = None, compress: bool = False) -> List[Path]:
+    """Write only the changed records and return the files written (checksum file last).
+
+    SQL / COPY delete removed and updated keys, then load new and updated
+    rows. JSONL records carry an "op" of insert, update or delete.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown delta format {fmt!r}, expected one of {FORMATS}")
+    output_file = Path(output_file)
+
+    if fmt == 'jsonl':
+        with open_jsonl(output_file, compress=compress) as out:
+            for table in tables:
+                delta, rows = deltas[table.kind], rows_by_kind.get(table.kind, [])
+                out.write_many(table.kind, ({'op': 'delete', table.key: key}
+                                            for key in delta.removed))
+                for op, positions in (('update', delta.updated), ('insert', delta.inserted)):
+                    out.write_many(table.kind, (
+                        {'op': op, **dict(zip(table.spec.columns, rows[p]))} for p in positions
+                    ))
+        paths = [out.path, summary_path(out.path)]
+    else:
+        mode = 'copy' if fmt == 'copy' else 'insert'
+        with open_sql(output_file, mode=mode, batch_size=batch_size,
+                      max_file_bytes=max_file_bytes) as sql:
+            sql.comment("Mercedes WIS delta import")
+            for table in tables:
+                delta = deltas[table.kind]
+                sql.comment(f"{table.spec.table}: +{len(delta.inserted)} "
+                            f"~{len(delta.updated)} -{len(delta.removed)}")
+            sql.comment()
+            sql.begin()
+            for table in tables:
+                delta, rows = deltas[table.kind], rows_by_kind.get(table.kind, [])
+                stale = list(delta.removed) + [str(rows[p][table.key_index]) for p in delta.updated]
+                for start in range(0, len(stale), batch_size):
+                    keys = ', '.join(sql_literal(k) for k in stale[start:start + batch_size])
+                    sql.statement(f"DELETE FROM {table.spec.table} WHERE {table.key} IN ({keys})")
+                sql.write_rows(table.spec, (rows[p] for p in delta.updated + delta.inserted))
+            sql.commit()
+        paths = sql.paths
+
+    checksum_file = output_file.with_name(output_file.name.split('.')[0] + '.sha256')
+    return paths + [write_checksums(paths, checksum_file)]
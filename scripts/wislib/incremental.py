@@ -0,0 +1,189 @@
+"""
+Incremental extraction state for the live TransBase extractor
+Every extraction job (the parts table, the procedures table, the Unimog
+search of one table) keeps its records in a gzip JSONL segment and the
+fingerprint of its table -- row count and maximum key -- in a state file.
+On the next run a fresh fingerprint decides per job: unchanged tables are
+replayed from their segments, tables that only grew past the stored
+maximum key fetch just the new key range, anything else is re-extracted.
+
+Counts and keys cannot see rows updated in place; run a full extraction
+after such changes. The content checksum of each segment is kept so such
+a run reports which tables really changed.
+"""
+
+import gzip
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from wislib.dedupe import fields_digest, record_fields
+from wislib.sqlwriter import sql_literal
+
+STATE_VERSION = 1
+SEGMENT_BATCH = 1000
+
+SKIP, APPEND, FULL = 'skip', 'append', 'full'
+
+
+def key_value(value: Any) -> Any:
+    """A key as stored in the state file: numbers stay numbers"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+@dataclass
+class JobState:
+    """What one job extracted last time and from which table state"""
+    table: str
+    signature: str              # changes when the job's query changes
+    rows: int                   # COUNT(*) of the table
+    key: Optional[str] = None
+    max_key: Any = None
+    records: int = 0            # records in the segment
+    checksum: str = ''
+    segment: str = ''
+    extracted: float = 0.0
+
+
+@dataclass
+class Fingerprint:
+    rows: int
+    max_key: Any = None
+    new_rows: Optional[int] = None      # rows above the previous max key
+
+
+def fingerprint_sql(table: str, key: Optional[str], previous: Optional[JobState]) -> str:
+    """One aggregate query: row count, max key and rows past the old max key"""
+    if not key:
+        return f"SELECT COUNT(*) FROM {table}"
+    columns = f"COUNT(*), MAX({key})"
+    if previous and previous.key == key and previous.max_key is not None:
+        columns += (f", SUM(CASE WHEN {key} > {sql_literal(previous.max_key)} "
+                    f"THEN 1 ELSE 0 END)")
+    return f"SELECT {columns} FROM {table}"
+
+
+def read_fingerprint(row) -> Fingerprint:
+    values = list(row) + [None] * (3 - len(row))
+    return Fingerprint(int(values[0] or 0), key_value(values[1]),
+                       None if values[2] is None else int(values[2]))
+
+
+def plan(previous: Optional[JobState], signature: str, key: Optional[str],
+         current: Fingerprint, segment_exists: bool) -> str:
+    """SKIP, APPEND (fetch key > previous.max_key) or FULL for one job"""
+    if (previous is None or not segment_exists or previous.signature != signature
+            or previous.key != key):
+        return FULL
+    if current.rows == previous.rows and current.max_key == previous.max_key:
+        return SKIP
+    if (key and previous.max_key is not None and current.new_rows
+            and current.rows - current.new_rows == previous.rows):
+        # Only rows past the old maximum were added
+        return APPEND
+    return FULL
+
+
+# ============== Segments ==============
+
+class Checksum:
+    """Order-independent checksum of a set of records"""
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, record: Dict):
+        self.total = (self.total + fields_digest(*record_fields(record))) & 0xFFFFFFFFFFFFFFFF
+
+    def hexdigest(self) -> str:
+        return format(self.total, '016x')
+
+
+class SegmentWriter:
+    """Write a job's records to <path>.tmp; commit() moves it into place"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_name(self.path.name + '.tmp')
+        self._f = gzip.open(self.tmp, 'wt', encoding='utf-8', compresslevel=6)
+        self.records = 0
+        self.checksum = Checksum()
+
+    def write(self, batch: List[Dict]):
+        for record in batch:
+            self._f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            self.checksum.add(record)
+        self.records += len(batch)
+
+    def commit(self):
+        self._f.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self):
+        self._f.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def iter_segment(path: Union[str, Path], batch_size: int = SEGMENT_BATCH) -> Iterator[List[Dict]]:
+    """Records of a segment, in batches"""
+    batch = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# ============== State file ==============
+
+class ExtractState:
+    """JobState per job name, saved as JSON next to the segments"""
+
+    def __init__(self, path: Union[str, Path], jobs: Optional[Dict[str, JobState]] = None):
+        self.path = Path(path)
+        self.jobs: Dict[str, JobState] = jobs or {}
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ExtractState':
+        """State from path; missing or unreadable state starts empty"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != STATE_VERSION:
+                return cls(path)
+            return cls(path, {name: JobState(**job) for name, job in data['jobs'].items()})
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(path)
+
+    def segment_path(self, name: str) -> Path:
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+        return self.path.parent / 'segments' / f"{safe}.jsonl.gz"
+
+    def record(self, name: str, state: JobState, segment: SegmentWriter):
+        state.records = segment.records
+        state.checksum = segment.checksum.hexdigest()
+        state.segment = segment.path.name
+        state.extracted = time.time()
+        self.jobs[name] = state
+
+    def save(self) -> Path:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION,
+                       'jobs': {name: asdict(job) for name, job in sorted(self.jobs.items())}},
+                      f, indent=2, default=str)
+        os.replace(tmp, self.path)
+        return self.path
@@ -0,0 +1,155 @@
+"""
+Single-pass inventory of an EWA/WIS installation
+Walks the tree once with os.scandir, classifies every file by type and
+records (path, size, mtime, type) for the ones the extractors want. The
+inventory is cached as JSON so later phases and later runs do not walk a
+slow mounted image again.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+INVENTORY_VERSION = 1
+
+# type -> test on the lower-cased file name
+FILE_TYPES: Dict[str, Callable[[str], bool]] = {
+    'mdb': lambda name: name.endswith('.mdb'),
+    'rom': lambda name: name.startswith('rfile'),
+    'cbf': lambda name: name.endswith('.cbf'),
+    'cpg': lambda name: name.endswith('.cpg'),
+}
+
+
+class Entry(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+    type: str
+
+
+def classify(name: str) -> Optional[str]:
+    """File type for a name, or None if no extractor wants it"""
+    name = name.lower()
+    for kind, matches in FILE_TYPES.items():
+        if matches(name):
+            return kind
+    return None
+
+
+def relative_names(paths: Iterable[Union[str, Path]]) -> Dict[Path, str]:
+    """Name for each file that stays unique across directories: its path
+    relative to the deepest directory containing all of them ('a/x.cpg')"""
+    paths = [Path(p) for p in paths]
+    if not paths:
+        return {}
+    absolute = {p: os.path.abspath(p) for p in paths}
+    root = os.path.commonpath([os.path.dirname(a) for a in absolute.values()])
+    return {p: Path(os.path.relpath(a, root)).as_posix() for p, a in absolute.items()}
+
+
+def walk(root: Union[str, Path],
+         on_error: Optional[Callable[[OSError], None]] = None) -> Iterator[os.DirEntry]:
+    """Every file below root, one scandir per directory; symlinks are not followed"""
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError as e:
+                        if on_error:
+                            on_error(e)
+        except OSError as e:
+            if on_error:
+                on_error(e)
+
+
+@dataclass
+class Inventory:
+    root: str
+    created: float = 0.0
+    entries: List[Entry] = field(default_factory=list)
+    # Files seen that no extractor wants
+    skipped: int = 0
+
+    @classmethod
+    def scan(cls, root: Union[str, Path],
+             on_error: Optional[Callable[[OSError], None]] = None) -> 'Inventory':
+        inventory = cls(str(root), time.time())
+        for entry in walk(root, on_error):
+            kind = classify(entry.name)
+            if kind is None:
+                inventory.skipped += 1
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                if on_error:
+                    on_error(e)
+                continue
+            inventory.entries.append(Entry(entry.path, stat.st_size, stat.st_mtime, kind))
+        inventory.entries.sort()
+        return inventory
+
+    def files(self, kind: str) -> List[Path]:
+        return [Path(e.path) for e in self.entries if e.type == kind]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {kind: 0 for kind in FILE_TYPES}
+        for entry in self.entries:
+            counts[entry.type] += 1
+        return counts
+
+    def total_size(self, kind: Optional[str] = None) -> int:
+        return sum(e.size for e in self.entries if kind is None or e.type == kind)
+
+    # ============== Cache ==============
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INVENTORY_VERSION, 'root': self.root, 'created': self.created,
+                       'skipped': self.skipped, 'entries': [list(e) for e in self.entries]}, f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Inventory':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INVENTORY_VERSION:
+            raise ValueError(f"{path} is not a version {INVENTORY_VERSION} inventory")
+        return cls(data['root'], data['created'], [Entry(*e) for e in data['entries']],
+                   data.get('skipped', 0))
+
+
+def load_inventory(root: Union[str, Path], cache: Optional[Union[str, Path]] = None,
+                   refresh: bool = False,
+                   on_error: Optional[Callable[[OSError], None]] = None) -> Inventory:
+    """Cached inventory for root, walking the tree only when there is none.
+
+    A cache written for a different root, or an unreadable one, is rebuilt;
+    pass refresh=True after the installation has changed.
+    """
+    if cache and not refresh and Path(cache).exists():
+        try:
+            inventory = Inventory.load(cache)
+            if inventory.root == str(root):
+                return inventory
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    inventory = Inventory.scan(root, on_error)
+    if cache:
+        inventory.save(cache)
+    return inventory
@@ -0,0 +1,133 @@
+"""
+JSON Lines export for the WIS extractors
+One record per line, written as it is produced, optionally gzip-compressed.
+Every line carries its record type (part, procedure, ...) under the
+reserved "_kind" key, so records keep their own fields -- including a
+"type" column -- untouched; non-dict values are stored under "_value".
+iter_records() gives (kind, record) pairs back. Closing the
+writer also writes a small <name>.summary.json with per-type counts and the
+first few records of each type for quick review.
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from wislib.metrics import counter
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+SAMPLE_SIZE = 5
+# Reserved keys holding the record type and non-dict values
+KIND_KEY = '_kind'
+VALUE_KEY = '_value'
+
+
+def summary_path(path: Union[str, Path]) -> Path:
+    """wis_extracted.jsonl(.gz) -> wis_extracted.summary.json"""
+    path = Path(path)
+    name = path.name
+    for suffix in ('.gz', '.jsonl'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return path.with_name(f"{name}.summary.json")
+
+
+class JSONLWriter:
+    """Stream typed records to a .jsonl or .jsonl.gz file"""
+
+    def __init__(self, path: Union[str, Path], compress: bool = False,
+                 sample_size: int = SAMPLE_SIZE, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = Path(path)
+        if compress and self.path.suffix != '.gz':
+            self.path = self.path.with_name(self.path.name + '.gz')
+        self.compress = compress
+        self.sample_size = sample_size
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, List[Dict]] = {}
+        self.stats: Dict[str, Any] = {}
+        if compress:
+            raw = gzip.open(self.path, 'wb', compresslevel=6)
+            self._f = io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), encoding='utf-8')
+        else:
+            self._f = open(self.path, 'w', encoding='utf-8', buffering=buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def write(self, kind: str, record: Any):
+        """Write one record; non-dict values are stored under "_value"."""
+        if isinstance(record, dict):
+            line = {KIND_KEY: kind, **record}
+            # The kind wins over a record field of the same name
+            line[KIND_KEY] = kind
+        else:
+            line = {KIND_KEY: kind, VALUE_KEY: record}
+        self._f.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+        count = self.counts.get(kind, 0)
+        if count < self.sample_size:
+            self.samples.setdefault(kind, []).append(line)
+        self.counts[kind] = count + 1
+
+    def write_many(self, kind: str, records: Iterable[Any]) -> int:
+        """Write records of one type and return how many were written"""
+        before = self.counts.get(kind, 0)
+        for record in records:
+            self.write(kind, record)
+        return self.counts.get(kind, 0) - before
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        for kind, count in self.counts.items():
+            counter('records_emitted_total', 'Records written to JSONL exports', kind=kind).inc(count)
+        summary = {
+            'file': self.path.name,
+            'compressed': self.compress,
+            'bytes': self.path.stat().st_size,
+            'records': self.total,
+            'counts': self.counts,
+            **self.stats,
+            'samples': self.samples,
+        }
+        with open(summary_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+
+
+def open_jsonl(path: Union[str, Path], compress: bool = False,
+               sample_size: int = SAMPLE_SIZE) -> JSONLWriter:
+    """JSONLWriter for `path` (".gz" is appended when compressing)"""
+    return JSONLWriter(path, compress=compress, sample_size=sample_size)
+
+
+def iter_jsonl(path: Union[str, Path], kind: Optional[str] = None) -> Iterator[Dict]:
+    """Read records back, optionally only those of one type"""
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if kind is None or record.get(KIND_KEY) == kind:
+                yield record
+
+
+def iter_records(path: Union[str, Path], kind: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+    """(kind, record) pairs as they were written: the reserved keys are
+    removed and non-dict values come back as themselves"""
+    for line in iter_jsonl(path, kind):
+        record_kind = line.pop(KIND_KEY, None)
+        if VALUE_KEY in line and len(line) == 1:
+            yield record_kind, line[VALUE_KEY]
+        else:
+            yield record_kind, line
@@ -0,0 +1,181 @@
+"""
+Parallel MDB table export through mdb-tools
+Runs mdb-tables / mdb-export as asyncio subprocesses under a concurrency
+limit and parses each table's CSV from stdout as it arrives with the csv
+module, so quoted commas and newlines survive and no table is buffered whole.
+
+The commands can be replaced (e.g. by a fake shim in tests) through the
+arguments below or the MDB_TABLES / MDB_EXPORT environment variables.
+"""
+
+import asyncio
+import csv
+import os
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from wislib.inventory import relative_names
+
+DEFAULT_CONCURRENCY = 4
+# Longest single line accepted from mdb-export (memo fields can be large)
+LINE_LIMIT = 16 * 1024 * 1024
+MDB_TABLES = os.environ.get('MDB_TABLES', 'mdb-tables')
+MDB_EXPORT = os.environ.get('MDB_EXPORT', 'mdb-export')
+# Failures reported per file or table instead of aborting the export
+EXPORT_ERRORS = (RuntimeError, OSError, ValueError)
+
+
+class _LineFeed:
+    """Iterator the csv reader pulls from; refilled between reads"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.lines:
+            return self.lines.popleft()
+        raise StopIteration
+
+
+async def list_tables(mdb_file: Path, mdb_tables: str = MDB_TABLES) -> List[str]:
+    proc = await asyncio.create_subprocess_exec(
+        mdb_tables, '-1', str(mdb_file),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mdb_tables} failed for {mdb_file.name}: "
+                           f"{stderr.decode(errors='replace').strip()}")
+    return [t for t in stdout.decode('utf-8', errors='replace').splitlines() if t.strip()]
+
+
+async def iter_table_records(mdb_file: Path, table: str,
+                             mdb_export: str = MDB_EXPORT) -> AsyncIterator[Dict[str, str]]:
+    """Yield one dict per row of `table` while mdb-export is still running.
+
+    To stop early, iterate inside contextlib.aclosing() so the process is
+    killed and reaped before the event loop closes.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        mdb_export, str(mdb_file), table,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=LINE_LIMIT)
+    # Drain stderr alongside stdout so a chatty process cannot block on it
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    headers = None
+    pending = []
+    quotes = 0
+    finished = False
+    try:
+        async for raw in proc.stdout:
+            line = raw.decode('utf-8', errors='replace')
+            # A quoted field may span lines: only hand over complete rows
+            pending.append(line)
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            feed.lines.append(''.join(pending))
+            pending, quotes = [], 0
+            for row in reader:
+                if headers is None:
+                    headers = row
+                elif row:
+                    yield dict(zip(headers, row))
+        if pending:
+            feed.lines.append(''.join(pending))
+            for row in reader:
+                if headers is not None and row:
+                    yield dict(zip(headers, row))
+        finished = True
+    finally:
+        # Stopped early (consumer broke off or was cancelled): don't leave it running
+        if not finished and proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            # Drain to EOF so the pipe transport closes with the loop still running
+            await proc.stdout.read()
+        stderr = await stderr_task
+        await proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mdb_export} failed for {mdb_file.name}:{table}: "
+                           f"{stderr.decode(errors='replace').strip()}")
+
+
+async def _export_table(semaphore: asyncio.Semaphore, mdb_file: Path, table: str,
+                        mdb_export: str, on_record: Callable[[Path, str, Dict], None]) -> int:
+    async with semaphore:
+        count = 0
+        async for record in iter_table_records(mdb_file, table, mdb_export):
+            on_record(mdb_file, table, record)
+            count += 1
+        return count
+
+
+async def _export_all(mdb_files: Iterable[Path], concurrency: int, mdb_tables: str,
+                      mdb_export: str, on_record, on_table, on_error):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def tables_of(mdb_file):
+        async with semaphore:
+            try:
+                return mdb_file, await list_tables(mdb_file, mdb_tables)
+            except EXPORT_ERRORS as e:
+                # Also a missing mdb-tables binary (FileNotFoundError)
+                on_error(mdb_file, None, e)
+                return mdb_file, []
+
+    jobs: List[Tuple[Path, str]] = []
+    for listing in asyncio.as_completed([tables_of(f) for f in mdb_files]):
+        mdb_file, tables = await listing
+        jobs.extend((mdb_file, table) for table in tables)
+
+    async def run(mdb_file, table):
+        try:
+            count = await _export_table(semaphore, mdb_file, table, mdb_export, on_record)
+            on_table(mdb_file, table, count)
+        except EXPORT_ERRORS as e:
+            # ValueError: a line longer than LINE_LIMIT
+            on_error(mdb_file, table, e)
+
+    await asyncio.gather(*(run(f, t) for f, t in jobs))
+
+
+def export_mdb_files(mdb_files: Iterable[Path], concurrency: int = DEFAULT_CONCURRENCY,
+                     mdb_tables: str = MDB_TABLES, mdb_export: str = MDB_EXPORT,
+                     on_record: Optional[Callable[[Path, str, Dict], None]] = None,
+                     on_table: Optional[Callable[[Path, str, int], None]] = None,
+                     on_error: Optional[Callable] = None) -> Dict[str, Dict[str, List[Dict]]]:
+    """Export every table of every MDB file, at most `concurrency` processes at a time.
+
+    Records go to on_record(mdb_file, table, record) as they are parsed. Without
+    a callback they are collected into {name: {table: [records]}}, named by
+    relative_names() so same-named files in different directories stay apart;
+    pass on_record for anything larger than a test fixture.
+    Failures go to on_error(mdb_file, table, error); table is None when
+    the file's tables could not be listed.
+    """
+    mdb_files = [Path(f) for f in mdb_files]
+    names = relative_names(mdb_files)
+    collected: Dict[str, Dict[str, List[Dict]]] = {}
+
+    def collect(mdb_file, table, record):
+        collected.setdefault(names[mdb_file], {}).setdefault(table, []).append(record)
+
+    def table_done(mdb_file, table, count):
+        if on_record is None:
+            collected.setdefault(names[mdb_file], {}).setdefault(table, [])
+        if on_table:
+            on_table(mdb_file, table, count)
+
+    asyncio.run(_export_all(
+        mdb_files, concurrency, mdb_tables, mdb_export,
+        on_record or collect, table_done,
+        on_error or (lambda f, t, e: None),
+    ))
+    return collected
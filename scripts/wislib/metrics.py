@@ -0,0 +1,270 @@
+"""
+Run metrics shared by the WIS extractors
+A small thread-safe registry of counters, gauges and histograms. At the end
+of a run it is written as a Prometheus textfile (for node_exporter's
+textfile collector) and as a JSON summary next to the other outputs.
+
+Metrics live in the process that records them; work done in pool
+processes is counted in the parent's result callbacks.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+# Seconds; suits per-page scans up to per-table reads
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# Set WIS_METRICS_DIR to node_exporter's --collector.textfile.directory
+METRICS_DIR_ENV = 'WIS_METRICS_DIR'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing total"""
+    type = 'counter'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_number(self.value)}"]
+
+    def summary(self) -> Any:
+        return self.value
+
+
+class Gauge:
+    """Current value; set directly or read from a function at export time"""
+    type = 'gauge'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        # Highest value seen, kept for the summary
+        self.peak = 0.0
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            self.set(self._function())
+        return self._value
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+            self.peak = max(self.peak, value)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+            self.peak = max(self.peak, self._value)
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_number(self.value)}"]
+
+    def summary(self) -> Any:
+        return {'value': self.value, 'peak': self.peak}
+
+
+class Histogram:
+    """Distribution of observations in cumulative buckets"""
+    type = 'histogram'
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound below which a fraction q of observations fall"""
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', _number(bound)))} "
+                         f"{cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+    def summary(self) -> Any:
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+
+class Registry:
+    """Metrics by name and label set; asking twice returns the same metric"""
+
+    def __init__(self, prefix: str = 'wis_'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Tuple[type, str, Dict[Labels, Any]]] = {}
+
+    def _get(self, kind: type, name: str, help: str, labels: Dict[str, Any], **options):
+        name = self.prefix + name
+        with self._lock:
+            entry = self._metrics.get(name)
+            if entry is None:
+                entry = self._metrics[name] = (kind, help, {})
+            elif entry[0] is not kind:
+                raise ValueError(f"Metric {name} is a {entry[0].type}, not a {kind.type}")
+            children = entry[2]
+            key = _labels(labels)
+            if key not in children:
+                children[key] = kind(**options)
+            return children[key]
+
+    def counter(self, name: str, help: str = '', **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = '', **labels) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    # ============== Export ==============
+
+    def _collect(self):
+        self.gauge('rss_bytes', 'Resident set size of the extractor').set(rss_bytes())
+        self.gauge('run_seconds', 'Seconds since the run started').set(time.time() - self.started)
+        with self._lock:
+            return sorted((name, kind, help, dict(children))
+                          for name, (kind, help, children) in self._metrics.items())
+
+    def prometheus(self, **labels) -> str:
+        """Text exposition format; labels (e.g. job) are added to every sample"""
+        common = _labels(labels)
+        lines = []
+        for name, kind, help, children in self._collect():
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind.type}")
+            for key, metric in sorted(children.items()):
+                lines.extend(metric.samples(name, tuple(sorted(common + key))))
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, **labels) -> Dict[str, Any]:
+        metrics = {}
+        for name, _, _, children in self._collect():
+            for key, metric in sorted(children.items()):
+                metrics[name + _format_labels(key)] = metric.summary()
+        return {**labels, 'started': self.started, 'metrics': metrics}
+
+    def write(self, output_dir: Union[str, Path], job: str) -> Tuple[Path, Path]:
+        """Write <job>.prom and <job>.metrics.json.
+
+        The textfile goes to $WIS_METRICS_DIR when set, otherwise next to
+        the summary in output_dir; it is replaced atomically as the
+        textfile collector requires.
+        """
+        output_dir = Path(output_dir)
+        prom_dir = Path(os.environ.get(METRICS_DIR_ENV) or output_dir)
+        prom_dir.mkdir(parents=True, exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        prom = prom_dir / f"{job}.prom"
+        tmp = prom.with_name(prom.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus(job=job))
+        os.replace(tmp, prom)
+
+        summary = output_dir / f"{job}.metrics.json"
+        with open(summary, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(job=job), f, indent=2)
+        return prom, summary
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where only that is available"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if HAS_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, kilobytes on Linux
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return 0
+
+
+# Process-wide registry used by the extractors and wislib
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
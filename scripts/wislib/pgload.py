@@ -0,0 +1,327 @@
+"""
+Direct PostgreSQL bulk loader for the Supabase WIS schema
+Maps extracted records onto wis_models / wis_parts / wis_procedures /
+wis_bulletins (supabase/migrations/20250821120900_create_wis_tables.sql),
+streams each table via COPY into a temporary staging table and merges it
+with one INSERT ... SELECT ... ON CONFLICT. Tables load in parallel over a
+small connection pool, each in its own transaction.
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    from psycopg2.pool import ThreadedConnectionPool
+    HAS_PSYCOPG2 = True
+except ImportError:
+    HAS_PSYCOPG2 = False
+
+from wislib.dedupe import DigestSet, record_id
+from wislib.jsonl import iter_records
+from wislib.sqlwriter import copy_field
+
+DEFAULT_POOL_SIZE = 4
+TITLE_LENGTH = 200
+
+
+@dataclass(frozen=True)
+class LoadSpec:
+    """Target table, staged columns and the natural key within a vehicle"""
+    table: str
+    columns: Tuple[str, ...]
+    key: str
+
+    @property
+    def update_columns(self) -> Tuple[str, ...]:
+        return tuple(c for c in self.columns if c not in ('vehicle_id', self.key))
+
+    def merge_sql(self, staging: str) -> str:
+        """One set-based merge from the staging table.
+
+        UNIQUE (vehicle_id, key) never conflicts on NULL vehicle_id, so
+        vehicle-less rows that already exist are filtered out by an anti-join
+        in the same statement instead of being inserted twice.
+        """
+        columns = ', '.join(self.columns)
+        updates = ',\n    '.join(f"{c} = EXCLUDED.{c}" for c in self.update_columns)
+        return (f"INSERT INTO {self.table} ({columns})\n"
+                f"SELECT {columns} FROM {staging} s\n"
+                f"WHERE s.vehicle_id IS NOT NULL OR NOT EXISTS (\n"
+                f"    SELECT 1 FROM {self.table} t\n"
+                f"    WHERE t.vehicle_id IS NULL AND t.{self.key} = s.{self.key}\n"
+                f")\n"
+                f"ON CONFLICT (vehicle_id, {self.key}) DO UPDATE SET\n"
+                f"    {updates},\n"
+                f"    updated_at = NOW()")
+
+
+PG_PARTS = LoadSpec('wis_parts',
+                    ('vehicle_id', 'part_number', 'part_name', 'category', 'description'),
+                    key='part_number')
+PG_PROCEDURES = LoadSpec('wis_procedures',
+                         ('vehicle_id', 'procedure_code', 'title', 'category', 'content'),
+                         key='procedure_code')
+PG_BULLETINS = LoadSpec('wis_bulletins',
+                        ('vehicle_id', 'bulletin_number', 'title', 'category', 'content'),
+                        key='bulletin_number')
+
+
+# ============== Record mapping ==============
+
+def model_code(value: Any) -> Optional[str]:
+    """Normalise a model reference: '1300' -> 'U1300', 'u1300l' -> 'U1300L'"""
+    if value is None:
+        return None
+    code = re.sub(r'\s+', '', str(value)).upper()
+    if code.startswith('UNIMOG'):
+        code = code[len('UNIMOG'):]
+    if not code:
+        return None
+    if code.isdigit():
+        code = 'U' + code
+    return code
+
+
+def _first(record: Dict, *names: str) -> Optional[str]:
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ''):
+            return str(value)
+    return None
+
+
+def _title(text: Optional[str]) -> str:
+    return (text or '').strip()[:TITLE_LENGTH]
+
+
+def _record_model(record: Dict) -> Optional[str]:
+    return model_code(_first(record, 'model_code', 'vehicle_model', 'model'))
+
+
+def part_values(record: Dict) -> Optional[Tuple[Optional[str], Tuple]]:
+    """(model code, row without vehicle_id) for a part record"""
+    number = _first(record, 'part_number')
+    if not number:
+        return None
+    description = _first(record, 'description') or ''
+    name = _first(record, 'part_name', 'name') or _title(description) or number
+    return _record_model(record), (number, name, _first(record, 'category'), description)
+
+
+def procedure_values(record: Dict) -> Optional[Tuple[Optional[str], Tuple]]:
+    content = _first(record, 'content', 'text', 'value') or ''
+    title = _title(_first(record, 'title') or content)
+    if not title:
+        return None
+    code = _first(record, 'procedure_code', 'id') or f"PROC-{record_id(title, content)}"
+    category = _first(record, 'category', 'procedure_type', 'keyword')
+    return _record_model(record), (code, title, category, content)
+
+
+def bulletin_values(record: Dict) -> Optional[Tuple[Optional[str], Tuple]]:
+    content = _first(record, 'content', 'text', 'value') or ''
+    title = _title(_first(record, 'title') or content)
+    if not title:
+        return None
+    number = _first(record, 'bulletin_number', 'id') or f"AUTO-{record_id(content)}"
+    return _record_model(record), (number, title, _first(record, 'category'), content)
+
+
+MAPPERS = {
+    'part': (PG_PARTS, part_values),
+    'procedure': (PG_PROCEDURES, procedure_values),
+    'bulletin': (PG_BULLETINS, bulletin_values),
+}
+
+
+# ============== Sources ==============
+
+JSON_SECTIONS = {
+    'parts': 'part', 'procedures': 'procedure', 'bulletins': 'bulletin', 'models': 'model',
+}
+
+
+def iter_source_records(path: Union[str, Path]) -> Iterator[Tuple[str, Dict]]:
+    """(kind, record) pairs from a JSONL, JSON or snapshot export"""
+    name = Path(path).name.lower()
+    if name.endswith(('.jsonl', '.jsonl.gz')):
+        for kind, value in iter_records(path):
+            yield kind, value if isinstance(value, dict) else {'value': value, 'model': value}
+    elif name.endswith('.wsnap'):
+        from wislib.snapshot import open_snapshot
+        with open_snapshot(path) as snap:
+            for model in snap.models:
+                yield 'model', {'model': model}
+            for part in snap.iter_parts():
+                yield 'part', part
+            for proc in snap.iter_procedures():
+                yield 'procedure', proc
+    else:
+        import json
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for section, kind in JSON_SECTIONS.items():
+            for item in data.get(section) or []:
+                yield kind, item if isinstance(item, dict) else {'value': item, 'model': item}
+
+
+# ============== COPY streaming ==============
+
+class CopyStream:
+    """File-like object feeding rows to copy_expert() without materializing them"""
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self._rows = iter(rows)
+        self._buffer = b''
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ('\t'.join(copy_field(v) for v in row) + '\n').encode('utf-8')
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = b''.join(chunks)
+        if size < 0:
+            self._buffer = b''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+
+# ============== Loader ==============
+
+class PostgresLoader:
+    """Bulk-load extracted records into the Supabase WIS tables"""
+
+    def __init__(self, dsn: str, pool_size: int = DEFAULT_POOL_SIZE):
+        if not HAS_PSYCOPG2:
+            raise RuntimeError("psycopg2 is required for direct loading: pip install psycopg2-binary")
+        self.pool = ThreadedConnectionPool(1, pool_size, dsn)
+        self.pool_size = pool_size
+        self.models: Dict[str, str] = {}
+        self._models_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.pool.closeall()
+
+    def _run(self, work, *args):
+        """Run work(conn, *args) in one transaction on a pooled connection"""
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                return work(conn, *args)
+        finally:
+            self.pool.putconn(conn)
+
+    # ============== Models ==============
+
+    def resolve_models(self, codes: Iterable[str]) -> Dict[str, str]:
+        """model_code -> id for the given codes, creating missing models.
+
+        The mapping is cached, so each code costs one round trip at most once.
+        """
+        with self._models_lock:
+            if not self.models:
+                self.models = self._run(self._fetch_models)
+            missing = sorted({c for c in codes if c and c not in self.models})
+            if missing:
+                self.models.update(self._run(self._insert_models, missing))
+            return self.models
+
+    @staticmethod
+    def _fetch_models(conn) -> Dict[str, str]:
+        with conn.cursor() as cur:
+            cur.execute("SELECT model_code, id::text FROM wis_models")
+            return dict(cur.fetchall())
+
+    @staticmethod
+    def _insert_models(conn, codes: List[str]) -> Dict[str, str]:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO wis_models (model_code, model_name)
+                SELECT code, 'Unimog ' || code FROM unnest(%s::text[]) AS code
+                ON CONFLICT (model_code) DO NOTHING
+            """, (codes,))
+            cur.execute("SELECT model_code, id::text FROM wis_models WHERE model_code = ANY(%s)",
+                        (codes,))
+            return dict(cur.fetchall())
+
+    # ============== Tables ==============
+
+    def _load_table(self, conn, spec: LoadSpec, rows: Iterable[Tuple]) -> Tuple[int, int]:
+        staging = f"_stage_{spec.table}"
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                        f"SELECT {', '.join(spec.columns)} FROM {spec.table} WITH NO DATA")
+            stream = CopyStream(rows)
+            cur.copy_expert(f"COPY {staging} ({', '.join(spec.columns)}) FROM STDIN", stream)
+            cur.execute(spec.merge_sql(staging))
+            return stream.count, cur.rowcount
+
+    def _rows(self, spec: LoadSpec, mapped: List[Tuple[Optional[str], Tuple]]) -> Iterator[Tuple]:
+        """Resolve vehicle ids; the first row per (vehicle, key) wins"""
+        seen = DigestSet()
+        for code, values in mapped:
+            vehicle_id = self.models.get(code) if code else None
+            if seen.add(vehicle_id, values[0]):
+                yield (vehicle_id,) + values
+
+    def load_records(self, records: Iterable[Tuple[str, Dict]]) -> Dict[str, Tuple[int, int]]:
+        """Load (kind, record) pairs; returns {table: (rows staged, rows merged)}"""
+        mapped: Dict[str, List[Tuple[Optional[str], Tuple]]] = {kind: [] for kind in MAPPERS}
+        codes = set()
+        for kind, record in records:
+            if kind == 'model':
+                codes.add(_record_model(record))
+                continue
+            if kind not in MAPPERS:
+                continue
+            values = MAPPERS[kind][1](record)
+            if values:
+                mapped[kind].append(values)
+                codes.add(values[0])
+
+        # Models first: every other table needs their ids
+        self.resolve_models(c for c in codes if c)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            futures = {
+                MAPPERS[kind][0].table: pool.submit(
+                    self._run, self._load_table, MAPPERS[kind][0],
+                    self._rows(MAPPERS[kind][0], rows))
+                for kind, rows in mapped.items() if rows
+            }
+            for table, future in futures.items():
+                results[table] = future.result()
+        return results
+
+
+def load_files(dsn: str, paths: Iterable[Union[str, Path]],
+               pool_size: int = DEFAULT_POOL_SIZE) -> Dict[str, Tuple[int, int]]:
+    """Load every record from the given exports into the database at dsn"""
+    def records():
+        for path in paths:
+            yield from iter_source_records(path)
+
+    with PostgresLoader(dsn, pool_size=pool_size) as loader:
+        return loader.load_records(records())
@@ -0,0 +1,191 @@
+"""
+Concurrent probing of WIS data sources
+Checks TCP ports (the TransBase listener), HTTP endpoints and shared
+folders at the same time with asyncio. Each probe retries with jittered
+exponential backoff until an overall deadline, so a VM that is still
+booting is picked up seconds after it comes up instead of after a fixed
+polling schedule. Only the standard library is used.
+"""
+
+import asyncio
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional
+
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_DEADLINE = 60.0
+
+
+@dataclass
+class Backoff:
+    """Delays between attempts: initial * factor**n, capped, with +-jitter"""
+    initial: float = 0.1
+    factor: float = 2.0
+    maximum: float = 2.0
+    jitter: float = 0.2
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay * self.factor, self.maximum)
+
+
+@dataclass
+class Probe:
+    kind: str                                       # 'port', 'http' or 'path'
+    target: str
+    check: Callable[[], Awaitable[Optional[str]]]   # detail if viable, else None
+    timeout: float = DEFAULT_TIMEOUT
+
+
+@dataclass
+class Source:
+    """A viable source and how long it took to find"""
+    kind: str
+    target: str
+    detail: str
+    seconds: float
+
+
+# ============== Checks ==============
+
+async def check_port(host: str, port: int) -> Optional[str]:
+    """Viable if a TCP connection is accepted"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return "accepting connections"
+
+
+async def check_url(url: str) -> Optional[str]:
+    """Viable if a GET returns status 200; only the status line is read"""
+    parts = urllib.parse.urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if secure else None)
+    try:
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.netloc}\r\n"
+                     f"Connection: close\r\n\r\n".encode('ascii'))
+        await writer.drain()
+        status = (await reader.readline()).decode('latin-1').split()
+    finally:
+        writer.close()
+    if len(status) >= 2 and status[1] == '200':
+        return "HTTP 200"
+    return None
+
+
+async def check_path(path: str) -> Optional[str]:
+    """Viable if the path exists.
+
+    The stat runs in a daemon thread rather than the loop's executor:
+    asyncio.run() joins executor threads on exit, so a stat hung on a dead
+    mount would block the script after the timeout. A daemon thread is
+    simply abandoned.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(exists: bool):
+        if not future.done():   # cancelled by the probe timeout
+            future.set_result(exists)
+
+    def stat():
+        exists = os.path.exists(path)
+        try:
+            loop.call_soon_threadsafe(resolve, exists)
+        except RuntimeError:
+            pass                # the loop has closed meanwhile
+
+    threading.Thread(target=stat, name=f"stat {path}", daemon=True).start()
+    if await future:
+        return "exists"
+    return None
+
+
+def port_probes(hosts: Iterable[str], ports: Iterable[int],
+                timeout: float = DEFAULT_TIMEOUT) -> List[Probe]:
+    ports = list(ports)
+    return [Probe('port', f"{host}:{port}", lambda h=host, p=port: check_port(h, p), timeout)
+            for host in hosts for port in ports]
+
+
+def url_probes(urls: Iterable[str], timeout: float = DEFAULT_TIMEOUT) -> List[Probe]:
+    return [Probe('http', url, lambda u=url: check_url(u), timeout) for url in urls]
+
+
+def path_probes(paths: Iterable[str], timeout: float = DEFAULT_TIMEOUT) -> List[Probe]:
+    return [Probe('path', path, lambda p=path: check_path(p), timeout) for path in paths]
+
+
+# ============== Probing ==============
+
+async def _until_viable(probe: Probe, started: float, deadline: float,
+                        backoff: Optional[Backoff]) -> Optional[Source]:
+    """Retry one probe until it succeeds or the deadline passes (once without backoff)"""
+    loop = asyncio.get_running_loop()
+    delays = backoff.delays() if backoff else iter(())
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        try:
+            detail = await asyncio.wait_for(probe.check(), min(probe.timeout, remaining))
+            if detail is not None:
+                return Source(probe.kind, probe.target, detail, time.monotonic() - started)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            pass
+        delay = next(delays, None)
+        if delay is None:
+            return None
+        await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+
+
+async def first_viable(probes: Iterable[Probe], deadline: float = DEFAULT_DEADLINE,
+                       backoff: Optional[Backoff] = Backoff()) -> Optional[Source]:
+    """The first probe to succeed; the others are cancelled"""
+    loop = asyncio.get_running_loop()
+    started, end = time.monotonic(), loop.time() + deadline
+    tasks = [asyncio.create_task(_until_viable(p, started, end, backoff)) for p in probes]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            source = await next_done
+            if source:
+                return source
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def all_viable(probes: Iterable[Probe], deadline: float = DEFAULT_DEADLINE,
+                     backoff: Optional[Backoff] = None) -> List[Source]:
+    """Every probe that succeeds before the deadline; by default one attempt each"""
+    loop = asyncio.get_running_loop()
+    started, end = time.monotonic(), loop.time() + deadline
+    results = await asyncio.gather(*(_until_viable(p, started, end, backoff) for p in probes))
+    return [source for source in results if source]
+
+
+def find_source(probes: Iterable[Probe], deadline: float = DEFAULT_DEADLINE,
+                backoff: Optional[Backoff] = Backoff()) -> Optional[Source]:
+    """Blocking wrapper around first_viable for scripts"""
+    return asyncio.run(first_viable(list(probes), deadline, backoff))
+
+
+def find_sources(probes: Iterable[Probe], deadline: float = DEFAULT_DEADLINE,
+                 backoff: Optional[Backoff] = None) -> List[Source]:
+    """Blocking wrapper around all_viable for scripts"""
+    return asyncio.run(all_viable(list(probes), deadline, backoff))
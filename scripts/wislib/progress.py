@@ -0,0 +1,223 @@
+"""
+Byte-based progress reporting for long scans
+The total is planned up front from the sizes of the files to be scanned.
+Scan loops only add to a per-file slot in a shared array; a background
+thread prints one line at a fixed interval with the bytes done, MB/s, an
+ETA and which files are finished or in progress.
+
+The counters live in shared memory, so ProcessPoolExecutor workers update
+them too: create the pool with **progress.pool_args() and call
+file_progress(path) inside the worker. Slots are keyed by absolute path,
+so same-named files in different directories are counted apart.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, TextIO, Tuple, Union
+
+from wislib.inventory import relative_names
+
+DEFAULT_INTERVAL = 2.0
+# Weight of the latest interval in the smoothed rate
+RATE_SMOOTHING = 0.3
+# In-progress files named on each line
+SHOW_FILES = 3
+
+MB = 1024 * 1024
+
+
+def progress_key(path: Union[str, Path]) -> str:
+    """Slot key for a file: its absolute path, without resolving symlinks"""
+    return os.path.abspath(path)
+
+
+def planned_sizes(paths: Iterable[Union[str, Path]]) -> Dict[str, int]:
+    """{slot key: size} for the files a scan will read; missing files count as empty"""
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[progress_key(path)] = os.stat(path).st_size
+        except OSError:
+            sizes[progress_key(path)] = 0
+    return sizes
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+class FileProgress:
+    """Bytes done of one planned file; cheap enough to call once per page or line"""
+    __slots__ = ('_done', '_sizes', '_index')
+
+    def __init__(self, done, sizes, index: int):
+        self._done = done
+        self._sizes = sizes
+        self._index = index
+
+    def add(self, amount: int):
+        self._done[self._index] += amount
+
+    def set(self, position: int):
+        self._done[self._index] = position
+
+    def finish(self):
+        """Mark the file complete whatever was counted"""
+        self._done[self._index] = self._sizes[self._index]
+
+
+class _SharedCounters:
+    """Planned size and bytes done per file, in shared memory.
+
+    Every file is scanned by one worker at a time, so slots need no lock;
+    the reporter may read a value one update old.
+    """
+
+    def __init__(self, names: Sequence[str], sizes, done):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.sizes = sizes
+        self.done = done
+
+    @classmethod
+    def create(cls, planned: Dict[str, int]) -> '_SharedCounters':
+        sizes = multiprocessing.RawArray('q', [max(0, int(s)) for s in planned.values()])
+        return cls(list(planned), sizes, multiprocessing.RawArray('q', len(planned)))
+
+    def file(self, path: Union[str, Path]) -> FileProgress:
+        index = self.index.get(progress_key(path))
+        if index is None:
+            # Unplanned files are counted nowhere
+            return FileProgress([0], [0], 0)
+        return FileProgress(self.done, self.sizes, index)
+
+
+# Counters of the Progress this process reports to, set by attach()
+_attached: Optional[_SharedCounters] = None
+
+
+def _attach(names: Tuple[str, ...], sizes, done):
+    global _attached
+    _attached = _SharedCounters(names, sizes, done)
+
+
+def file_progress(path: Union[str, Path]) -> FileProgress:
+    """Progress slot for a file, in a pool worker or the reporting process.
+
+    Without an attached Progress the updates go nowhere.
+    """
+    if _attached is None:
+        return FileProgress([0], [0], 0)
+    return _attached.file(path)
+
+
+class Progress:
+    """Progress of a scan over planned files, printed every `interval` seconds.
+
+    Use as a context manager: the reporter thread starts on entry and a
+    final line with the average rate is printed on exit.
+    """
+
+    def __init__(self, planned: Dict[str, int], label: str = 'Scanning',
+                 interval: float = DEFAULT_INTERVAL, stream: Optional[TextIO] = None):
+        self.label = label
+        self.interval = interval
+        self.stream = stream
+        self.counters = _SharedCounters.create(planned)
+        # Shown per file: the path below the directory shared by all of them
+        short = relative_names(self.counters.names)
+        self.names = [short[Path(name)] for name in self.counters.names]
+        self.total = sum(self.counters.sizes)
+        self.started = 0.0
+        self.rate = 0.0
+        self._last = (0.0, 0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def file(self, path: Union[str, Path]) -> FileProgress:
+        return self.counters.file(path)
+
+    def pool_args(self) -> Dict:
+        """initializer/initargs for a ProcessPoolExecutor whose workers report here"""
+        return {'initializer': _attach,
+                'initargs': (self.counters.names, self.counters.sizes, self.counters.done)}
+
+    # ============== Reporting ==============
+
+    @property
+    def done(self) -> int:
+        return sum(self.counters.done)
+
+    def start(self):
+        _attach(self.counters.names, self.counters.sizes, self.counters.done)
+        self.started = time.monotonic()
+        self._last = (self.started, 0)
+        self._thread = threading.Thread(target=self._run, name='progress', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        global _attached
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if _attached is not None and _attached.done is self.counters.done:
+            _attached = None
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        done = self.done
+        self._print(f"  ✅ {self.label}: {done / MB:,.1f} MB in {elapsed:.1f}s "
+                    f"({done / MB / elapsed:,.1f} MB/s)")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._print(self.line())
+
+    def _update_rate(self, now: float, done: int):
+        last_time, last_done = self._last
+        if now > last_time:
+            latest = (done - last_done) / (now - last_time)
+            self.rate = latest if not self.rate else (
+                RATE_SMOOTHING * latest + (1 - RATE_SMOOTHING) * self.rate)
+        self._last = (now, done)
+
+    def line(self) -> str:
+        """One status line: bytes, percent, MB/s, ETA and per-file completion"""
+        now = time.monotonic()
+        done_by_file = list(self.counters.done)
+        sizes = self.counters.sizes
+        done = sum(done_by_file)
+        self._update_rate(now, done)
+
+        percent = 100.0 * done / self.total if self.total else 100.0
+        eta = (self.total - done) / self.rate if self.rate > 0 else None
+        finished = sum(1 for d, s in zip(done_by_file, sizes) if d >= s)
+        active = [f"{name} {100 * d // s}%"
+                  for name, d, s in zip(self.names, done_by_file, sizes)
+                  if 0 < d < s][:SHOW_FILES]
+        line = (f"  ⏳ {self.label}: {done / MB:,.1f}/{self.total / MB:,.1f} MB "
+                f"({percent:.0f}%) {self.rate / MB:,.1f} MB/s ETA {format_eta(eta)} | "
+                f"{finished}/{len(sizes)} files")
+        if active:
+            line += " | " + ", ".join(active)
+        return line
+
+    def _print(self, line: str):
+        # One write per line so it cannot interleave with other threads' output
+        stream = self.stream or sys.stdout
+        stream.write(line + '\n')
+        stream.flush()
@@ -0,0 +1,168 @@
+"""
+Streaming text analysis of Transbase ROM files
+Scans a memory-mapped rfile for printable ASCII runs and keeps only bounded
+state per file: counters, a uniform reservoir sample and the approximate
+top-k most frequent segments (Space-Saving). The full segment stream can be
+spilled to a gzip file, one segment per line, instead of being held in RAM.
+"""
+
+import gzip
+import heapq
+import mmap
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_MIN_LENGTH = 20
+DEFAULT_SAMPLE_SIZE = 100
+DEFAULT_TOP_K = 50
+# Candidates handed to the accept callback at once
+DEFAULT_BATCH_SIZE = 4096
+
+
+class Reservoir:
+    """Uniform sample of at most `size` items from a stream (Algorithm R)"""
+
+    def __init__(self, size: int = DEFAULT_SAMPLE_SIZE, seed: Optional[int] = None):
+        self.size = size
+        self.seen = 0
+        self.items: List[str] = []
+        self._random = random.Random(seed)
+
+    def add(self, item: str):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+        else:
+            slot = self._random.randrange(self.seen)
+            if slot < self.size:
+                self.items[slot] = item
+
+
+class TopK:
+    """Approximate most frequent items in `capacity` counters (Space-Saving).
+
+    Any item occurring more than n / capacity times is guaranteed a counter;
+    each count overestimates by at most its recorded error.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_K * 20):
+        self.capacity = capacity
+        self.counts: Dict[str, Tuple[int, int]] = {}   # item -> (count, error)
+        self._heap: List[Tuple[int, str]] = []          # lazy (count, item) entries
+
+    def add(self, item: str):
+        entry = self.counts.get(item)
+        if entry is not None:
+            count = entry[0] + 1
+            self.counts[item] = (count, entry[1])
+        elif len(self.counts) < self.capacity:
+            count = 1
+            self.counts[item] = (1, 0)
+        else:
+            # Replace the current minimum; stale heap entries are skipped
+            while True:
+                minimum, victim = heapq.heappop(self._heap)
+                if victim in self.counts and self.counts[victim][0] == minimum:
+                    break
+            del self.counts[victim]
+            count = minimum + 1
+            self.counts[item] = (count, minimum)
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def most_common(self, k: int = DEFAULT_TOP_K) -> List[Tuple[str, int]]:
+        top = heapq.nlargest(k, self.counts.items(), key=lambda kv: kv[1][0])
+        return [(item, count) for item, (count, _) in top]
+
+
+@dataclass
+class RomSummary:
+    """Bounded-memory result of scanning one ROM file"""
+    file: str
+    size: int
+    candidates: int = 0          # printable runs of at least min_length
+    total_text_found: int = 0    # runs accepted as meaningful text
+    text_bytes: int = 0
+    sample: List[str] = field(default_factory=list)
+    top: List[Tuple[str, int]] = field(default_factory=list)
+    spill: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {'size': self.size, 'candidates': self.candidates,
+                'total_text_found': self.total_text_found, 'text_bytes': self.text_bytes,
+                'sample': self.sample, 'top': [{'text': t, 'count': c} for t, c in self.top],
+                'spill': self.spill}
+
+
+def iter_printable(mm, min_length: int = DEFAULT_MIN_LENGTH) -> Iterator[str]:
+    """Printable ASCII runs of at least min_length, straight from the mapping"""
+    pattern = re.compile(rb'[\x20-\x7E]{' + str(min_length).encode() + rb',}')
+    for match in pattern.finditer(mm):
+        yield match.group().decode('ascii')
+
+
+def scan_rom(path: Union[str, Path],
+             accept: Optional[Callable[[List[str]], Sequence[bool]]] = None,
+             min_length: int = DEFAULT_MIN_LENGTH, sample_size: int = DEFAULT_SAMPLE_SIZE,
+             top_k: int = DEFAULT_TOP_K, spill: Optional[Union[str, Path]] = None,
+             seed: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> RomSummary:
+    """Count, sample and rank the accepted text segments of one file.
+
+    accept takes a batch of candidates and returns one decision per string
+    (e.g. TextClassifier.classify); without it every candidate is kept. With
+    `spill`, every accepted segment is also written to that gzip file.
+    """
+    path = Path(path)
+    summary = RomSummary(path.name, path.stat().st_size)
+    if not summary.size:
+        return summary
+    reservoir = Reservoir(sample_size, seed)
+    top = TopK(max(top_k * 20, 1))
+    out = None
+    if spill:
+        spill = Path(spill)
+        spill.parent.mkdir(parents=True, exist_ok=True)
+        out = gzip.open(spill, 'wt', encoding='ascii', compresslevel=6)
+        summary.spill = str(spill)
+
+    def take(batch):
+        summary.candidates += len(batch)
+        decisions = accept(batch) if accept else [True] * len(batch)
+        for text, ok in zip(batch, decisions):
+            if not ok:
+                continue
+            summary.total_text_found += 1
+            summary.text_bytes += len(text)
+            reservoir.add(text)
+            top.add(text)
+            if out:
+                out.write(text + '\n')
+
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            batch = []
+            for text in iter_printable(mm, min_length):
+                batch.append(text)
+                if len(batch) >= batch_size:
+                    take(batch)
+                    batch = []
+            if batch:
+                take(batch)
+    finally:
+        if out:
+            out.close()
+    summary.sample = reservoir.items
+    summary.top = top.most_common(top_k)
+    return summary
+
+
+def iter_spill(path: Union[str, Path]) -> Iterator[str]:
+    """Read a spilled segment stream back"""
+    with gzip.open(path, 'rt', encoding='ascii') as f:
+        for line in f:
+            yield line.rstrip('\n')
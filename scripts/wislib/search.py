@@ -0,0 +1,484 @@
+"""
+Local BM25 search over extracted WIS data
+A light EN/DE/FR tokenizer feeds an inverted index whose postings store
+precomputed BM25 term weights, so a query only sums a few arrays. The index
+is built from the JSON / JSONL / SQLite / snapshot outputs of the extractors and saved to one
+file for the wis-search CLI.
+
+The saved index uses the snapshot column layout: postings are two flat
+arrays sliced by a sorted term table, so load() maps the file and a query
+only pages in the posting lists it touches.
+"""
+
+import heapq
+import json
+import math
+import re
+import sqlite3
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from wislib.jsonl import iter_records
+from wislib.snapshot import ColumnFile, open_snapshot, write_columns
+
+INDEX_MAGIC = b'WISIDX\x00\x00'
+INDEX_VERSION = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_LENGTH = 200
+# Terms in more than this share of documents are scored by lookup, not scan
+COMMON_TERM_FRACTION = 0.05
+
+WORD_PATTERN = re.compile(r'\w+')
+# Mercedes part numbers are written with or without spaces: A123 456 78 90
+PART_NUMBER_PATTERN = re.compile(r'\b([A-Z]\d{3})\s?(\d{3})\s?(\d{2})\s?(\d{2})\b', re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+    a an and are as at be by for from in is it of on or the to with
+    der die das den dem des ein eine einen und oder mit von zu im am auf fur ist
+    le la les un une des du de et ou avec pour dans sur au aux est
+""".split())
+
+# Longest first; a suffix is only removed if at least MIN_STEM chars remain
+SUFFIXES = tuple(sorted("""
+    ements ement ations ation ungen ung heiten heit keiten keit
+    ing ed es s ly ern er en em e n ees ee
+""".split(), key=len, reverse=True))
+MIN_STEM = 4
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics (Prüfen -> prufen, déposer -> deposer)"""
+    text = text.casefold().replace('ß', 'ss')
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFKD', text)
+                   if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    """Strip one inflection suffix; deliberately light to stay language-neutral"""
+    if word.isdigit() or len(word) <= MIN_STEM:
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms for a text: folded, stopword-free, stemmed words plus
+    compact part numbers (a1234567890)"""
+    if not text:
+        return []
+    terms = [stem(w) for w in WORD_PATTERN.findall(fold(text)) if w not in STOPWORDS]
+    terms.extend(''.join(m.groups()).lower() for m in PART_NUMBER_PATTERN.finditer(text))
+    return terms
+
+
+class Hit(NamedTuple):
+    score: float
+    kind: str
+    key: str
+    title: str
+    snippet: str
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking.
+
+    Add documents, call finalize(), then search(). Each term maps to an
+    array of doc ids and a parallel array of BM25 weights (without idf).
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Tuple[str, str, str, str]] = []
+        self.doc_lengths = array('I')
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._pending: Dict[str, List[Tuple[int, int]]] = {}
+        self._np_cache: Dict[str, Any] = {}
+        self._max_cache: Dict[str, float] = {}
+        self._mapped: Optional['MappedIndex'] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, kind: str, key: str, title: str, text: str = ''):
+        """Index one document; title and text are both searchable"""
+        if self.postings:
+            raise RuntimeError("Index is finalized; build a new one to add documents")
+        terms = tokenize(f"{title} {text}")
+        if not terms:
+            return
+        doc_id = len(self.docs)
+        body = text or title
+        self.docs.append((kind, key, title[:SNIPPET_LENGTH], body[:SNIPPET_LENGTH]))
+        self.doc_lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            self._pending.setdefault(term, []).append((doc_id, tf))
+
+    def finalize(self):
+        """Turn pending postings into weight arrays"""
+        if not self.docs:
+            return
+        avg_length = sum(self.doc_lengths) / len(self.doc_lengths)
+        k1, b = self.k1, self.b
+        norms = [k1 * (1 - b + b * length / avg_length) for length in self.doc_lengths]
+        for term, entries in self._pending.items():
+            doc_ids = array('I')
+            weights = array('f')
+            for doc_id, tf in entries:
+                doc_ids.append(doc_id)
+                weights.append(tf * (k1 + 1) / (tf + norms[doc_id]))
+            self.postings[term] = (doc_ids, weights)
+        self._pending = {}
+        self._np_cache = {}
+        self._max_cache = {}
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings[term][0]) if term in self.postings else 0
+        n = len(self.docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[Hit]:
+        """Top documents for a free-text query, best first"""
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        if not terms:
+            return []
+        # With a kind filter every match is ranked, since the top few may be filtered out
+        top = limit if kind is None else None
+        if HAS_NUMPY:
+            ranked = self._score_numpy(terms, top)
+        else:
+            ranked = self._score_python(terms, top)
+
+        hits = []
+        for doc_id, score in ranked:
+            doc = self.docs[doc_id]
+            if kind is not None and doc[0] != kind:
+                continue
+            hits.append(Hit(score, *doc))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _accumulate(self, terms: List[str]) -> Dict[int, float]:
+        # Seed from the longest list at C speed; loop over the rest
+        terms = sorted(terms, key=lambda t: len(self.postings[t][0]), reverse=True)
+        doc_ids, weights = self.postings[terms[0]]
+        scores: Dict[int, float] = dict(zip(doc_ids, map(self.idf(terms[0]).__mul__, weights)))
+        get = scores.get
+        for term in terms[1:]:
+            idf = self.idf(term)
+            doc_ids, weights = self.postings[term]
+            for doc_id, weight in zip(doc_ids, weights):
+                scores[doc_id] = get(doc_id, 0.0) + idf * weight
+        return scores
+
+    def _weight(self, term: str, doc_id: int) -> float:
+        doc_ids, weights = self.postings[term]
+        i = bisect_left(doc_ids, doc_id)
+        return weights[i] if i < len(doc_ids) and doc_ids[i] == doc_id else 0.0
+
+    def _max_weight(self, term: str) -> float:
+        if term not in self._max_cache:
+            self._max_cache[term] = max(self.postings[term][1])
+        return self._max_cache[term]
+
+    def _score_python(self, terms: List[str], top: Optional[int]) -> List[Tuple[int, float]]:
+        terms = sorted(terms, key=lambda t: len(self.postings[t][0]))
+        common_df = len(self.docs) * COMMON_TERM_FRACTION
+        rare = [t for t in terms if len(self.postings[t][0]) <= common_df] or terms[:1]
+        common = terms[len(rare):]
+        if top is None or not common:
+            scores = self._accumulate(terms)
+            if top is not None:
+                return heapq.nlargest(top, scores.items(), key=itemgetter(1))
+            return sorted(scores.items(), key=itemgetter(1), reverse=True)
+
+        # MaxScore: rank the docs found through rare terms, looking up common
+        # term weights by bisect. A doc holding only common terms scores at
+        # most `bound`, so if the k-th score beats it the ranking is exact.
+        scores = self._accumulate(rare)
+        for term in common:
+            idf = self.idf(term)
+            for doc_id in scores:
+                scores[doc_id] += idf * self._weight(term, doc_id)
+        ranked = heapq.nlargest(top, scores.items(), key=itemgetter(1))
+        bound = sum(self.idf(t) * self._max_weight(t) for t in common)
+        if len(ranked) == top and ranked[-1][1] >= bound:
+            return ranked
+        scores = self._accumulate(terms)
+        return heapq.nlargest(top, scores.items(), key=itemgetter(1))
+
+    def _score_numpy(self, terms: List[str], top: Optional[int]) -> List[Tuple[int, float]]:
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in terms:
+            if term not in self._np_cache:
+                doc_ids, weights = self.postings[term]
+                self._np_cache[term] = (np.frombuffer(doc_ids, dtype=np.uint32),
+                                        np.frombuffer(weights, dtype=np.float32))
+            doc_ids, weights = self._np_cache[term]
+            # Doc ids are unique within one posting list, so fancy-index add is safe
+            scores[doc_ids] += np.float32(self.idf(term)) * weights
+        matched = np.flatnonzero(scores)
+        if top is not None and len(matched) > top:
+            matched = matched[np.argpartition(scores[matched], -top)[-top:]]
+        order = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(int(d), float(scores[d])) for d in order]
+
+    # ============== Persistence ==============
+
+    def save(self, path: Union[str, Path]):
+        """Write the index in the mmap-able column layout (see MappedIndex)"""
+        self.finalize()
+        kinds: Dict[str, int] = {}
+        strings = {name: array('Q', [0]) for name in ('kind_off', 'doc_key_off',
+                                                      'doc_title_off', 'doc_snip_off', 'term_off')}
+        blob = bytearray()
+
+        def append(column: str, text: str):
+            blob.extend(text.encode('utf-8', errors='surrogatepass'))
+            strings[column].append(len(blob))
+
+        doc_kind = array('B')
+        for kind, key, title, snippet in self.docs:
+            if kind not in kinds:
+                if len(kinds) > 0xFF:
+                    raise ValueError("Too many document kinds for a search index")
+                kinds[kind] = len(kinds)
+            doc_kind.append(kinds[kind])
+        for kind in kinds:
+            append('kind_off', kind)
+        strings['doc_key_off'][0] = len(blob)
+        for _, key, _, _ in self.docs:
+            append('doc_key_off', key)
+        strings['doc_title_off'][0] = len(blob)
+        for _, _, title, _ in self.docs:
+            append('doc_title_off', title)
+        strings['doc_snip_off'][0] = len(blob)
+        for _, _, _, snippet in self.docs:
+            append('doc_snip_off', snippet)
+
+        # Terms sorted by their UTF-8 bytes so MappedPostings can bisect the blob
+        terms = sorted(self.postings, key=lambda t: t.encode('utf-8', errors='surrogatepass'))
+        strings['term_off'][0] = len(blob)
+        post_off = array('Q', [0])
+        post_docs = array('I')
+        post_weights = array('f')
+        for term in terms:
+            append('term_off', term)
+            doc_ids, weights = self.postings[term]
+            post_docs.extend(doc_ids)
+            post_weights.extend(weights)
+            post_off.append(len(post_docs))
+
+        write_columns(path, INDEX_MAGIC, INDEX_VERSION, [
+            ('params', 'd', array('d', [self.k1, self.b])),
+            ('doc_kind', 'B', doc_kind),
+            ('kind_off', 'Q', strings['kind_off']),
+            ('doc_key_off', 'Q', strings['doc_key_off']),
+            ('doc_title_off', 'Q', strings['doc_title_off']),
+            ('doc_snip_off', 'Q', strings['doc_snip_off']),
+            ('term_off', 'Q', strings['term_off']),
+            ('post_off', 'Q', post_off),
+            ('post_docs', 'I', post_docs),
+            ('post_weights', 'f', post_weights),
+            ('blob', 'B', bytes(blob)),
+        ])
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'SearchIndex':
+        """Map a saved index; nothing but the header and kind table is read up front"""
+        try:
+            mapped = MappedIndex(path)
+        except ValueError as e:
+            raise ValueError(f"{e}; rebuild it with the current wis-search") from None
+        index = cls(float(mapped.params[0]), float(mapped.params[1]))
+        index.docs = MappedDocs(mapped)
+        index.postings = MappedPostings(mapped)
+        index._mapped = mapped
+        return index
+
+    def close(self):
+        """Release the mapping of a loaded index"""
+        if self._mapped is not None:
+            self.docs, self.postings = [], {}
+            self._np_cache = {}
+            self._mapped.close()
+            self._mapped = None
+
+
+class MappedIndex(ColumnFile):
+    """Column view of a saved search index"""
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__(path, INDEX_MAGIC, INDEX_VERSION, 'wis-search index')
+        self.kinds = self._strings(self.columns['kind_off'])
+
+
+class MappedDocs:
+    """Sequence of (kind, key, title, snippet) read from the mapping on access"""
+
+    def __init__(self, mapped: MappedIndex):
+        self._mapped = mapped
+
+    def __len__(self) -> int:
+        return len(self._mapped.doc_kind)
+
+    def __getitem__(self, doc_id: int) -> Tuple[str, str, str, str]:
+        m = self._mapped
+        return (m.kinds[int(m.doc_kind[doc_id])], m.text(m.doc_key_off, doc_id),
+                m.text(m.doc_title_off, doc_id), m.text(m.doc_snip_off, doc_id))
+
+
+class MappedPostings:
+    """term -> (doc ids, weights) views, found by bisecting the sorted term table"""
+
+    def __init__(self, mapped: MappedIndex):
+        self._mapped = mapped
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._mapped.post_off) - 1
+
+    def _find(self, term: str) -> int:
+        if term in self._ids:
+            return self._ids[term]
+        m = self._mapped
+        key = term.encode('utf-8', errors='surrogatepass')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if m.raw(m.term_off, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        term_id = lo if lo < len(self) and m.raw(m.term_off, lo) == key else -1
+        self._ids[term] = term_id
+        return term_id
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def __getitem__(self, term: str):
+        term_id = self._find(term)
+        if term_id < 0:
+            raise KeyError(term)
+        m = self._mapped
+        start, end = int(m.post_off[term_id]), int(m.post_off[term_id + 1])
+        return m.post_docs[start:end], m.post_weights[start:end]
+
+
+# ============== Sources ==============
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_text(v) for v in value)
+    return str(value)
+
+
+def _documents_from_item(kind: str, item: Any, position: int):
+    """(kind, key, title, text) for one extracted part / procedure / bulletin"""
+    if isinstance(item, str):
+        return kind, f"{kind}-{position}", item[:100], item
+    if not isinstance(item, dict):
+        return kind, f"{kind}-{position}", _text(item)[:100], _text(item)
+    if kind == 'part':
+        key = _text(item.get('part_number'))
+        return kind, key, key, _text(item.get('description'))
+    key = _text(item.get('id') or item.get('bulletin_number') or item.get('procedure_code')
+                or f"{kind}-{position}")
+    title = _text(item.get('title') or item.get('text') or item.get('content'))[:100]
+    text = _text(item.get('content') or item.get('text') or item.get('steps'))
+    return kind, key, title, text
+
+
+JSON_SECTIONS = {
+    'parts': 'part', 'sample_parts': 'part',
+    'procedures': 'procedure', 'sample_procedures': 'procedure',
+    'bulletins': 'bulletin', 'sample_bulletins': 'bulletin',
+    'unimog_data': 'unimog',
+}
+
+SQLITE_TABLES = {
+    'parts': ('part', "SELECT part_number, part_number, description FROM parts"),
+    'procedures': ('procedure', "SELECT id, title, content FROM procedures"),
+    'bulletins': ('bulletin', "SELECT id, substr(content, 1, 100), content FROM bulletins"),
+}
+
+
+def iter_json(path: Union[str, Path]) -> Iterable[Tuple[str, str, str, str]]:
+    """Documents from an extractor JSON export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for section, kind in JSON_SECTIONS.items():
+        for position, item in enumerate(data.get(section) or []):
+            yield _documents_from_item(kind, item, position)
+
+
+def iter_sqlite(path: Union[str, Path]) -> Iterable[Tuple[str, str, str, str]]:
+    """Documents from a create_sqlite_db() database"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, (kind, sql) in SQLITE_TABLES.items():
+            if table not in tables:
+                continue
+            for key, title, text in conn.execute(sql):
+                yield kind, _text(key), _text(title), _text(text)
+    finally:
+        conn.close()
+
+
+def iter_jsonl_source(path: Union[str, Path]) -> Iterable[Tuple[str, str, str, str]]:
+    """Documents from a JSON Lines export (.jsonl / .jsonl.gz)"""
+    kinds = set(JSON_SECTIONS.values())
+    for position, (kind, record) in enumerate(iter_records(path)):
+        if kind in kinds:
+            yield _documents_from_item(kind, record, position)
+
+
+def iter_snapshot(path: Union[str, Path]) -> Iterable[Tuple[str, str, str, str]]:
+    """Documents from a columnar snapshot (.wsnap)"""
+    with open_snapshot(path) as snap:
+        for part in snap.iter_parts():
+            yield 'part', part['part_number'], part['part_number'], part['description']
+        for i, proc in enumerate(snap.iter_procedures()):
+            yield 'procedure', f"procedure-{i}", proc['title'][:100], proc['content']
+
+
+def iter_source(path: Union[str, Path]) -> Iterable[Tuple[str, str, str, str]]:
+    name = Path(path).name.lower()
+    if name.endswith(('.db', '.sqlite', '.sqlite3')):
+        return iter_sqlite(path)
+    if name.endswith(('.jsonl', '.jsonl.gz')):
+        return iter_jsonl_source(path)
+    if name.endswith('.wsnap'):
+        return iter_snapshot(path)
+    return iter_json(path)
+
+
+def build_index(sources: Iterable[Union[str, Path]]) -> SearchIndex:
+    """Index every document from the given JSON / SQLite outputs"""
+    index = SearchIndex()
+    for source in sources:
+        for kind, key, title, text in iter_source(source):
+            index.add(kind, key, title, text)
+    index.finalize()
+    return index
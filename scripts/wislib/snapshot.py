@@ -0,0 +1,343 @@
+"""
+Memory-mapped columnar snapshots of extraction results
+A versioned little-endian file of fixed-width columns plus one UTF-8 blob,
+opened with mmap so consumers get NumPy views (or typed memoryviews without
+NumPy) instead of re-parsing JSON or SQL. Opening costs a header read; data
+is paged in by the OS on first touch.
+
+Layout: header, section table, then 64-byte aligned sections.
+
+  part_keys        u64  packed part numbers, sorted (see pack_part_number)
+  part_number_off  u64  n+1 offsets into blob
+  part_desc_off    u64  n+1 offsets into blob
+  part_model       u32  model id or NO_MODEL
+  part_source      u16  provenance id
+  proc_title_off   u64  n+1 offsets into blob
+  proc_content_off u64  n+1 offsets into blob
+  proc_model       u32  model id or NO_MODEL
+  proc_source      u16  provenance id
+  model_off        u64  model codes (string table)
+  source_off       u64  provenance names (string table)
+  blob             u8   UTF-8 text
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from wislib.dedupe import digest_int
+
+MAGIC = b'WISSNAP\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQ')       # magic, version, section count, created
+SECTION = struct.Struct('<16s4sQQ')    # name, type code, offset, item count
+ALIGNMENT = 64
+
+NO_MODEL = 0xFFFFFFFF
+NUMPY_TYPES = {'Q': '<u8', 'I': '<u4', 'H': '<u2', 'B': 'u1', 'f': '<f4', 'd': '<f8'}
+
+PART_NUMBER_PATTERN = re.compile(r'^([A-Z])\s?(\d{3})\s?(\d{3})\s?(\d{2})\s?(\d{2})$')
+# Keys for part numbers outside the A123 456 78 90 format have the top bit set
+HASHED_KEY_FLAG = 1 << 63
+
+
+def pack_part_number(part_number: str) -> int:
+    """Order-preserving u64 key for a part number.
+
+    Standard numbers pack as letter << 40 | ten digits; anything else gets a
+    64-bit digest with the top bit set, so the two never collide.
+    """
+    match = PART_NUMBER_PATTERN.match(part_number.strip().upper())
+    if match:
+        letter, *digits = match.groups()
+        return ord(letter) << 40 | int(''.join(digits))
+    return HASHED_KEY_FLAG | (digest_int(part_number.encode('utf-8')) >> 1)
+
+
+class _StringColumn:
+    """Offsets of one text column; bytes are appended to a shared blob part"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('Q', [0])
+
+    def append(self, text: Optional[str]):
+        if text:
+            self.data += text.encode('utf-8', errors='surrogatepass')
+        self.offsets.append(len(self.data))
+
+
+def write_columns(path: Union[str, Path], magic: bytes, version: int,
+                  columns: List[Tuple[str, str, Union[array, bytes]]]) -> Path:
+    """Write (name, type code, data) columns as aligned sections, atomically"""
+    path = Path(path)
+    if sys.byteorder != 'little':
+        for _, code, data in columns:
+            if isinstance(data, array):
+                data.byteswap()
+
+    offset = HEADER.size + SECTION.size * len(columns)
+    table = []
+    for name, code, data in columns:
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        count = len(data)
+        table.append((name, code, offset, count))
+        offset += count * struct.calcsize(code)
+
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(magic, version, len(columns), int(time.time())))
+        for name, code, section_offset, count in table:
+            f.write(SECTION.pack(name.encode('ascii'), code.encode('ascii'),
+                                 section_offset, count))
+        for (name, code, section_offset, count), (_, _, data) in zip(table, columns):
+            f.write(b'\x00' * (section_offset - f.tell()))
+            f.write(data if isinstance(data, bytes) else data.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+class ColumnFile:
+    """Read-only mapping of a file written by write_columns().
+
+    Columns are attributes: NumPy arrays over the mapping when NumPy is
+    installed, typed memoryviews otherwise.
+    """
+
+    def __init__(self, path: Union[str, Path], magic: bytes, version: int, description: str):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        found, found_version, count, created = HEADER.unpack_from(self._mm, 0)
+        if found != magic:
+            self.close()
+            raise ValueError(f"{self.path} is not a {description}")
+        if found_version != version:
+            self.close()
+            raise ValueError(f"{self.path} has {description} version {found_version}, expected {version}")
+        self.version = found_version
+        self.created = created
+        self.columns: Dict[str, object] = {}
+        self._blob_start = 0
+        for i in range(count):
+            name, code, offset, items = SECTION.unpack_from(self._mm, HEADER.size + i * SECTION.size)
+            name = name.rstrip(b'\x00').decode('ascii')
+            code = code.rstrip(b'\x00').decode('ascii')
+            self.columns[name] = self._view(code, offset, items)
+            if name == 'blob':
+                self._blob_start = offset
+
+    def _view(self, code: str, offset: int, items: int):
+        if HAS_NUMPY:
+            return np.frombuffer(self._mm, dtype=NUMPY_TYPES[code], count=items, offset=offset)
+        if sys.byteorder != 'little':
+            raise RuntimeError(f"Reading {self.path.suffix} files on big-endian hosts requires NumPy")
+        size = items * struct.calcsize(code)
+        return memoryview(self._mm)[offset:offset + size].cast(code)
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('columns', {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        # Views must be released before the mapping can close
+        self.__dict__['columns'] = {}
+        if getattr(self, '_mm', None) is not None and not self._mm.closed:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # a caller still holds a view; the GC will unmap it
+        self._file.close()
+
+    def raw(self, offsets, i: int) -> bytes:
+        base = self._blob_start
+        return self._mm[base + int(offsets[i]):base + int(offsets[i + 1])]
+
+    def text(self, offsets, i: int) -> str:
+        return self.raw(offsets, i).decode('utf-8', errors='surrogatepass')
+
+    def _strings(self, offsets) -> List[str]:
+        return [self.text(offsets, i) for i in range(len(offsets) - 1)]
+
+
+class SnapshotWriter:
+    """Collect parts and procedures, then write() a snapshot file"""
+
+    def __init__(self):
+        self._parts: List[Tuple[int, str, str, int, int]] = []
+        self._proc_title = _StringColumn()
+        self._proc_content = _StringColumn()
+        self._proc_model = array('I')
+        self._proc_source = array('H')
+        self._models: Dict[str, int] = {}
+        # Source 0 is reserved for "unknown"
+        self._sources: Dict[str, int] = {'': 0}
+
+    @staticmethod
+    def _intern(table: Dict[str, int], value: str, limit: int) -> int:
+        if value not in table:
+            if len(table) >= limit:
+                raise ValueError(f"Too many distinct values ({limit}) for a snapshot table")
+            table[value] = len(table)
+        return table[value]
+
+    def model_id(self, model: Optional[str]) -> int:
+        if model is None:
+            return NO_MODEL
+        return self._intern(self._models, str(model), NO_MODEL)
+
+    def source_id(self, source: Optional[str]) -> int:
+        if not source:
+            return 0
+        return self._intern(self._sources, str(source), 0xFFFF)
+
+    def add_part(self, part_number: str, description: str = '',
+                 model: Optional[str] = None, source: Optional[str] = None):
+        self._parts.append((pack_part_number(part_number), part_number, description or '',
+                            self.model_id(model), self.source_id(source)))
+
+    def add_procedure(self, title: str, content: str = '',
+                      model: Optional[str] = None, source: Optional[str] = None):
+        self._proc_title.append(title)
+        self._proc_content.append(content)
+        self._proc_model.append(self.model_id(model))
+        self._proc_source.append(self.source_id(source))
+
+    def add_model(self, model: str):
+        self.model_id(model)
+
+    def _columns(self) -> List[Tuple[str, str, Union[array, bytes]]]:
+        self._parts.sort(key=lambda part: part[0])
+        part_number = _StringColumn()
+        part_desc = _StringColumn()
+        for _, number, description, _, _ in self._parts:
+            part_number.append(number)
+            part_desc.append(description)
+        models = _StringColumn()
+        for model in self._models:
+            models.append(model)
+        sources = _StringColumn()
+        for source in self._sources:
+            sources.append(source)
+
+        # One blob; each string column's offsets are shifted to its region
+        string_columns = [('part_number_off', part_number), ('part_desc_off', part_desc),
+                          ('proc_title_off', self._proc_title),
+                          ('proc_content_off', self._proc_content),
+                          ('model_off', models), ('source_off', sources)]
+        blob = bytearray()
+        offsets = {}
+        for name, column in string_columns:
+            base = len(blob)
+            blob += column.data
+            offsets[name] = array('Q', (base + o for o in column.offsets))
+
+        return [
+            ('part_keys', 'Q', array('Q', (p[0] for p in self._parts))),
+            ('part_number_off', 'Q', offsets['part_number_off']),
+            ('part_desc_off', 'Q', offsets['part_desc_off']),
+            ('part_model', 'I', array('I', (p[3] for p in self._parts))),
+            ('part_source', 'H', array('H', (p[4] for p in self._parts))),
+            ('proc_title_off', 'Q', offsets['proc_title_off']),
+            ('proc_content_off', 'Q', offsets['proc_content_off']),
+            ('proc_model', 'I', self._proc_model),
+            ('proc_source', 'H', self._proc_source),
+            ('model_off', 'Q', offsets['model_off']),
+            ('source_off', 'Q', offsets['source_off']),
+            ('blob', 'B', bytes(blob)),
+        ]
+
+    def write(self, path: Union[str, Path]) -> Path:
+        """Write the snapshot atomically (temp file + rename)"""
+        return write_columns(path, MAGIC, VERSION, self._columns())
+
+
+class Snapshot(ColumnFile):
+    """Read-only view of a snapshot file.
+
+    Columns are attributes (snap.part_keys, snap.blob, ...): NumPy arrays
+    over the mapping when NumPy is installed, typed memoryviews otherwise.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        super().__init__(path, MAGIC, VERSION, 'WIS snapshot')
+        self.models = self._strings(self.columns['model_off'])
+        self.sources = self._strings(self.columns['source_off'])
+
+    # ============== Parts ==============
+
+    @property
+    def part_count(self) -> int:
+        return len(self.part_keys)
+
+    def part(self, i: int) -> Dict:
+        model = int(self.part_model[i])
+        return {
+            'part_number': self.text(self.part_number_off, i),
+            'description': self.text(self.part_desc_off, i),
+            'model': self.models[model] if model != NO_MODEL else None,
+            'source': self.sources[int(self.part_source[i])] or None,
+        }
+
+    def find_part(self, part_number: str) -> Optional[int]:
+        """Index of a part by number (binary search over the sorted keys)"""
+        key = pack_part_number(part_number)
+        keys = self.part_keys
+        if HAS_NUMPY:
+            i = int(np.searchsorted(keys, np.uint64(key)))
+        else:
+            i = bisect_left(keys, key)
+        while i < len(keys) and int(keys[i]) == key:
+            # Hashed keys may in theory repeat; confirm on the stored text
+            if key < HASHED_KEY_FLAG or self.text(self.part_number_off, i) == part_number:
+                return i
+            i += 1
+        return None
+
+    def iter_parts(self) -> Iterator[Dict]:
+        for i in range(self.part_count):
+            yield self.part(i)
+
+    # ============== Procedures ==============
+
+    @property
+    def procedure_count(self) -> int:
+        return len(self.proc_model)
+
+    def procedure(self, i: int) -> Dict:
+        model = int(self.proc_model[i])
+        return {
+            'title': self.text(self.proc_title_off, i),
+            'content': self.text(self.proc_content_off, i),
+            'model': self.models[model] if model != NO_MODEL else None,
+            'source': self.sources[int(self.proc_source[i])] or None,
+        }
+
+    def iter_procedures(self) -> Iterator[Dict]:
+        for i in range(self.procedure_count):
+            yield self.procedure(i)
+
+
+def open_snapshot(path: Union[str, Path]) -> Snapshot:
+    return Snapshot(path)
@@ -0,0 +1,136 @@
+"""
+Bulk SQLite export with FTS5 search indexes
+Loads rows with executemany inside one transaction (WAL, synchronous=OFF),
+then de-duplicates keyed tables, builds the B-tree key index and
+external-content FTS5 tables so the .db answers local searches directly.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class SQLiteTable:
+    """A TEXT-column table with an integer id.
+
+    unique: column kept unique (first row wins) with a B-tree index
+    fts: columns indexed in an FTS5 table named <name>_fts
+    """
+    name: str
+    columns: Tuple[str, ...]
+    unique: Optional[str] = None
+    fts: Tuple[str, ...] = ()
+
+    @property
+    def fts_name(self) -> str:
+        return f"{self.name}_fts"
+
+
+def _create_table(conn: sqlite3.Connection, table: SQLiteTable):
+    columns = ',\n                '.join(f"{c} TEXT" for c in table.columns)
+    conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table.name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {columns}
+            )
+        """)
+
+
+def _load_rows(conn: sqlite3.Connection, table: SQLiteTable,
+               rows: Iterable[Sequence], chunk_size: int) -> int:
+    placeholders = ', '.join('?' for _ in table.columns)
+    sql = f"INSERT OR IGNORE INTO {table.name} ({', '.join(table.columns)}) VALUES ({placeholders})"
+    loaded = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        conn.executemany(sql, chunk)
+        loaded += len(chunk)
+    return loaded
+
+
+def _build_indexes(conn: sqlite3.Connection, table: SQLiteTable) -> bool:
+    """Key index plus FTS5; returns False if this SQLite lacks FTS5"""
+    if table.unique:
+        # New tables load without the key index (OR IGNORE only applies on
+        # re-runs), so drop duplicates in one pass before creating it
+        conn.execute(f"""
+            DELETE FROM {table.name} WHERE id NOT IN (
+                SELECT MIN(id) FROM {table.name} GROUP BY {table.unique}
+            )
+        """)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table.name}_{table.unique} "
+                     f"ON {table.name} ({table.unique})")
+    if not table.fts:
+        return True
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table.fts_name} USING fts5(
+                {', '.join(table.fts)},
+                content='{table.name}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"  FTS5 not available ({e}); skipping search index for {table.name}")
+        return False
+    conn.execute(f"INSERT INTO {table.fts_name}({table.fts_name}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {table.fts_name}({table.fts_name}) VALUES ('optimize')")
+    return True
+
+
+def bulk_export(db_path: Union[str, Path],
+                loads: Sequence[Tuple[SQLiteTable, Iterable[Sequence]]],
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """Load (table, rows) pairs into db_path and index them.
+
+    Rows are tuples in table.columns order and may be generators. Returns
+    the final row count per table.
+    """
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-262144")  # 256 MB
+
+        conn.execute("BEGIN")
+        for table, rows in loads:
+            _create_table(conn, table)
+            _load_rows(conn, table, rows, chunk_size)
+        for table, _ in loads:
+            _build_indexes(conn, table)
+        conn.execute("COMMIT")
+
+        counts = {
+            table.name: conn.execute(f"SELECT COUNT(*) FROM {table.name}").fetchone()[0]
+            for table, _ in loads
+        }
+
+        conn.execute("ANALYZE")
+        # Leave a single self-contained file with safe settings for readers
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        conn.close()
+    return counts
+
+
+def fts_search(conn: sqlite3.Connection, table: SQLiteTable, query: str,
+               limit: int = 20) -> List[sqlite3.Row]:
+    """Best-ranked rows of table matching an FTS5 query"""
+    conn.row_factory = sqlite3.Row
+    return conn.execute(f"""
+        SELECT t.*, bm25({table.fts_name}) AS rank
+        FROM {table.fts_name} JOIN {table.name} AS t ON t.id = {table.fts_name}.rowid
+        WHERE {table.fts_name} MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    """, (query, limit)).fetchall()
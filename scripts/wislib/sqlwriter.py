@@ -0,0 +1,380 @@
+"""
+Batched SQL output for the WIS exporters
+Rows are written either as multi-row INSERT ... VALUES batches or as a
+COPY ... FROM STDIN payload into a staging table followed by one set-based
+upsert. All quoting and escaping for generated SQL lives in this module.
+
+Output is streamed through a buffered handle as rows are produced, and can
+be split into numbered files at a size threshold so the parts load in
+parallel. Every part is a self-contained transaction.
+"""
+
+import argparse
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple, Union
+
+MODES = ('insert', 'copy')
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# How many COPY rows to write between output size checks
+COPY_CHECK_ROWS = 1000
+
+
+def sql_literal(value: Any) -> str:
+    """Render a Python value as a PostgreSQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return 'ARRAY[' + ', '.join(sql_literal(v) for v in value) + ']'
+    # PostgreSQL text cannot hold NUL bytes, which binary scans produce freely
+    text = str(value).replace('\x00', '').replace("'", "''")
+    return f"'{text}'"
+
+
+def copy_field(value: Any) -> str:
+    """Render a Python value as a field of COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (list, tuple)):
+        value = '{' + ','.join(
+            '"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value
+        ) + '}'
+    text = str(value).replace('\x00', '')
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """Target table, the columns rows supply and how conflicts resolve.
+
+    computed maps extra target columns to SQL expressions over the supplied
+    columns; they are evaluated set-based in the INSERT ... SELECT.
+    """
+    table: str
+    columns: Tuple[str, ...]
+    conflict: Tuple[str, ...] = ()
+    update: Optional[str] = None
+    computed: Dict[str, str] = field(default_factory=dict)
+
+    def with_options(self, **overrides) -> 'TableSpec':
+        return replace(self, **overrides)
+
+    @property
+    def target_columns(self) -> Tuple[str, ...]:
+        return self.columns + tuple(self.computed)
+
+    def conflict_clause(self) -> str:
+        target = f" ({', '.join(self.conflict)})" if self.conflict else ''
+        if self.update and self.conflict:
+            return f"ON CONFLICT{target} DO UPDATE SET {self.update}"
+        return f"ON CONFLICT{target} DO NOTHING"
+
+    def select_list(self) -> str:
+        return ', '.join(list(self.columns) + list(self.computed.values()))
+
+
+WIS_PARTS = TableSpec(
+    'wis_parts',
+    ('part_number', 'description'),
+    conflict=('part_number',),
+    update="description = EXCLUDED.description",
+    computed={
+        'search_vector': "to_tsvector('english', part_number || ' ' || coalesce(description, ''))",
+    },
+)
+
+# Parts without search_vector, never replacing a description with a shorter one
+WIS_PARTS_LONGEST = WIS_PARTS.with_options(
+    computed={},
+    update=("description = CASE\n"
+            "    WHEN LENGTH(EXCLUDED.description) > LENGTH(wis_parts.description)\n"
+            "    THEN EXCLUDED.description\n"
+            "    ELSE wis_parts.description\n"
+            "  END"),
+)
+
+WIS_PROCEDURES = TableSpec(
+    'wis_procedures',
+    ('title', 'content', 'procedure_type'),
+    computed={
+        'search_vector': "to_tsvector('english', title || ' ' || coalesce(content, ''))",
+    },
+)
+
+WIS_BULLETINS = TableSpec(
+    'wis_bulletins',
+    ('content',),
+    computed={
+        'search_vector': "to_tsvector('english', content)",
+    },
+)
+
+
+class SplitOutput:
+    """Buffered text output that can roll over to numbered files.
+
+    With max_bytes=None everything goes to `path`. Otherwise files are named
+    wis_import_0001.sql, wis_import_0002.sql, ... and a new one is started
+    whenever the writer reaches a statement boundary past the threshold.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: Optional[int] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.paths: List[Path] = []
+        self.size = 0
+        self._f = None
+        self._open_next()
+
+    def _open_next(self):
+        if self.max_bytes is None:
+            path = self.path
+        else:
+            path = self.path.with_name(
+                f"{self.path.stem}_{len(self.paths) + 1:04d}{self.path.suffix}")
+        self._f = open(path, 'w', encoding='utf-8', buffering=self.buffer_size)
+        self.paths.append(path)
+        self.size = 0
+
+    def write(self, text: str):
+        self._f.write(text)
+        # Byte size only matters for the split threshold
+        if self.max_bytes is not None:
+            self.size += len(text.encode('utf-8'))
+
+    def should_rotate(self) -> bool:
+        return self.max_bytes is not None and self.size >= self.max_bytes
+
+    def rotate(self):
+        self._f.close()
+        self._open_next()
+
+    def close(self):
+        if self._f and not self._f.closed:
+            self._f.close()
+
+
+class SQLWriter:
+    """Write rows for one or more TableSpecs to a text file or SplitOutput.
+
+    Comments written before begin() form the header, which is repeated at
+    the top of every file when a SplitOutput rolls over.
+    """
+
+    def __init__(self, f: Union[TextIO, SplitOutput], mode: str = 'insert',
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown SQL mode {mode!r}, expected one of {MODES}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.f = f
+        self.mode = mode
+        self.batch_size = batch_size
+        self.statements = 0
+        self.rows = 0
+        self._staging_count = 0
+        self._header: List[str] = []
+        self._started = False
+        self._in_transaction = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def paths(self) -> List[Path]:
+        """Files written so far (only known for a SplitOutput)"""
+        return list(getattr(self.f, 'paths', []))
+
+    def close(self):
+        if isinstance(self.f, SplitOutput):
+            self.f.close()
+
+    def comment(self, text: str = ''):
+        """Write one or more '-- ' comment lines (empty text writes a blank line)"""
+        lines = [f"-- {line}\n" for line in text.splitlines()] if text else ['\n']
+        if not self._started:
+            self._header.extend(lines)
+        for line in lines:
+            self.f.write(line)
+
+    def statement(self, sql: str):
+        """Write a literal SQL statement"""
+        self._started = True
+        self.f.write(sql.rstrip().rstrip(';') + ';\n')
+        self.statements += 1
+
+    def begin(self):
+        self.statement('BEGIN')
+        self.f.write('\n')
+        self._in_transaction = True
+
+    def commit(self):
+        self.f.write('\n')
+        self.statement('COMMIT')
+        self._in_transaction = False
+
+    def _at_boundary(self) -> bool:
+        """Start the next numbered file if the current one is full.
+
+        Returns True if a new file was started.
+        """
+        if not (isinstance(self.f, SplitOutput) and self.f.should_rotate()):
+            return False
+        in_transaction = self._in_transaction
+        if in_transaction:
+            self.commit()
+        self.f.rotate()
+        for line in self._header:
+            self.f.write(line)
+        self.f.write(f"-- Part {len(self.f.paths)}\n\n")
+        if in_transaction:
+            self.begin()
+        return True
+
+    def write_rows(self, spec: TableSpec, rows: Iterable[Sequence[Any]]) -> int:
+        """Write rows (tuples in spec.columns order) and return how many were written"""
+        if self.mode == 'copy':
+            return self._write_copy(spec, rows)
+        return self._write_batches(spec, rows)
+
+    # ============== INSERT batches ==============
+
+    def _write_batches(self, spec: TableSpec, rows: Iterable[Sequence[Any]]) -> int:
+        written = 0
+        batch: List[Sequence[Any]] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                written += self._flush_batch(spec, batch)
+                batch = []
+        if batch:
+            written += self._flush_batch(spec, batch)
+        return written
+
+    def _flush_batch(self, spec: TableSpec, batch: List[Sequence[Any]]) -> int:
+        self._at_boundary()
+        if spec.conflict and spec.update:
+            # DO UPDATE may not touch the same row twice in one statement
+            batch = self._last_per_key(spec, batch)
+
+        values = ',\n'.join(
+            '(' + ', '.join(sql_literal(v) for v in row) + ')' for row in batch
+        )
+        columns = ', '.join(spec.columns)
+        if spec.computed:
+            sql = (f"INSERT INTO {spec.table} ({', '.join(spec.target_columns)})\n"
+                   f"SELECT {spec.select_list()}\n"
+                   f"FROM (VALUES\n{values}\n) AS v ({columns})\n"
+                   f"{spec.conflict_clause()}")
+        else:
+            sql = (f"INSERT INTO {spec.table} ({columns}) VALUES\n{values}\n"
+                   f"{spec.conflict_clause()}")
+        self.statement(sql)
+        self.rows += len(batch)
+        return len(batch)
+
+    @staticmethod
+    def _last_per_key(spec: TableSpec, batch: List[Sequence[Any]]) -> List[Sequence[Any]]:
+        key_idx = [spec.columns.index(c) for c in spec.conflict]
+        latest = {}
+        for row in batch:
+            latest[tuple(row[i] for i in key_idx)] = row
+        return list(latest.values())
+
+    # ============== COPY + upsert ==============
+
+    def _write_copy(self, spec: TableSpec, rows: Iterable[Sequence[Any]]) -> int:
+        written = 0
+        pending = 0
+        staging = None
+        for row in rows:
+            if staging is None:
+                self._at_boundary()
+                staging = self._start_copy(spec)
+            self.f.write('\t'.join(copy_field(v) for v in row) + '\n')
+            written += 1
+            pending += 1
+            if pending % COPY_CHECK_ROWS == 0 and isinstance(self.f, SplitOutput) \
+                    and self.f.should_rotate():
+                # A COPY block cannot span files: upsert what we have first
+                self._finish_copy(spec, staging, pending)
+                staging = None
+                pending = 0
+        if staging is not None:
+            self._finish_copy(spec, staging, pending)
+        return written
+
+    def _start_copy(self, spec: TableSpec) -> str:
+        self._staging_count += 1
+        staging = f"_stage_{spec.table}_{self._staging_count}"
+        # Only the supplied columns: LIKE would copy NOT NULL constraints of
+        # target columns the COPY does not fill
+        self.statement(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                       f"SELECT {', '.join(spec.columns)} FROM {spec.table} WITH NO DATA")
+        self.f.write(f"COPY {staging} ({', '.join(spec.columns)}) FROM STDIN;\n")
+        return staging
+
+    def _finish_copy(self, spec: TableSpec, staging: str, count: int):
+        self.f.write('\\.\n')
+        self.statements += 1
+
+        distinct = ''
+        if spec.conflict and spec.update:
+            distinct = f"DISTINCT ON ({', '.join(spec.conflict)}) "
+        self.statement(f"INSERT INTO {spec.table} ({', '.join(spec.target_columns)})\n"
+                       f"SELECT {distinct}{spec.select_list()}\n"
+                       f"FROM {staging}\n"
+                       f"{spec.conflict_clause()}")
+        self.rows += count
+
+
+def open_sql(path: Union[str, Path], mode: str = 'insert',
+             batch_size: int = DEFAULT_BATCH_SIZE,
+             max_file_bytes: Optional[int] = None) -> SQLWriter:
+    """SQLWriter streaming to `path`, split into numbered files past max_file_bytes"""
+    return SQLWriter(SplitOutput(path, max_bytes=max_file_bytes), mode=mode,
+                     batch_size=batch_size)
+
+
+# ============== Command line ==============
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def _megabytes(value: str) -> int:
+    size = float(value)
+    if size <= 0:
+        raise argparse.ArgumentTypeError("must be a positive size in MB")
+    return int(size * 1024 * 1024)
+
+
+def add_sql_arguments(parser: argparse.ArgumentParser):
+    """--sql-mode, --batch-size and --max-file-mb, stored as args.sql_mode,
+    args.batch_size and args.max_file_bytes for open_sql()"""
+    group = parser.add_argument_group('SQL output')
+    group.add_argument('--sql-mode', choices=MODES, default='insert',
+                       help="multi-row INSERT batches, or COPY into a staging table "
+                            "plus one upsert (default: insert)")
+    group.add_argument('--batch-size', type=_positive_int, default=DEFAULT_BATCH_SIZE,
+                       help=f"rows per INSERT statement (default: {DEFAULT_BATCH_SIZE})")
+    group.add_argument('--max-file-mb', dest='max_file_bytes', type=_megabytes, metavar='MB',
+                       help="split the SQL into numbered files of about this size")
@@ -0,0 +1,523 @@
+"""
+Batch text-quality classification for extracted strings
+Scores whole lists of candidate strings at once: character-class counts
+(letters, digits, whitespace, special characters, words) are computed over
+one concatenated code-point array with NumPy (or str.translate + str.count
+without it), and a character trigram model trained on known-good WIS text
+can score how language-like each string is. The presets make the same
+decisions as the extractors' old per-string heuristics; the trigram model
+is opt-in through tuned(min_lm_score=...), since it is only trained on the
+short SEED_CORPUS.
+
+  classifier = TextClassifier(MEANINGFUL)
+  keep = classifier.classify(candidates)
+  print(classifier.throughput())
+"""
+
+import math
+import pickle
+import re
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+SPECIAL_CHARS = '{}[]<>@#$%^&*'
+MODEL_VERSION = 1
+
+# ============== Character classes ==============
+
+LETTER, DIGIT, SPACE, SPECIAL, OTHER, SEPARATOR = range(6)
+CLASS_CHARS = 'adsp.|'
+# Code points at or above the table size are classified when first seen
+CLASS_TABLE_SIZE = 0x800
+
+
+def char_class(c: str) -> int:
+    if c == '\x00':
+        return SEPARATOR
+    if c in SPECIAL_CHARS:
+        return SPECIAL
+    if c.isalpha():
+        return LETTER
+    if c.isdigit():
+        return DIGIT
+    if c.isspace():
+        return SPACE
+    return OTHER
+
+
+_CLASSES = [char_class(chr(cp)) for cp in range(CLASS_TABLE_SIZE)]
+# str.translate table for the pure-Python path: every char -> its class letter
+_CLASS_TRANSLATION = {cp: CLASS_CHARS[cls] for cp, cls in enumerate(_CLASSES)}
+
+
+class _Translation(dict):
+    """Translation table with a default for code points outside the table"""
+
+    def __init__(self, table: Dict[int, str], default: str):
+        super().__init__(table)
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+class _ClassTranslation(dict):
+    """Class table that classifies code points outside it on first use"""
+
+    def __missing__(self, key):
+        value = self[key] = CLASS_CHARS[char_class(chr(key))]
+        return value
+
+
+CLASS_TRANSLATION = _ClassTranslation(_CLASS_TRANSLATION)
+
+# ============== Trigram model ==============
+
+# Folded alphabet: letters, umlauts, one digit symbol, space, everything else
+ALPHABET = 'abcdefghijklmnopqrstuvwxyzäöüß0 #'
+ALPHABET_SIZE = len(ALPHABET)
+_SPACE_INDEX = ALPHABET.index(' ')
+_OTHER_INDEX = ALPHABET.index('#')
+
+
+def fold_char(c: str) -> str:
+    c = c.lower()
+    if c in ALPHABET and c != '#':
+        return c
+    if c.isdigit():
+        return '0'
+    if c.isspace() or c == '\x00':
+        return ' '
+    return '#'
+
+
+_FOLD_TRANSLATION = {cp: fold_char(chr(cp)) for cp in range(CLASS_TABLE_SIZE)}
+FOLD_TRANSLATION = _Translation(_FOLD_TRANSLATION, '#')
+
+# Known-good text in the register of WIS repair instructions and part lists
+SEED_CORPUS = """
+Remove the injection pump and install the new seal ring on the drive shaft.
+Check the oil level in the portal axle and top up with the specified gear oil.
+Install the brake caliper and tighten the bolts to the specified torque.
+Disconnect the battery before removing the starter motor from the engine.
+Inspect the wheel bearing for wear and replace it if necessary.
+Adjust the valve clearance with the engine cold, intake and exhaust valves.
+Drain the coolant, remove the thermostat housing and replace the gasket.
+Bleed the hydraulic system after replacing the clutch master cylinder.
+Measure the resistance of the temperature sensor at the connector.
+Replace the fuel filter and check the fuel lines for leaks.
+Test the air pressure in the brake system with the compressor running.
+Clean the contact surfaces and apply sealing compound before assembly.
+Torque the cylinder head bolts in three stages in the specified sequence.
+Fault code stored in the engine control unit, check the wiring harness.
+Hub reduction gear, planetary gear, sun gear, ring gear and thrust washer.
+Front axle, rear axle, differential lock, transfer case and power take off.
+Steering gear, tie rod end, drag link, steering damper and steering knuckle.
+Hydraulic pump, control valve, pressure relief valve and return line filter.
+Unimog U1300L with OM352 engine, U435 series, U400 and U500 implement carrier.
+Seal ring, O-ring, hex bolt, hex nut, spring washer, hose clamp, bracket.
+Ausbauen der Einspritzpumpe und Einbauen des neuen Dichtrings an der Antriebswelle.
+Ölstand im Portalachsgehäuse prüfen und mit vorgeschriebenem Getriebeöl auffüllen.
+Bremssattel einbauen und Schrauben mit dem vorgeschriebenen Anzugsdrehmoment festziehen.
+Batterie abklemmen, bevor der Anlasser vom Motor ausgebaut wird.
+Radlager auf Verschleiß prüfen und bei Bedarf ersetzen.
+Ventilspiel bei kaltem Motor einstellen, Einlass- und Auslassventile.
+Kühlmittel ablassen, Thermostatgehäuse ausbauen und Dichtung ersetzen.
+Hydraulikanlage nach dem Ersetzen des Kupplungsgeberzylinders entlüften.
+Widerstand des Temperaturfühlers am Stecker messen.
+Kraftstofffilter ersetzen und Kraftstoffleitungen auf Undichtigkeit prüfen.
+Vorderachse, Hinterachse, Differentialsperre, Verteilergetriebe und Zapfwelle.
+"""
+
+
+class TrigramModel:
+    """Character trigram model over the folded alphabet with add-k smoothing.
+
+    score() is the mean log-probability per character relative to a uniform
+    model over the alphabet (nats): around zero for random characters,
+    clearly positive for text resembling the training corpus.
+    """
+
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self.counts = [0] * (ALPHABET_SIZE ** 3)
+        self.characters = 0
+        self._logp: Optional[List[float]] = None
+        self._lookup: Optional[Dict[str, float]] = None
+
+    @staticmethod
+    def _indices(text: str) -> List[int]:
+        folded = '  ' + text.translate(FOLD_TRANSLATION)
+        return [ALPHABET.index(c) for c in folded]
+
+    def train(self, texts: Iterable[str]) -> 'TrigramModel':
+        for text in texts:
+            indices = self._indices(text)
+            for a, b, c in zip(indices, indices[1:], indices[2:]):
+                self.counts[(a * ALPHABET_SIZE + b) * ALPHABET_SIZE + c] += 1
+            self.characters += len(text)
+        self._logp = self._lookup = None
+        return self
+
+    @property
+    def logp(self) -> List[float]:
+        """Log-probability relative to uniform, per trigram index"""
+        if self._logp is None:
+            k, size = self.smoothing, ALPHABET_SIZE
+            uniform = math.log(size)
+            logp = []
+            for context in range(size * size):
+                row = self.counts[context * size:(context + 1) * size]
+                total = sum(row) + k * size
+                logp.extend(math.log((n + k) / total) + uniform for n in row)
+            self._logp = logp
+        return self._logp
+
+    @property
+    def lookup(self) -> Dict[str, float]:
+        """Trigram string -> log-probability, for the pure-Python path"""
+        if self._lookup is None:
+            size = ALPHABET_SIZE
+            self._lookup = {ALPHABET[i // (size * size)] + ALPHABET[i // size % size]
+                            + ALPHABET[i % size]: p for i, p in enumerate(self.logp)}
+        return self._lookup
+
+    def score(self, text: str) -> float:
+        if not text:
+            return 0.0
+        folded = '  ' + text.translate(FOLD_TRANSLATION)
+        lookup = self.lookup
+        return sum(lookup[folded[i:i + 3]] for i in range(len(text))) / len(text)
+
+    def save(self, path: Union[str, Path]):
+        with open(path, 'wb') as f:
+            pickle.dump({'version': MODEL_VERSION, 'smoothing': self.smoothing,
+                         'counts': self.counts, 'characters': self.characters}, f)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'TrigramModel':
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError(f"{path} is not a version {MODEL_VERSION} trigram model")
+        model = cls(data['smoothing'])
+        model.counts = data['counts']
+        model.characters = data['characters']
+        return model
+
+
+_default_model: Optional[TrigramModel] = None
+
+
+def default_model() -> TrigramModel:
+    """Model trained on SEED_CORPUS (built once per process)"""
+    global _default_model
+    if _default_model is None:
+        _default_model = TrigramModel().train(SEED_CORPUS.strip().splitlines())
+    return _default_model
+
+
+# ============== Thresholds ==============
+
+@dataclass(frozen=True)
+class Thresholds:
+    """Acceptance rules; None disables a rule"""
+    min_length: int = 1
+    max_length: Optional[int] = None
+    min_words: int = 1
+    # Strings containing one of these (case-insensitive) skip the min_words rule
+    keywords: Tuple[str, ...] = ()
+    min_alnum_ratio: Optional[float] = None
+    max_special_ratio: Optional[float] = None
+    min_avg_word_length: Optional[float] = None
+    max_avg_word_length: Optional[float] = None
+    # Require a run of this many ASCII letters somewhere in the string
+    letter_run: Optional[int] = None
+    # The first word (lower-cased) must be one of these
+    first_words: Optional[Tuple[str, ...]] = None
+    # Minimum trigram model score (see TrigramModel)
+    min_lm_score: Optional[float] = None
+
+
+# MercedesWISExtractor.is_meaningful_text. Its model codes (U300, U400, ...)
+# were compared against lower-cased text and never matched, so they are left out.
+MEANINGFUL = Thresholds(
+    min_words=4, letter_run=3, min_alnum_ratio=0.5,
+    keywords=('mercedes', 'unimog', 'engine', 'brake', 'transmission', 'oil', 'filter',
+              'bearing', 'shaft', 'valve', 'sensor'),
+)
+# not WISFinalExtractor.is_garbage_text
+NOT_GARBAGE = Thresholds(max_special_ratio=0.2, min_avg_word_length=2,
+                         max_avg_word_length=15)
+# StringsProcessor.is_valid_procedure
+PROCEDURE = Thresholds(
+    min_length=15, max_length=300, min_words=3, max_special_ratio=0.1,
+    first_words=('remove', 'install', 'replace', 'check', 'adjust', 'test', 'inspect',
+                 'torque', 'connect', 'disconnect'),
+)
+
+
+# ============== Scoring ==============
+
+@dataclass
+class BatchScores:
+    """Per-string features of one batch, as parallel sequences"""
+    lengths: Sequence[int]
+    letters: Sequence[int]
+    digits: Sequence[int]
+    spaces: Sequence[int]
+    specials: Sequence[int]
+    words: Sequence[int]
+    lm_scores: Sequence[float]
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+
+def _scores_numpy(texts: Sequence[str], model: TrigramModel) -> BatchScores:
+    n = len(texts)
+    # Two separators before every string give each one a fresh trigram context
+    joined = '\x00\x00' + '\x00\x00'.join(texts) + '\x00'
+    cp = np.frombuffer(joined.encode('utf-32-le'), dtype='<u4')
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+    starts = np.empty(n, dtype=np.int64)
+    starts[0] = 2
+    np.cumsum(lengths[:-1] + 2, out=starts[1:])
+    starts[1:] += 2
+
+    classes = _class_array()[np.minimum(cp, CLASS_TABLE_SIZE - 1)]
+    high = cp >= CLASS_TABLE_SIZE
+    if high.any():
+        # Emoji, arrows, CJK...: classify each distinct code point once
+        distinct, inverse = np.unique(cp[high], return_inverse=True)
+        classes[high] = np.array([char_class(chr(c)) for c in distinct], dtype=np.uint8)[inverse]
+
+    def per_string(mask):
+        sums = np.add.reduceat(mask.astype(np.int64), starts)
+        sums[lengths == 0] = 0
+        return sums
+
+    non_space = (classes != SPACE) & (classes != SEPARATOR)
+    word_starts = non_space.copy()
+    word_starts[1:] &= ~non_space[:-1]
+
+    folded = _fold_array()[np.minimum(cp, CLASS_TABLE_SIZE - 1)]
+    folded[cp >= CLASS_TABLE_SIZE] = _OTHER_INDEX
+    trigram = (folded[:-2] * ALPHABET_SIZE + folded[1:-1]) * ALPHABET_SIZE + folded[2:]
+    logp = np.zeros(len(cp), dtype=np.float64)
+    logp[2:] = np.asarray(model.logp)[trigram]
+    logp[classes == SEPARATOR] = 0.0
+    lm = np.add.reduceat(logp, starts)
+    lm = np.divide(lm, lengths, out=np.zeros(n), where=lengths > 0)
+
+    return BatchScores(lengths, per_string(classes == LETTER), per_string(classes == DIGIT),
+                       per_string(classes == SPACE), per_string(classes == SPECIAL),
+                       per_string(word_starts), lm)
+
+
+_CLASS_ARRAY = None
+_FOLD_ARRAY = None
+
+
+def _class_array():
+    global _CLASS_ARRAY
+    if _CLASS_ARRAY is None:
+        _CLASS_ARRAY = np.array(_CLASSES, dtype=np.uint8)
+    return _CLASS_ARRAY
+
+
+def _fold_array():
+    global _FOLD_ARRAY
+    if _FOLD_ARRAY is None:
+        _FOLD_ARRAY = np.array([ALPHABET.index(_FOLD_TRANSLATION[cp])
+                                for cp in range(CLASS_TABLE_SIZE)], dtype=np.int64)
+        _FOLD_ARRAY[0] = _SPACE_INDEX
+    return _FOLD_ARRAY
+
+
+def _scores_python(texts: Sequence[str], model: TrigramModel) -> BatchScores:
+    lengths, letters, digits, spaces, specials, words, lm = [], [], [], [], [], [], []
+    for text in texts:
+        classes = text.translate(CLASS_TRANSLATION)
+        lengths.append(len(text))
+        letters.append(classes.count('a'))
+        digits.append(classes.count('d'))
+        spaces.append(classes.count('s'))
+        specials.append(classes.count('p'))
+        words.append(len(text.split()))
+        lm.append(model.score(text))
+    return BatchScores(lengths, letters, digits, spaces, specials, words, lm)
+
+
+def _replace_nul(texts: Sequence[str]) -> List[str]:
+    """NUL as a space: the NumPy path joins strings with NUL separators, so
+    an embedded NUL would otherwise score differently on the two paths"""
+    return [text.replace('\x00', ' ') if '\x00' in text else text for text in texts]
+
+
+class TextClassifier:
+    """Score and filter batches of candidate strings against Thresholds"""
+
+    def __init__(self, thresholds: Thresholds = MEANINGFUL,
+                 model: Optional[TrigramModel] = None, use_numpy: bool = HAS_NUMPY):
+        self.thresholds = thresholds
+        self.model = model or default_model()
+        self.use_numpy = use_numpy and HAS_NUMPY
+        self._letter_run = (re.compile(r'[a-zA-Z]{%d,}' % thresholds.letter_run)
+                            if thresholds.letter_run else None)
+        self._keywords = (re.compile('|'.join(re.escape(k) for k in thresholds.keywords),
+                                     re.IGNORECASE) if thresholds.keywords else None)
+        self._first_words = frozenset(thresholds.first_words or ())
+        self.stats = {'strings': 0, 'characters': 0, 'accepted': 0, 'seconds': 0.0}
+
+    def tuned(self, **changes) -> 'TextClassifier':
+        """A classifier with some thresholds changed, sharing the model"""
+        return TextClassifier(replace(self.thresholds, **changes), self.model, self.use_numpy)
+
+    def score(self, texts: Sequence[str]) -> BatchScores:
+        if not texts:
+            return BatchScores([], [], [], [], [], [], [])
+        texts = _replace_nul(texts)
+        if self.use_numpy:
+            return _scores_numpy(texts, self.model)
+        return _scores_python(texts, self.model)
+
+    def classify(self, texts: Sequence[str]) -> List[bool]:
+        """One accept/reject decision per string"""
+        start = time.perf_counter()
+        texts = _replace_nul(texts)
+        scores = self.score(texts)
+        if self.use_numpy:
+            keep = self._decide_numpy(texts, scores)
+        else:
+            keep = [self._decide(text, scores, i) for i, text in enumerate(texts)]
+        self.stats['strings'] += len(texts)
+        self.stats['characters'] += sum(map(len, texts))
+        self.stats['accepted'] += sum(keep)
+        self.stats['seconds'] += time.perf_counter() - start
+        return keep
+
+    def _text_rules(self, text: str, words: int) -> bool:
+        """Rules that need the string itself, applied last"""
+        if self._letter_run is not None and self._letter_run.search(text) is None:
+            return False
+        if self._first_words:
+            return bool(words) and text.split(None, 1)[0].lower() in self._first_words
+        return True
+
+    def _decide(self, text: str, scores: BatchScores, i: int) -> bool:
+        t = self.thresholds
+        length, words = scores.lengths[i], scores.words[i]
+        if length < t.min_length or (t.max_length is not None and length > t.max_length):
+            return False
+        if t.min_alnum_ratio is not None and \
+                scores.letters[i] + scores.digits[i] < t.min_alnum_ratio * length:
+            return False
+        if t.max_special_ratio is not None and scores.specials[i] > t.max_special_ratio * length:
+            return False
+        if t.min_avg_word_length is not None or t.max_avg_word_length is not None:
+            if not words:
+                return False
+            average = (length - scores.spaces[i]) / words
+            if t.min_avg_word_length is not None and average < t.min_avg_word_length:
+                return False
+            if t.max_avg_word_length is not None and average > t.max_avg_word_length:
+                return False
+        if t.min_lm_score is not None and scores.lm_scores[i] < t.min_lm_score:
+            return False
+        if words < t.min_words and (self._keywords is None or not self._keywords.search(text)):
+            return False
+        return self._text_rules(text, words)
+
+    def _decide_numpy(self, texts: List[str], scores: BatchScores) -> List[bool]:
+        """Same rules as _decide as array masks; regexes only run on survivors"""
+        t = self.thresholds
+        lengths, words = scores.lengths, scores.words
+        ok = lengths >= t.min_length
+        if t.max_length is not None:
+            ok &= lengths <= t.max_length
+        if t.min_alnum_ratio is not None:
+            ok &= scores.letters + scores.digits >= t.min_alnum_ratio * lengths
+        if t.max_special_ratio is not None:
+            ok &= scores.specials <= t.max_special_ratio * lengths
+        if t.min_avg_word_length is not None or t.max_avg_word_length is not None:
+            average = np.divide(lengths - scores.spaces, words, out=np.zeros(len(texts)),
+                                where=words > 0)
+            ok &= words > 0
+            if t.min_avg_word_length is not None:
+                ok &= average >= t.min_avg_word_length
+            if t.max_avg_word_length is not None:
+                ok &= average <= t.max_avg_word_length
+        if t.min_lm_score is not None:
+            ok &= scores.lm_scores >= t.min_lm_score
+        few_words = ok & (words < t.min_words)
+        for i in np.flatnonzero(few_words):
+            ok[i] = self._keywords is not None and self._keywords.search(texts[i]) is not None
+        if self._letter_run is not None or self._first_words:
+            for i in np.flatnonzero(ok):
+                ok[i] = self._text_rules(texts[i], int(words[i]))
+        return ok.tolist()
+
+    def accept(self, text: str) -> bool:
+        """Single-string convenience; batch with classify() in loops"""
+        return self.classify([text])[0]
+
+    def filter(self, texts: Iterable[str], batch_size: int = 4096) -> Iterable[str]:
+        """Yield the accepted strings of a stream, scoring batch_size at a time"""
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= batch_size:
+                yield from (s for s, ok in zip(batch, self.classify(batch)) if ok)
+                batch = []
+        if batch:
+            yield from (s for s, ok in zip(batch, self.classify(batch)) if ok)
+
+    def throughput(self) -> str:
+        seconds = self.stats['seconds'] or 1e-9
+        return (f"{self.stats['strings']:,} strings, {self.stats['accepted']:,} accepted, "
+                f"{self.stats['strings'] / seconds:,.0f} strings/s, "
+                f"{self.stats['characters'] / seconds / 1e6:.1f} M chars/s")
+
+
+# ============== Categories ==============
+
+PART_PREFIX = re.compile(r'^[A-Z]\d{3}\s?\d{3}\s?\d{2}\s?\d{2}')
+BULLETIN_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}|SB-\d+')
+MODEL_PATTERN = re.compile(r'Unimog|U\d{3,4}')
+PROCEDURE_VERBS = ('Remove', 'Install', 'Check', 'Replace', 'Adjust',
+                   'Test', 'Inspect', 'Repair', 'Clean', 'Disconnect')
+
+
+def categorize(texts: Sequence[str]) -> List[Optional[str]]:
+    """'parts', 'procedures', 'bulletins', 'models' or None per string.
+
+    The rules TransbaseParser.categorize_string applied: strings under 10
+    characters or with fewer than two spaces are skipped, then part number
+    prefix, procedure verb, bulletin and model patterns. This is a plain
+    per-string loop, not batch scoring; the gain over the old method is
+    precompiled patterns and one tuple startswith for the verbs.
+    """
+    categories: List[Optional[str]] = []
+    for text in texts:
+        if len(text) < 10 or text.count(' ') < 2:
+            categories.append(None)
+        elif PART_PREFIX.match(text):
+            categories.append('parts')
+        elif text.startswith(PROCEDURE_VERBS):
+            categories.append('procedures')
+        elif BULLETIN_PATTERN.search(text):
+            categories.append('bulletins')
+        elif MODEL_PATTERN.search(text):
+            categories.append('models')
+        else:
+            categories.append(None)
+    return categories
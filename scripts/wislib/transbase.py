@@ -0,0 +1,324 @@
+"""
+Connection pooling and parallel reads for the live TransBase extractor
+A small thread-safe pool of DB-API connections (native transbase-python or
+JayDeBeApi) opened on demand and capped so the WIS VM is not overloaded.
+Independent extraction jobs run on pooled connections in worker threads
+and hand their row batches to the calling thread through a bounded queue,
+so JSONL/SQL writers never need to be thread-safe.
+
+Large tables can be split into key ranges: the job streams its ranges in
+key order while spare pool connections read ahead and spill to disk.
+
+The Unimog search builds one OR-combined LIKE predicate per table and
+re-checks rows locally with a multi-pattern regex. connect_sqlite() gives
+a SQLite-backed stand-in that answers the same information_schema catalog
+queries, for dry runs without the WIS VM.
+"""
+
+import os
+import pickle
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from wislib.incremental import key_value
+from wislib.metrics import gauge
+from wislib.sqlwriter import sql_literal
+
+DEFAULT_POOL_SIZE = 3
+# Batches buffered per worker before fetching stalls
+QUEUE_BATCHES = 4
+# Substrings of a column type that mark it as searchable text
+TEXT_TYPES = ('CHAR', 'TEXT', 'STRING', 'CLOB')
+
+Job = Callable[[Any], Iterable[List[Dict]]]
+
+
+class ConnectionPool:
+    """At most `size` connections, created by connect() when first needed"""
+
+    def __init__(self, connect: Callable[[], Any], size: int = DEFAULT_POOL_SIZE):
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self._idle: List[Any] = []
+        self._all: List[Any] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.closeall()
+
+    def getconn(self, block: bool = True):
+        """Borrow a connection, blocking while all `size` are in use.
+
+        With block=False returns None instead of waiting.
+        """
+        if not self._slots.acquire(blocking=block):
+            return None
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            conn = self._connect()
+            with self._lock:
+                self._all.append(conn)
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            connections, self._all, self._idle = self._all, [], []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_DONE = object()
+
+
+def run_parallel(pool: ConnectionPool, jobs: Dict[Hashable, Job],
+                 on_error: Optional[Callable[[Hashable, Exception], None]] = None
+                 ) -> Iterator[Tuple[Hashable, List[Dict]]]:
+    """Run each job(cursor) on its own pooled connection, pool.size at a time.
+
+    Yields (job key, batch) in arrival order; batches of one job keep their
+    order. A failing job is reported to on_error and the others carry on.
+    Closing the iterator early stops the workers at their next batch.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=pool.size * QUEUE_BATCHES)
+    stop = threading.Event()
+    depth = gauge('queue_depth', 'Batches waiting for the writer thread')
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work(key, job):
+        error = None
+        try:
+            if stop.is_set():
+                return
+            conn = pool.getconn()
+            try:
+                cursor = conn.cursor()
+                try:
+                    for batch in job(cursor):
+                        if batch and not put((key, batch)):
+                            return
+                finally:
+                    cursor.close()
+            finally:
+                pool.putconn(conn)
+        except Exception as e:
+            error = e
+        finally:
+            put((key, (_DONE, error)))
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for key, job in jobs.items():
+            executor.submit(work, key, job)
+        pending = len(jobs)
+        try:
+            while pending:
+                key, batch = batches.get()
+                depth.set(batches.qsize())
+                if isinstance(batch, tuple) and batch and batch[0] is _DONE:
+                    pending -= 1
+                    if batch[1] is not None and on_error:
+                        on_error(key, batch[1])
+                    continue
+                yield key, batch
+        finally:
+            stop.set()
+
+
+# ============== Key ranges ==============
+
+def key_ranges(key: str, low: Any, high: Any, parts: int) -> List[str]:
+    """WHERE conditions splitting key values low..high into up to `parts`
+    contiguous ranges, in key order, plus one for NULL keys"""
+    low, high = key_value(low), key_value(high)
+    conditions = []
+    if isinstance(low, (int, float)) and isinstance(high, (int, float)) and low <= high:
+        integral = isinstance(low, int) and isinstance(high, int)
+        if integral:
+            span = high - low + 1
+            step = -(-span // max(1, min(parts, span)))
+            bounds = list(range(low, high + 1, step)) + [high + 1]
+        else:
+            step = (high - low) / max(parts, 1)
+            bounds = [low + i * step for i in range(max(parts, 1))] + [high]
+        last = len(bounds) - 2
+        for i, (start, end) in enumerate(zip(bounds, bounds[1:])):
+            # Integer ranges end one past the maximum; real ones include it
+            below = '<=' if i == last and not integral else '<'
+            conditions.append(f"{key} >= {sql_literal(start)} AND {key} {below} {sql_literal(end)}")
+    conditions.append(f"{key} IS NULL")
+    return conditions
+
+
+def read_partitioned(pool: ConnectionPool, cursor, fetch: Callable[[Any, str], Iterable[List[Dict]]],
+                     conditions: List[str], spill_dir: Optional[str] = None) -> Iterator[List[Dict]]:
+    """Batches of fetch(cursor, condition) for every condition, in condition order.
+
+    The caller's cursor streams the ranges in order. Connections free in the
+    pool are borrowed (never waited for) to read later ranges ahead into
+    pickle spill files, which are replayed when their turn comes.
+    """
+    count = len(conditions)
+    claimed = [False] * count
+    done = [threading.Event() for _ in range(count)]
+    errors: List[Optional[Exception]] = [None] * count
+    spills: List[Optional[str]] = [None] * count
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def claim(index: Optional[int] = None) -> Optional[int]:
+        """Claim range index, or the first unclaimed one"""
+        with lock:
+            for i in ([index] if index is not None else range(count)):
+                if not claimed[i]:
+                    claimed[i] = True
+                    return i
+        return None
+
+    def read_ahead(conn):
+        try:
+            ahead = conn.cursor()
+            try:
+                while not stop.is_set():
+                    i = claim()
+                    if i is None:
+                        return
+                    try:
+                        fd, path = tempfile.mkstemp(prefix='range-', suffix='.pickle', dir=spill_dir)
+                        spills[i] = path
+                        with os.fdopen(fd, 'wb') as f:
+                            for batch in fetch(ahead, conditions[i]):
+                                if stop.is_set():
+                                    break
+                                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    except Exception as e:
+                        errors[i] = e
+                    finally:
+                        done[i].set()
+            finally:
+                ahead.close()
+        finally:
+            pool.putconn(conn)
+
+    claim(0)
+    helpers = []
+    while len(helpers) < count - 1:
+        conn = pool.getconn(block=False)
+        if conn is None:
+            break
+        helper = threading.Thread(target=read_ahead, args=(conn,), daemon=True)
+        helper.start()
+        helpers.append(helper)
+
+    try:
+        for i in range(count):
+            if i == 0 or claim(i) is not None:
+                yield from fetch(cursor, conditions[i])
+                continue
+            done[i].wait()
+            if errors[i] is not None:
+                raise errors[i]
+            with open(spills[i], 'rb') as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        break
+            os.unlink(spills[i])
+            spills[i] = None
+    finally:
+        stop.set()
+        for helper in helpers:
+            helper.join()
+        for path in spills:
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+
+# ============== Search ==============
+
+def is_text_type(type_name: Optional[str]) -> bool:
+    """True for character types; unknown types count as text"""
+    if not type_name:
+        return True
+    type_name = str(type_name).upper()
+    return any(t in type_name for t in TEXT_TYPES)
+
+
+def like_any(columns: Iterable[str], patterns: Iterable[str]) -> str:
+    """One WHERE predicate matching any pattern in any column, case-insensitively"""
+    quoted = [pattern.upper().replace("'", "''") for pattern in patterns]
+    return ' OR '.join(f"UPPER({column}) LIKE '%{pattern}%'"
+                       for column in columns for pattern in quoted)
+
+
+class TextMatcher:
+    """Case-insensitive multi-pattern match over the text values of a record"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.pattern = re.compile('|'.join(re.escape(p) for p in patterns), re.IGNORECASE)
+
+    def columns(self, record: Dict, columns: Optional[Iterable[str]] = None) -> List[str]:
+        """Columns of record whose value matches"""
+        search = self.pattern.search
+        return [column for column in (columns if columns is not None else record)
+                if isinstance(record.get(column), str) and search(record[column])]
+
+
+# ============== SQLite stand-in ==============
+
+def connect_sqlite(path: str) -> Callable[[], sqlite3.Connection]:
+    """Connection factory for a SQLite file mimicking the WIS catalog.
+
+    Each connection gets an attached information_schema with the tables,
+    views and columns of the file under table_schema 'PUBLIC', like TransBase.
+    """
+    def connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("ATTACH DATABASE ':memory:' AS information_schema")
+        for kind, name in (('table', 'tables'), ('view', 'views')):
+            conn.execute(f"CREATE TABLE information_schema.{name} "
+                         f"(table_schema TEXT, table_name TEXT)")
+            conn.execute(f"INSERT INTO information_schema.{name} "
+                         f"SELECT 'PUBLIC', name FROM main.sqlite_master "
+                         f"WHERE type = ? AND name NOT LIKE 'sqlite_%'", (kind,))
+        conn.execute("CREATE TABLE information_schema.columns "
+                     "(table_schema TEXT, table_name TEXT, column_name TEXT, "
+                     "ordinal_position INTEGER, data_type TEXT)")
+        conn.execute("INSERT INTO information_schema.columns "
+                     "SELECT 'PUBLIC', m.name, p.name, p.cid + 1, p.type "
+                     "FROM main.sqlite_master m, pragma_table_info(m.name) p "
+                     "WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%'")
+        return conn
+
+    return connect